@@ -1,9 +1,10 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
 from sqlalchemy.orm import Session
-from sqlalchemy import func, extract
+from sqlalchemy import and_, extract, func, literal, select, true, union_all
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import List, Optional
 
+from app.core.config import settings
 from app.db import get_db
 from app.models import Patient, Doctor, Specialization, Symptom, Appointment, AIConsultation, Prescription
 from app.models.pharmacy import Pharmacy
@@ -11,7 +12,12 @@ from app.models.clinic import Clinic
 from app.schemas import PatientResponse, DoctorResponse
 from app.schemas.pharmacy import PharmacyResponse
 from app.schemas.clinic import ClinicResponse
-from pydantic import BaseModel, ConfigDict
+from app.services.lookup_cache import lookup_cache
+from app.services.symptom_index import symptom_index
+from app.services.metrics import metrics
+from app.services.jobs import jobs
+from app.services.batch_analysis import batch_analysis
+from pydantic import BaseModel, ConfigDict, Field
 
 router = APIRouter(prefix="/api/admin", tags=["admin"])
 
@@ -196,162 +202,182 @@ async def update_patient_status(
     return PatientResponse.model_validate(patient)
 
 
+# ── Dashboard aggregates ──────────────────────────────────────
+#
+# The dashboard endpoints are served by a handful of aggregate statements
+# rather than one COUNT per figure: every total for a table comes from a
+# single pass with COUNT(*) FILTER (WHERE ...), and the per-month and
+# per-status breakdowns come back together from one UNION ALL of GROUP BYs.
+
+def _month_starts(now: datetime, count: int) -> List[datetime]:
+    """Start of each of the last `count` calendar months (current one included), oldest first"""
+    starts = [now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)]
+    for _ in range(count - 1):
+        starts.append((starts[-1] - timedelta(days=1)).replace(day=1))
+    return starts[::-1]
+
+
+def _next_month(start: datetime) -> datetime:
+    return (start + timedelta(days=32)).replace(day=1)
+
+
+def _month_key(column):
+    """'YYYY-MM' bucket of a timestamp column"""
+    return func.to_char(func.date_trunc("month", column), "YYYY-MM")
+
+
+def _table_counts(model, total_label: str, **filtered):
+    """Single-row subquery over model: its row count plus one FILTERed count per keyword"""
+    columns = [func.count().label(total_label)]
+    columns += [func.count().filter(condition).label(label) for label, condition in filtered.items()]
+    return select(*columns).select_from(model).subquery()
+
+
+def _fetch_counts(db: Session, *subqueries) -> dict:
+    """Run several _table_counts() subqueries as one statement; {label: count}"""
+    stmt = select(*subqueries).select_from(subqueries[0])
+    for subquery in subqueries[1:]:
+        stmt = stmt.join(subquery, true())
+    return dict(db.execute(stmt).one()._mapping)
+
+
+def _grouped_counts(kind: str, key, model, *conditions):
+    """(kind, key, n) rows: model rows counted per key"""
+    return (
+        select(literal(kind).label("kind"), key.label("key"), func.count().label("n"))
+        .select_from(model)
+        .where(*conditions)
+        .group_by(key)
+    )
+
+
+def _fetch_breakdowns(db: Session, *selects) -> dict:
+    """Run several _grouped_counts() selects as one UNION ALL; {kind: {key: n}}"""
+    breakdowns = {}
+    for kind, key, n in db.execute(union_all(*selects)).all():
+        breakdowns.setdefault(kind, {})[key] = n
+    return breakdowns
+
+
+def _growth(this_month: int, last_month: int) -> float:
+    return round(((this_month - last_month) / max(last_month, 1)) * 100, 1)
+
+
 @router.get("/stats")
 async def get_admin_stats(
     db: Session = Depends(get_db),
     # authorized: bool = Depends(verify_admin_token)
 ):
     """Get admin dashboard statistics"""
-    total_patients = db.query(Patient).count()
-    active_patients = db.query(Patient).filter(Patient.is_active == True).count()
-    inactive_patients = db.query(Patient).filter(Patient.is_active == False).count()
-
-    total_doctors = db.query(Doctor).count()
-    approved_doctors = db.query(Doctor).filter(Doctor.is_approved == True).count()
-    pending_doctors = db.query(Doctor).filter(Doctor.is_approved == False).count()
-
-    total_pharmacies = db.query(Pharmacy).count()
-    approved_pharmacies = db.query(Pharmacy).filter(Pharmacy.is_approved == True).count()
-    pending_pharmacies = db.query(Pharmacy).filter(Pharmacy.is_approved == False).count()
-
-    total_clinics = db.query(Clinic).count()
-    approved_clinics = db.query(Clinic).filter(Clinic.is_approved == True).count()
-    pending_clinics = db.query(Clinic).filter(Clinic.is_approved == False).count()
+    month_start = _month_starts(datetime.now(), 1)[0]
+
+    counts = _fetch_counts(
+        db,
+        _table_counts(
+            Patient, "total_patients",
+            active_patients=Patient.is_active == True,
+            inactive_patients=Patient.is_active == False,
+            new_this_month=and_(Patient.created_at >= month_start, Patient.created_at < _next_month(month_start)),
+        ),
+        _table_counts(
+            Doctor, "total_doctors",
+            approved_doctors=Doctor.is_approved == True,
+            pending_doctors=Doctor.is_approved == False,
+        ),
+        _table_counts(
+            Pharmacy, "total_pharmacies",
+            approved_pharmacies=Pharmacy.is_approved == True,
+            pending_pharmacies=Pharmacy.is_approved == False,
+        ),
+        _table_counts(
+            Clinic, "total_clinics",
+            approved_clinics=Clinic.is_approved == True,
+            pending_clinics=Clinic.is_approved == False,
+        ),
+    )
 
-    # New patients this month
-    current_month = datetime.now().month
-    current_year = datetime.now().year
-    new_this_month = db.query(Patient).filter(
-        extract('month', Patient.created_at) == current_month,
-        extract('year', Patient.created_at) == current_year
-    ).count()
-    
     return {
-        "total_patients": total_patients,
-        "active_patients": active_patients,
-        "inactive_patients": inactive_patients,
-        "new_this_month": new_this_month,
-        "total_doctors": total_doctors,
-        "approved_doctors": approved_doctors,
-        "pending_doctors": pending_doctors,
-        "total_pharmacies": total_pharmacies,
-        "approved_pharmacies": approved_pharmacies,
-        "pending_pharmacies": pending_pharmacies,
-        "total_clinics": total_clinics,
-        "approved_clinics": approved_clinics,
-        "pending_clinics": pending_clinics,
+        "total_patients": counts["total_patients"],
+        "active_patients": counts["active_patients"],
+        "inactive_patients": counts["inactive_patients"],
+        "new_this_month": counts["new_this_month"],
+        "total_doctors": counts["total_doctors"],
+        "approved_doctors": counts["approved_doctors"],
+        "pending_doctors": counts["pending_doctors"],
+        "total_pharmacies": counts["total_pharmacies"],
+        "approved_pharmacies": counts["approved_pharmacies"],
+        "pending_pharmacies": counts["pending_pharmacies"],
+        "total_clinics": counts["total_clinics"],
+        "approved_clinics": counts["approved_clinics"],
+        "pending_clinics": counts["pending_clinics"],
     }
 
 
 @router.get("/overview-stats")
 async def get_overview_stats(db: Session = Depends(get_db)):
     """Comprehensive overview stats for the admin dashboard charts."""
-    now = datetime.now()
-
-    # ── KPI cards ─────────────────────────────────────────────
-    total_patients = db.query(Patient).count()
-    active_patients = db.query(Patient).filter(Patient.is_active == True).count()
-    total_doctors = db.query(Doctor).count()
-    approved_doctors = db.query(Doctor).filter(Doctor.is_approved == True).count()
-    total_appointments = db.query(Appointment).count()
-    appointments_this_month = db.query(Appointment).filter(
-        extract('month', Appointment.created_at) == now.month,
-        extract('year', Appointment.created_at) == now.year,
-    ).count()
-    total_prescriptions = db.query(Prescription).count()
-    total_ai_consultations = db.query(AIConsultation).count()
-    total_pharmacies = db.query(Pharmacy).count()
-    total_clinics = db.query(Clinic).count()
-
-    # Growth percentages (compare this month vs last month registrations)
-    last_month = (now.replace(day=1) - timedelta(days=1))
-    patients_this_month = db.query(Patient).filter(
-        extract('month', Patient.created_at) == now.month,
-        extract('year', Patient.created_at) == now.year,
-    ).count()
-    patients_last_month = db.query(Patient).filter(
-        extract('month', Patient.created_at) == last_month.month,
-        extract('year', Patient.created_at) == last_month.year,
-    ).count()
-    patient_growth = round(((patients_this_month - patients_last_month) / max(patients_last_month, 1)) * 100, 1)
-
-    doctors_this_month = db.query(Doctor).filter(
-        extract('month', Doctor.created_at) == now.month,
-        extract('year', Doctor.created_at) == now.year,
-    ).count()
-    doctors_last_month = db.query(Doctor).filter(
-        extract('month', Doctor.created_at) == last_month.month,
-        extract('year', Doctor.created_at) == last_month.year,
-    ).count()
-    doctor_growth = round(((doctors_this_month - doctors_last_month) / max(doctors_last_month, 1)) * 100, 1)
+    months = _month_starts(datetime.now(), 12)
+    month_keys = [m.strftime("%Y-%m") for m in months]
+    this_month, last_month = month_keys[-1], month_keys[-2]
+
+    # ── KPI totals ────────────────────────────────────────────
+    counts = _fetch_counts(
+        db,
+        _table_counts(Patient, "total_patients", active_patients=Patient.is_active == True),
+        _table_counts(Doctor, "total_doctors", approved_doctors=Doctor.is_approved == True),
+        _table_counts(Appointment, "total_appointments"),
+        _table_counts(Prescription, "total_prescriptions"),
+        _table_counts(AIConsultation, "total_ai_consultations"),
+        _table_counts(Pharmacy, "total_pharmacies"),
+        _table_counts(Clinic, "total_clinics"),
+    )
 
-    appts_last_month = db.query(Appointment).filter(
-        extract('month', Appointment.created_at) == last_month.month,
-        extract('year', Appointment.created_at) == last_month.year,
-    ).count()
-    appt_growth = round(((appointments_this_month - appts_last_month) / max(appts_last_month, 1)) * 100, 1)
+    # ── Monthly counts and status / severity distributions ────
+    breakdowns = _fetch_breakdowns(
+        db,
+        # Registrations: last 12 months
+        _grouped_counts("patients", _month_key(Patient.created_at), Patient, Patient.created_at >= months[0]),
+        _grouped_counts("doctors", _month_key(Doctor.created_at), Doctor, Doctor.created_at >= months[0]),
+        # Appointments: last 6 months
+        _grouped_counts(
+            "appointments", _month_key(Appointment.created_at), Appointment, Appointment.created_at >= months[-6]
+        ),
+        # AI consultations: this and last month (growth only)
+        _grouped_counts(
+            "ai", _month_key(AIConsultation.created_at), AIConsultation, AIConsultation.created_at >= months[-2]
+        ),
+        _grouped_counts("appointment_statuses", Appointment.status, Appointment),
+        _grouped_counts("ai_severity", AIConsultation.severity, AIConsultation, AIConsultation.severity.isnot(None)),
+    )
+    patients_by_month = breakdowns.get("patients", {})
+    doctors_by_month = breakdowns.get("doctors", {})
+    appointments_by_month = breakdowns.get("appointments", {})
+    ai_by_month = breakdowns.get("ai", {})
 
-    ai_this_month = db.query(AIConsultation).filter(
-        extract('month', AIConsultation.created_at) == now.month,
-        extract('year', AIConsultation.created_at) == now.year,
-    ).count()
-    ai_last_month = db.query(AIConsultation).filter(
-        extract('month', AIConsultation.created_at) == last_month.month,
-        extract('year', AIConsultation.created_at) == last_month.year,
-    ).count()
-    ai_growth = round(((ai_this_month - ai_last_month) / max(ai_last_month, 1)) * 100, 1)
+    patients_this_month = patients_by_month.get(this_month, 0)
+    appointments_this_month = appointments_by_month.get(this_month, 0)
+    ai_this_month = ai_by_month.get(this_month, 0)
 
     # ── Monthly registration trend (last 12 months) ──────────
-    registration_trend = []
-    for i in range(11, -1, -1):
-        d = now - timedelta(days=30 * i)
-        m, y = d.month, d.year
-        p_count = db.query(Patient).filter(
-            extract('month', Patient.created_at) == m,
-            extract('year', Patient.created_at) == y,
-        ).count()
-        doc_count = db.query(Doctor).filter(
-            extract('month', Doctor.created_at) == m,
-            extract('year', Doctor.created_at) == y,
-        ).count()
-        registration_trend.append({
-            "month": d.strftime("%b %Y"),
-            "month_short": d.strftime("%b"),
-            "patients": p_count,
-            "doctors": doc_count,
-        })
+    registration_trend = [
+        {
+            "month": m.strftime("%b %Y"),
+            "month_short": m.strftime("%b"),
+            "patients": patients_by_month.get(key, 0),
+            "doctors": doctors_by_month.get(key, 0),
+        }
+        for m, key in zip(months, month_keys)
+    ]
 
     # ── Monthly appointments (last 6 months) ─────────────────
-    appointment_trend = []
-    for i in range(5, -1, -1):
-        d = now - timedelta(days=30 * i)
-        m, y = d.month, d.year
-        count = db.query(Appointment).filter(
-            extract('month', Appointment.created_at) == m,
-            extract('year', Appointment.created_at) == y,
-        ).count()
-        appointment_trend.append({
-            "month": d.strftime("%b %Y"),
-            "month_short": d.strftime("%b"),
-            "count": count,
-        })
-
-    # ── Appointment status distribution ───────────────────────
-    status_rows = (
-        db.query(Appointment.status, func.count(Appointment.id))
-        .group_by(Appointment.status)
-        .all()
-    )
-    appointment_statuses = {s: c for s, c in status_rows}
-
-    # ── AI consultation severity breakdown ────────────────────
-    severity_rows = (
-        db.query(AIConsultation.severity, func.count(AIConsultation.id))
-        .filter(AIConsultation.severity.isnot(None))
-        .group_by(AIConsultation.severity)
-        .all()
-    )
-    ai_severity = {s: c for s, c in severity_rows}
+    appointment_trend = [
+        {
+            "month": m.strftime("%b %Y"),
+            "month_short": m.strftime("%b"),
+            "count": appointments_by_month.get(key, 0),
+        }
+        for m, key in zip(months[-6:], month_keys[-6:])
+    ]
 
     # ── Top specializations (by doctor count) ─────────────────
     spec_rows = (
@@ -364,62 +390,57 @@ async def get_overview_stats(db: Session = Depends(get_db)):
     )
     top_specializations = [{"name": s, "count": c} for s, c in spec_rows]
 
-    # ── Recent registrations (last 10) ────────────────────────
+    # ── Recent registrations (5 newest of each, last 10) ──────
     recent_patients = (
-        db.query(Patient.id, Patient.name, Patient.email, Patient.created_at)
+        select(literal("patient").label("type"), Patient.name, Patient.email.label("detail"), Patient.created_at)
         .order_by(Patient.created_at.desc())
         .limit(5)
-        .all()
+        .subquery()
     )
     recent_doctors = (
-        db.query(Doctor.id, Doctor.name, Doctor.specialization, Doctor.created_at)
+        select(literal("doctor").label("type"), Doctor.name, Doctor.specialization.label("detail"), Doctor.created_at)
         .order_by(Doctor.created_at.desc())
         .limit(5)
-        .all()
+        .subquery()
     )
-
-    recent_registrations = []
-    for p in recent_patients:
-        recent_registrations.append({
-            "type": "patient",
-            "name": p.name,
-            "detail": p.email,
-            "date": p.created_at.isoformat() if p.created_at else None,
-        })
-    for d in recent_doctors:
-        recent_registrations.append({
-            "type": "doctor",
-            "name": d.name,
-            "detail": d.specialization,
-            "date": d.created_at.isoformat() if d.created_at else None,
-        })
+    recent_rows = db.execute(union_all(select(*recent_patients.c), select(*recent_doctors.c))).all()
+
+    recent_registrations = [
+        {
+            "type": r.type,
+            "name": r.name,
+            "detail": r.detail,
+            "date": r.created_at.isoformat() if r.created_at else None,
+        }
+        for r in recent_rows
+    ]
     # Sort by date descending
     recent_registrations.sort(key=lambda x: x["date"] or "", reverse=True)
     recent_registrations = recent_registrations[:10]
 
     return {
         "kpi": {
-            "total_patients": total_patients,
-            "active_patients": active_patients,
-            "patient_growth": patient_growth,
+            "total_patients": counts["total_patients"],
+            "active_patients": counts["active_patients"],
+            "patient_growth": _growth(patients_this_month, patients_by_month.get(last_month, 0)),
             "patients_this_month": patients_this_month,
-            "total_doctors": total_doctors,
-            "approved_doctors": approved_doctors,
-            "doctor_growth": doctor_growth,
-            "total_appointments": total_appointments,
+            "total_doctors": counts["total_doctors"],
+            "approved_doctors": counts["approved_doctors"],
+            "doctor_growth": _growth(doctors_by_month.get(this_month, 0), doctors_by_month.get(last_month, 0)),
+            "total_appointments": counts["total_appointments"],
             "appointments_this_month": appointments_this_month,
-            "appt_growth": appt_growth,
-            "total_prescriptions": total_prescriptions,
-            "total_ai_consultations": total_ai_consultations,
+            "appt_growth": _growth(appointments_this_month, appointments_by_month.get(last_month, 0)),
+            "total_prescriptions": counts["total_prescriptions"],
+            "total_ai_consultations": counts["total_ai_consultations"],
             "ai_this_month": ai_this_month,
-            "ai_growth": ai_growth,
-            "total_pharmacies": total_pharmacies,
-            "total_clinics": total_clinics,
+            "ai_growth": _growth(ai_this_month, ai_by_month.get(last_month, 0)),
+            "total_pharmacies": counts["total_pharmacies"],
+            "total_clinics": counts["total_clinics"],
         },
         "registration_trend": registration_trend,
         "appointment_trend": appointment_trend,
-        "appointment_statuses": appointment_statuses,
-        "ai_severity": ai_severity,
+        "appointment_statuses": breakdowns.get("appointment_statuses", {}),
+        "ai_severity": breakdowns.get("ai_severity", {}),
         "top_specializations": top_specializations,
         "recent_registrations": recent_registrations,
     }
@@ -534,6 +555,7 @@ async def create_specialization(data: SpecializationCreate, db: Session = Depend
         is_active=data.is_active,
     )
     db.add(spec)
+    lookup_cache.bump_version(db)
     db.commit()
     db.refresh(spec)
     return SpecializationOut.model_validate(spec)
@@ -562,6 +584,7 @@ async def update_specialization(
     spec.description = data.description
     spec.is_active = data.is_active
 
+    lookup_cache.bump_version(db)
     db.commit()
     db.refresh(spec)
     return SpecializationOut.model_validate(spec)
@@ -573,6 +596,7 @@ async def delete_specialization(spec_id: int, db: Session = Depends(get_db)):
     if not spec:
         raise HTTPException(status_code=404, detail="Specialization not found")
     db.delete(spec)
+    lookup_cache.bump_version(db)
     db.commit()
     return
 
@@ -598,8 +622,10 @@ async def create_symptom(data: SymptomCreate, db: Session = Depends(get_db)):
         is_active=data.is_active,
     )
     db.add(item)
+    version = lookup_cache.bump_version(db)
     db.commit()
     db.refresh(item)
+    symptom_index.upsert_symptom(item.name, item.specialization, item.is_active, version=version)
     return SymptomOut.model_validate(item)
 
 
@@ -621,13 +647,19 @@ async def update_symptom(
                 detail="Another symptom with this name already exists",
             )
 
+    previous_name = item.name
     item.name = data.name
     item.description = data.description
     item.specialization = data.specialization
     item.is_active = data.is_active
 
+    version = lookup_cache.bump_version(db)
     db.commit()
     db.refresh(item)
+    symptom_index.upsert_symptom(
+        item.name, item.specialization, item.is_active,
+        previous_name=previous_name, version=version,
+    )
     return SymptomOut.model_validate(item)
 
 
@@ -636,8 +668,11 @@ async def delete_symptom(symptom_id: int, db: Session = Depends(get_db)):
     item = db.query(Symptom).filter(Symptom.id == symptom_id).first()
     if not item:
         raise HTTPException(status_code=404, detail="Symptom not found")
+    name = item.name
     db.delete(item)
+    version = lookup_cache.bump_version(db)
     db.commit()
+    symptom_index.remove_symptom(name, version=version)
     return
 
 
@@ -811,3 +846,64 @@ async def update_clinic_status(
     db.refresh(clinic)
 
     return ClinicResponse.model_validate(clinic)
+
+
+# ── AI Metrics ──────────────────────────────────────────────────
+
+@router.get("/ai/metrics")
+async def get_ai_metrics():
+    """
+    In-process AI metrics for this worker: per-step timings (ai_step_seconds),
+    LLM latency, token usage and errors per route, plus malformed structured
+    outputs per task.
+    """
+    return metrics.snapshot()
+
+
+# ── AI Batch Analysis ──────────────────────────────────────────────────
+
+class BatchAnalysisRequest(BaseModel):
+    """Either free-text descriptions or stored consultations to re-analyze"""
+    descriptions: Optional[List[str]] = Field(None, description="Descriptions to analyze; results are returned on the job")
+    consultation_ids: Optional[List[int]] = Field(None, description="ai_consultations rows to re-score in place")
+
+
+@router.post("/ai/batch-analysis", status_code=status.HTTP_202_ACCEPTED)
+async def start_batch_analysis(request: BatchAnalysisRequest, background_tasks: BackgroundTasks):
+    """
+    Start a batch symptom-analysis job (backfills, re-scoring after a
+    knowledge-base update). Poll GET /ai/batch-analysis/{job_id} for progress.
+    """
+    if bool(request.descriptions) == bool(request.consultation_ids):
+        raise HTTPException(status_code=400, detail="Provide either descriptions or consultation_ids")
+
+    # Keep the first occurrence of each id, in request order
+    consultation_ids = list(dict.fromkeys(request.consultation_ids or []))
+    descriptions = [text.strip() for text in request.descriptions or []]
+    if any(not text for text in descriptions):
+        raise HTTPException(status_code=400, detail="Descriptions must not be empty")
+
+    total = len(consultation_ids) or len(descriptions)
+    if total > settings.BATCH_ANALYSIS_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BATCH_ANALYSIS_MAX_ITEMS} items per job",
+        )
+
+    job = jobs.create("batch_analysis", total)
+    background_tasks.add_task(
+        batch_analysis.run,
+        job,
+        descriptions=descriptions or None,
+        consultation_ids=consultation_ids or None,
+    )
+    return job.to_dict(include_results=False)
+
+
+@router.get("/ai/batch-analysis/{job_id}")
+async def get_batch_analysis(job_id: str, include_results: bool = True):
+    """Progress of a batch analysis job, with per-description results or per-consultation failures"""
+    job = jobs.get(job_id)
+    if not job or job.kind != "batch_analysis":
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict(include_results=include_results)
@@ -1,8 +1,8 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy import update
 from sqlalchemy.orm import Session
 from datetime import date, time, datetime, timedelta
 from typing import List, Optional
-import json
 
 from app.db import get_db
 from app.models import Appointment, Doctor, Patient
@@ -14,6 +14,12 @@ from app.schemas.appointment import (
 )
 from app.services import get_current_patient, get_current_doctor
 from app.services.email_service import send_appointment_confirmation_email
+from app.services.schedule import (
+    parse_schedule,
+    get_day_name,
+    get_day_schedule,
+    generate_time_slots,
+)
 
 # ---------------------------------------------------------------------------
 # Appointment Routes
@@ -24,58 +30,6 @@ from app.services.email_service import send_appointment_confirmation_email
 router = APIRouter(prefix="/api/appointments", tags=["appointments"])
 
 
-def parse_schedule(schedule_json: Optional[str]) -> dict:
-    """Parse doctor schedule JSON and return default if None."""
-    if not schedule_json:
-        # Default schedule: Mon-Fri, 9 AM - 5 PM
-        return {
-            "Mon": {"enabled": True, "start": "09:00", "end": "17:00"},
-            "Tue": {"enabled": True, "start": "09:00", "end": "17:00"},
-            "Wed": {"enabled": True, "start": "09:00", "end": "17:00"},
-            "Thu": {"enabled": True, "start": "09:00", "end": "17:00"},
-            "Fri": {"enabled": True, "start": "09:00", "end": "17:00"},
-            "Sat": {"enabled": False, "start": "09:00", "end": "17:00"},
-            "Sun": {"enabled": False, "start": "09:00", "end": "17:00"},
-        }
-    try:
-        return json.loads(schedule_json)
-    except (json.JSONDecodeError, TypeError):
-        # Return default if parsing fails
-        return {
-            "Mon": {"enabled": True, "start": "09:00", "end": "17:00"},
-            "Tue": {"enabled": True, "start": "09:00", "end": "17:00"},
-            "Wed": {"enabled": True, "start": "09:00", "end": "17:00"},
-            "Thu": {"enabled": True, "start": "09:00", "end": "17:00"},
-            "Fri": {"enabled": True, "start": "09:00", "end": "17:00"},
-            "Sat": {"enabled": False, "start": "09:00", "end": "17:00"},
-            "Sun": {"enabled": False, "start": "09:00", "end": "17:00"},
-        }
-
-
-def get_day_name(date_obj: date) -> str:
-    """Get day name abbreviation (Mon, Tue, etc.) - always in English."""
-    # Use weekday number to map to day name (most reliable)
-    weekday_map = {0: "Mon", 1: "Tue", 2: "Wed", 3: "Thu", 4: "Fri", 5: "Sat", 6: "Sun"}
-    return weekday_map[date_obj.weekday()]
-
-
-def generate_time_slots(start_time: str, end_time: str, slot_duration_minutes: int = 60) -> List[time]:
-    """Generate time slots between start and end time. Default is 1 hour slots."""
-    slots = []
-    start_hour, start_min = map(int, start_time.split(":"))
-    end_hour, end_min = map(int, end_time.split(":"))
-    
-    start_dt = datetime(2000, 1, 1, start_hour, start_min)
-    end_dt = datetime(2000, 1, 1, end_hour, end_min)
-    
-    current = start_dt
-    while current < end_dt:
-        slots.append(current.time())
-        current += timedelta(minutes=slot_duration_minutes)
-    
-    return slots
-
-
 @router.get("/doctors/{doctor_id}/available-slots", response_model=List[AvailableSlot])
 async def get_available_slots(
     doctor_id: int,
@@ -112,17 +66,7 @@ async def get_available_slots(
     
     # Check if doctor works on this day
     # Try both abbreviated and full day names
-    day_schedule = schedule.get(day_name, {})
-    
-    # If not found with abbreviation, try full day name
-    if not day_schedule:
-        full_day_map = {
-            "Mon": "Monday", "Tue": "Tuesday", "Wed": "Wednesday",
-            "Thu": "Thursday", "Fri": "Friday", "Sat": "Saturday", "Sun": "Sunday"
-        }
-        full_day_name = full_day_map.get(day_name)
-        if full_day_name:
-            day_schedule = schedule.get(full_day_name, {})
+    day_schedule = get_day_schedule(schedule, selected_date)
     
     print(f"DEBUG: Day schedule: {day_schedule}")
     
@@ -238,41 +182,101 @@ async def book_appointment(
     )
 
 
+# Columns of a DoctorAppointmentResponse, selected together with the patient
+# in one joined query instead of a patient lookup per appointment
+_DOCTOR_APPOINTMENT_COLUMNS = (
+    Appointment.id.label("id"),
+    Appointment.date.label("date"),
+    Appointment.time.label("time"),
+    Appointment.status.label("status"),
+    Appointment.reason.label("reason"),
+    Appointment.symptoms.label("symptoms"),
+    Appointment.created_at.label("created_at"),
+    Appointment.updated_at.label("updated_at"),
+    Patient.name.label("patient_name"),
+    Patient.email.label("patient_email"),
+    Patient.phone.label("patient_phone"),
+)
+
+
+def _doctor_appointment_response(row, **changes) -> DoctorAppointmentResponse:
+    """Build the response from a _DOCTOR_APPOINTMENT_COLUMNS row (with changed fields applied)"""
+    data = {**row._mapping, **changes}
+    return DoctorAppointmentResponse(
+        id=data["id"],
+        appointment_date=data["date"],
+        appointment_time=data["time"],
+        status=data["status"],
+        reason=data["reason"],
+        symptoms=data["symptoms"],
+        patient_name=data["patient_name"] or "Unknown",
+        patient_email=data["patient_email"] or "",
+        patient_phone=data["patient_phone"] or "",
+        created_at=data["created_at"],
+        updated_at=data["updated_at"],
+    )
+
+
+def _get_doctor_appointment(db: Session, appointment_id: int, doctor_id: int):
+    """One of the doctor's appointments with its patient, or 404"""
+    row = (
+        db.query(*_DOCTOR_APPOINTMENT_COLUMNS)
+        .outerjoin(Patient, Patient.id == Appointment.patient_id)
+        .filter(Appointment.id == appointment_id, Appointment.doctor_id == doctor_id)
+        .first()
+    )
+    if not row:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Appointment not found"
+        )
+    return row
+
+
+def _set_appointment_status(db: Session, appointment_id: int, new_status: str) -> Optional[datetime]:
+    """Update the status and return the new updated_at"""
+    updated_at = db.execute(
+        update(Appointment)
+        .where(Appointment.id == appointment_id)
+        .values(status=new_status)
+        .returning(Appointment.updated_at)
+    ).scalar()
+    db.commit()
+    return updated_at
+
+
 @router.get("/doctors/my-appointments", response_model=List[DoctorAppointmentResponse])
 async def get_doctor_appointments(
     status_filter: Optional[str] = Query(None, alias="status_filter"),
+    date_from: Optional[date] = Query(None, description="Only appointments on or after this date"),
+    date_to: Optional[date] = Query(None, description="Only appointments on or before this date"),
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size (all appointments when omitted)"),
     current_doctor: Doctor = Depends(get_current_doctor),
     db: Session = Depends(get_db),
 ):
     """
-    Get all appointments for the current doctor, optionally filtered by status.
+    Get the current doctor's appointments, newest first, optionally filtered
+    by status and date range and paginated with skip/limit.
     """
-    query = db.query(Appointment).filter(Appointment.doctor_id == current_doctor.id)
+    query = (
+        db.query(*_DOCTOR_APPOINTMENT_COLUMNS)
+        .join(Patient, Patient.id == Appointment.patient_id)
+        .filter(Appointment.doctor_id == current_doctor.id)
+    )
     
     if status_filter:
         query = query.filter(Appointment.status == status_filter)
+    if date_from:
+        query = query.filter(Appointment.date >= date_from)
+    if date_to:
+        query = query.filter(Appointment.date <= date_to)
     
-    appointments = query.order_by(Appointment.date.desc(), Appointment.time.desc()).all()
+    query = query.order_by(Appointment.date.desc(), Appointment.time.desc(), Appointment.id.desc()).offset(skip)
+    if limit:
+        query = query.limit(limit)
     
-    results = []
-    for apt in appointments:
-        patient = db.query(Patient).filter(Patient.id == apt.patient_id).first()
-        if patient:
-            results.append(DoctorAppointmentResponse(
-                id=apt.id,
-                appointment_date=apt.date,
-                appointment_time=apt.time,
-                status=apt.status,
-                reason=apt.reason,
-                symptoms=apt.symptoms,
-                patient_name=patient.name,
-                patient_email=patient.email,
-                patient_phone=patient.phone,
-                created_at=apt.created_at,
-                updated_at=apt.updated_at,
-            ))
-    
-    return results
+    return [_doctor_appointment_response(row) for row in query.all()]
 
 
 @router.patch("/{appointment_id}/confirm", response_model=DoctorAppointmentResponse)
@@ -284,16 +288,7 @@ async def confirm_appointment(
     """
     Confirm an appointment (doctor action).
     """
-    appointment = db.query(Appointment).filter(
-        Appointment.id == appointment_id,
-        Appointment.doctor_id == current_doctor.id
-    ).first()
-    
-    if not appointment:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Appointment not found"
-        )
+    appointment = _get_doctor_appointment(db, appointment_id, current_doctor.id)
     
     if appointment.status == "Cancelled":
         raise HTTPException(
@@ -301,40 +296,26 @@ async def confirm_appointment(
             detail="Cannot confirm a cancelled appointment"
         )
     
-    appointment.status = "Confirmed"
-    db.commit()
-    db.refresh(appointment)
-    
-    patient = db.query(Patient).filter(Patient.id == appointment.patient_id).first()
+    # Email details are read before the commit expires current_doctor
+    email_data = {
+        "patient_name": appointment.patient_name,
+        "doctor_name": current_doctor.name,
+        "doctor_specialization": current_doctor.specialization,
+        "appointment_date": appointment.date,
+        "appointment_time": appointment.time,
+        "reason": appointment.reason,
+        "symptoms": appointment.symptoms,
+    }
+    updated_at = _set_appointment_status(db, appointment.id, "Confirmed")
 
     # Send confirmation email to patient (non-blocking)
-    if patient and patient.email:
+    if appointment.patient_email:
         await send_appointment_confirmation_email(
-            patient_email=patient.email,
-            data={
-                "patient_name": patient.name,
-                "doctor_name": current_doctor.name,
-                "doctor_specialization": current_doctor.specialization,
-                "appointment_date": appointment.date,
-                "appointment_time": appointment.time,
-                "reason": appointment.reason,
-                "symptoms": appointment.symptoms,
-            },
+            patient_email=appointment.patient_email,
+            data=email_data,
         )
 
-    return DoctorAppointmentResponse(
-        id=appointment.id,
-        appointment_date=appointment.date,
-        appointment_time=appointment.time,
-        status=appointment.status,
-        reason=appointment.reason,
-        symptoms=appointment.symptoms,
-        patient_name=patient.name if patient else "Unknown",
-        patient_email=patient.email if patient else "",
-        patient_phone=patient.phone if patient else "",
-        created_at=appointment.created_at,
-        updated_at=appointment.updated_at,
-    )
+    return _doctor_appointment_response(appointment, status="Confirmed", updated_at=updated_at)
 
 
 @router.patch("/{appointment_id}/cancel", response_model=DoctorAppointmentResponse)
@@ -346,35 +327,9 @@ async def cancel_appointment(
     """
     Cancel an appointment (doctor action).
     """
-    appointment = db.query(Appointment).filter(
-        Appointment.id == appointment_id,
-        Appointment.doctor_id == current_doctor.id
-    ).first()
-    
-    if not appointment:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Appointment not found"
-        )
-    
-    appointment.status = "Cancelled"
-    db.commit()
-    db.refresh(appointment)
-    
-    patient = db.query(Patient).filter(Patient.id == appointment.patient_id).first()
-    return DoctorAppointmentResponse(
-        id=appointment.id,
-        appointment_date=appointment.date,
-        appointment_time=appointment.time,
-        status=appointment.status,
-        reason=appointment.reason,
-        symptoms=appointment.symptoms,
-        patient_name=patient.name if patient else "Unknown",
-        patient_email=patient.email if patient else "",
-        patient_phone=patient.phone if patient else "",
-        created_at=appointment.created_at,
-        updated_at=appointment.updated_at,
-    )
+    appointment = _get_doctor_appointment(db, appointment_id, current_doctor.id)
+    updated_at = _set_appointment_status(db, appointment.id, "Cancelled")
+    return _doctor_appointment_response(appointment, status="Cancelled", updated_at=updated_at)
 
 
 @router.patch("/{appointment_id}/complete", response_model=DoctorAppointmentResponse)
@@ -387,16 +342,7 @@ async def complete_appointment(
     Mark an appointment as completed (doctor action).
     Also closes the associated LiveKit room if configured.
     """
-    appointment = db.query(Appointment).filter(
-        Appointment.id == appointment_id,
-        Appointment.doctor_id == current_doctor.id
-    ).first()
-    
-    if not appointment:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Appointment not found"
-        )
+    appointment = _get_doctor_appointment(db, appointment_id, current_doctor.id)
     
     if appointment.status != "Confirmed":
         raise HTTPException(
@@ -404,9 +350,7 @@ async def complete_appointment(
             detail="Only confirmed appointments can be marked as completed"
         )
     
-    appointment.status = "Completed"
-    db.commit()
-    db.refresh(appointment)
+    updated_at = _set_appointment_status(db, appointment.id, "Completed")
     
     # Close LiveKit room if configured
     try:
@@ -438,18 +382,4 @@ async def complete_appointment(
         print(f"Error during LiveKit room cleanup: {e}")
         # Don't fail the appointment completion if room deletion fails
     
-    patient = db.query(Patient).filter(Patient.id == appointment.patient_id).first()
-    return DoctorAppointmentResponse(
-        id=appointment.id,
-        appointment_date=appointment.date,
-        appointment_time=appointment.time,
-        status=appointment.status,
-        reason=appointment.reason,
-        symptoms=appointment.symptoms,
-        patient_name=patient.name if patient else "Unknown",
-        patient_email=patient.email if patient else "",
-        patient_phone=patient.phone if patient else "",
-        created_at=appointment.created_at,
-        updated_at=appointment.updated_at,
-    )
-
+    return _doctor_appointment_response(appointment, status="Completed", updated_at=updated_at)
@@ -28,12 +28,44 @@ router = APIRouter(prefix="/api/lab-quotations", tags=["lab-quotations"])
 
 
 # ── Helpers ─────────────────────────────────────────────────────────
+#
+# Request listings are enriched in bulk: the related patients, clinics,
+# prescriptions (with their doctor) and responses are each loaded with one
+# IN (...) query for the whole page and joined up in memory, instead of
+# four or five lookups per row.
+
+def _load_lookups(requests: List[LQReqModel], responses: List[LQResModel], db: Session) -> dict:
+    """Display columns for everything the requests/responses reference, keyed by id"""
+    patient_ids = {qr.patient_id for qr in requests}
+    clinic_ids = {qr.clinic_id for qr in requests} | {qres.clinic_id for qres in responses}
+    prescription_ids = {qr.prescription_id for qr in requests}
+
+    patients = (
+        db.query(Patient.id, Patient.name, Patient.phone).filter(Patient.id.in_(patient_ids)).all()
+        if patient_ids else []
+    )
+    clinics = (
+        db.query(Clinic.id, Clinic.clinic_name).filter(Clinic.id.in_(clinic_ids)).all()
+        if clinic_ids else []
+    )
+    prescriptions = (
+        db.query(Prescription.id, Prescription.diagnosis, Doctor.name.label("doctor_name"))
+        .outerjoin(Doctor, Doctor.id == Prescription.doctor_id)
+        .filter(Prescription.id.in_(prescription_ids))
+        .all()
+        if prescription_ids else []
+    )
+    return {
+        "patients": {row.id: row for row in patients},
+        "clinics": {row.id: row for row in clinics},
+        "prescriptions": {row.id: row for row in prescriptions},
+    }
 
-def _enrich_request(qr: LQReqModel, db: Session) -> LabQuotationRequestOut:
-    patient = db.query(Patient).filter(Patient.id == qr.patient_id).first()
-    clinic = db.query(Clinic).filter(Clinic.id == qr.clinic_id).first()
-    rx = db.query(Prescription).filter(Prescription.id == qr.prescription_id).first()
-    doctor = db.query(Doctor).filter(Doctor.id == rx.doctor_id).first() if rx else None
+
+def _request_out(qr: LQReqModel, lookups: dict) -> LabQuotationRequestOut:
+    patient = lookups["patients"].get(qr.patient_id)
+    clinic = lookups["clinics"].get(qr.clinic_id)
+    rx = lookups["prescriptions"].get(qr.prescription_id)
 
     return LabQuotationRequestOut(
         id=qr.id,
@@ -48,13 +80,13 @@ def _enrich_request(qr: LQReqModel, db: Session) -> LabQuotationRequestOut:
         patient_name=patient.name if patient else None,
         patient_phone=patient.phone if patient else None,
         clinic_name=clinic.clinic_name if clinic else None,
-        doctor_name=doctor.name if doctor else None,
+        doctor_name=rx.doctor_name if rx else None,
         diagnosis=rx.diagnosis if rx else None,
     )
 
 
-def _enrich_response(qres: LQResModel, db: Session) -> LabQuotationResponseOut:
-    clinic = db.query(Clinic).filter(Clinic.id == qres.clinic_id).first()
+def _response_out(qres: LQResModel, lookups: dict) -> LabQuotationResponseOut:
+    clinic = lookups["clinics"].get(qres.clinic_id)
     return LabQuotationResponseOut(
         id=qres.id,
         request_id=qres.request_id,
@@ -70,6 +102,36 @@ def _enrich_response(qres: LQResModel, db: Session) -> LabQuotationResponseOut:
     )
 
 
+def _enrich_request(qr: LQReqModel, db: Session) -> LabQuotationRequestOut:
+    return _request_out(qr, _load_lookups([qr], [], db))
+
+
+def _enrich_response(qres: LQResModel, db: Session) -> LabQuotationResponseOut:
+    return _response_out(qres, _load_lookups([], [qres], db))
+
+
+def _enrich_full(requests: List[LQReqModel], db: Session) -> List[LabQuotationFull]:
+    """Requests with their response (if any), in the given order"""
+    if not requests:
+        return []
+    responses = (
+        db.query(LQResModel)
+        .filter(LQResModel.request_id.in_([qr.id for qr in requests]))
+        .all()
+    )
+    by_request = {qres.request_id: qres for qres in responses}
+
+    lookups = _load_lookups(requests, responses, db)
+    results = []
+    for qr in requests:
+        qres = by_request.get(qr.id)
+        results.append(LabQuotationFull(
+            request=_request_out(qr, lookups),
+            response=_response_out(qres, lookups) if qres else None,
+        ))
+    return results
+
+
 # ═══════════════════════════════════════════════════════════════════
 # PATIENT ENDPOINTS
 # ═══════════════════════════════════════════════════════════════════
@@ -155,14 +217,7 @@ async def get_my_lab_quotation_requests(
         .all()
     )
 
-    results = []
-    for qr in requests:
-        enriched_req = _enrich_request(qr, db)
-        qres = db.query(LQResModel).filter(LQResModel.request_id == qr.id).first()
-        enriched_res = _enrich_response(qres, db) if qres else None
-        results.append(LabQuotationFull(request=enriched_req, response=enriched_res))
-
-    return results
+    return _enrich_full(requests, db)
 
 
 @router.get("/patient/prescription/{prescription_id}", response_model=List[LabQuotationFull])
@@ -182,14 +237,7 @@ async def get_lab_quotations_for_prescription(
         .all()
     )
 
-    results = []
-    for qr in requests:
-        enriched_req = _enrich_request(qr, db)
-        qres = db.query(LQResModel).filter(LQResModel.request_id == qr.id).first()
-        enriched_res = _enrich_response(qres, db) if qres else None
-        results.append(LabQuotationFull(request=enriched_req, response=enriched_res))
-
-    return results
+    return _enrich_full(requests, db)
 
 
 @router.patch("/patient/{request_id}/accept", response_model=LabQuotationRequestOut)
@@ -252,13 +300,7 @@ async def get_clinic_requests(
         q = q.filter(LQReqModel.status == status_filter)
     requests = q.order_by(LQReqModel.created_at.desc()).all()
 
-    results = []
-    for qr in requests:
-        enriched_req = _enrich_request(qr, db)
-        qres = db.query(LQResModel).filter(LQResModel.request_id == qr.id).first()
-        enriched_res = _enrich_response(qres, db) if qres else None
-        results.append(LabQuotationFull(request=enriched_req, response=enriched_res))
-    return results
+    return _enrich_full(requests, db)
 
 
 @router.get("/clinic/request/{request_id}", response_model=LabQuotationFull)
@@ -275,10 +317,7 @@ async def get_clinic_request_detail(
     if not qr:
         raise HTTPException(status_code=404, detail="Request not found")
 
-    enriched_req = _enrich_request(qr, db)
-    qres = db.query(LQResModel).filter(LQResModel.request_id == qr.id).first()
-    enriched_res = _enrich_response(qres, db) if qres else None
-    return LabQuotationFull(request=enriched_req, response=enriched_res)
+    return _enrich_full([qr], db)[0]
 
 
 @router.post("/clinic/respond", response_model=LabQuotationResponseOut, status_code=status.HTTP_201_CREATED)
@@ -5,7 +5,7 @@ Reports are emailed to patients with a PDF attachment.
 
 from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
 from fastapi.responses import StreamingResponse
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, load_only
 from typing import List
 from io import BytesIO
 import json
@@ -26,12 +26,27 @@ router = APIRouter(prefix="/api/lab-reports", tags=["lab-reports"])
 
 # ── Helpers ─────────────────────────────────────────────────
 
-def _enrich_report(report: LabReport, db: Session) -> LabReportOut:
-    clinic = db.query(Clinic).filter(Clinic.id == report.clinic_id).first()
-    patient = db.query(Patient).filter(Patient.id == report.patient_id).first()
-    rx = db.query(Prescription).filter(Prescription.id == report.prescription_id).first()
-    doctor = db.query(Doctor).filter(Doctor.id == rx.doctor_id).first() if rx else None
+def _query_reports(db: Session):
+    """(LabReport, Clinic, Patient, Prescription, Doctor) rows from one joined query, loading only the columns the builders use"""
+    return (
+        db.query(LabReport, Clinic, Patient, Prescription, Doctor)
+        .outerjoin(Clinic, Clinic.id == LabReport.clinic_id)
+        .outerjoin(Patient, Patient.id == LabReport.patient_id)
+        .outerjoin(Prescription, Prescription.id == LabReport.prescription_id)
+        .outerjoin(Doctor, Doctor.id == Prescription.doctor_id)
+        .options(
+            load_only(
+                Clinic.id, Clinic.clinic_name, Clinic.phone,
+                Clinic.street_address, Clinic.city, Clinic.state, Clinic.postal_code,
+            ),
+            load_only(Patient.id, Patient.name, Patient.age, Patient.gender, Patient.phone, Patient.email),
+            load_only(Prescription.id, Prescription.doctor_id, Prescription.diagnosis),
+            load_only(Doctor.id, Doctor.name, Doctor.specialization),
+        )
+    )
 
+
+def _enrich_report(report: LabReport, clinic: Clinic, patient: Patient, rx: Prescription, doctor: Doctor) -> LabReportOut:
     return LabReportOut(
         id=report.id,
         request_id=report.request_id,
@@ -49,13 +64,8 @@ def _enrich_report(report: LabReport, db: Session) -> LabReportOut:
     )
 
 
-def _build_pdf_data(report: LabReport, db: Session) -> dict:
+def _build_pdf_data(report: LabReport, clinic: Clinic, patient: Patient, rx: Prescription, doctor: Doctor) -> dict:
     """Build the dict expected by generate_lab_report_pdf."""
-    clinic = db.query(Clinic).filter(Clinic.id == report.clinic_id).first()
-    patient = db.query(Patient).filter(Patient.id == report.patient_id).first()
-    rx = db.query(Prescription).filter(Prescription.id == report.prescription_id).first()
-    doctor = db.query(Doctor).filter(Doctor.id == rx.doctor_id).first() if rx else None
-
     address_parts = [clinic.street_address, clinic.city, clinic.state, clinic.postal_code] if clinic else []
     clinic_address = ", ".join([p for p in address_parts if p])
 
@@ -125,15 +135,15 @@ async def submit_lab_report(
     # Update request status to "completed"
     qr.status = "completed"
     db.commit()
-    db.refresh(report)
 
-    # Build email data and send
-    patient = db.query(Patient).filter(Patient.id == qr.patient_id).first()
+    # Reload with the related rows; the same row feeds the email PDF and the response
+    row = _query_reports(db).filter(LabReport.request_id == payload.request_id).first()
+    patient = row.Patient
     if patient and patient.email:
-        pdf_data = _build_pdf_data(report, db)
+        pdf_data = _build_pdf_data(*row)
         background_tasks.add_task(send_lab_report_email, patient.email, pdf_data)
 
-    return _enrich_report(report, db)
+    return _enrich_report(*row)
 
 
 @router.get("/clinic/request/{request_id}", response_model=LabReportOut)
@@ -143,13 +153,13 @@ async def get_clinic_report_for_request(
     db: Session = Depends(get_db),
 ):
     """Get the lab report submitted by this clinic for a given request."""
-    report = db.query(LabReport).filter(
+    row = _query_reports(db).filter(
         LabReport.request_id == request_id,
         LabReport.clinic_id == current_clinic.id,
     ).first()
-    if not report:
+    if not row:
         raise HTTPException(status_code=404, detail="No report found for this request")
-    return _enrich_report(report, db)
+    return _enrich_report(*row)
 
 
 # ═══════════════════════════════════════════════════════════
@@ -163,8 +173,8 @@ async def get_patient_reports_for_prescription(
     db: Session = Depends(get_db),
 ):
     """Get all lab reports for a prescription belonging to the current patient."""
-    reports = (
-        db.query(LabReport)
+    rows = (
+        _query_reports(db)
         .filter(
             LabReport.prescription_id == prescription_id,
             LabReport.patient_id == current_patient.id,
@@ -172,7 +182,7 @@ async def get_patient_reports_for_prescription(
         .order_by(LabReport.created_at.desc())
         .all()
     )
-    return [_enrich_report(r, db) for r in reports]
+    return [_enrich_report(*row) for row in rows]
 
 
 @router.get("/patient/request/{request_id}", response_model=LabReportOut)
@@ -182,13 +192,13 @@ async def get_patient_report_for_request(
     db: Session = Depends(get_db),
 ):
     """Get the lab report for a specific quotation request."""
-    report = db.query(LabReport).filter(
+    row = _query_reports(db).filter(
         LabReport.request_id == request_id,
         LabReport.patient_id == current_patient.id,
     ).first()
-    if not report:
+    if not row:
         raise HTTPException(status_code=404, detail="No report found for this request")
-    return _enrich_report(report, db)
+    return _enrich_report(*row)
 
 
 @router.get("/patient/request/{request_id}/pdf")
@@ -198,21 +208,21 @@ async def download_lab_report_pdf(
     db: Session = Depends(get_db),
 ):
     """Download the lab report as a PDF for a given request."""
-    report = db.query(LabReport).filter(
+    row = _query_reports(db).filter(
         LabReport.request_id == request_id,
         LabReport.patient_id == current_patient.id,
     ).first()
-    if not report:
+    if not row:
         raise HTTPException(status_code=404, detail="No report found for this request")
 
-    pdf_data = _build_pdf_data(report, db)
+    pdf_data = _build_pdf_data(*row)
     pdf_bytes = generate_lab_report_pdf(pdf_data)
 
     return StreamingResponse(
         BytesIO(pdf_bytes),
         media_type="application/pdf",
         headers={
-            "Content-Disposition": f'attachment; filename="LabReport_{report.id}.pdf"',
+            "Content-Disposition": f'attachment; filename="LabReport_{row.LabReport.id}.pdf"',
         },
     )
 
@@ -224,20 +234,20 @@ async def clinic_download_lab_report_pdf(
     db: Session = Depends(get_db),
 ):
     """Clinic downloads the lab report PDF for a given request."""
-    report = db.query(LabReport).filter(
+    row = _query_reports(db).filter(
         LabReport.request_id == request_id,
         LabReport.clinic_id == current_clinic.id,
     ).first()
-    if not report:
+    if not row:
         raise HTTPException(status_code=404, detail="No report found for this request")
 
-    pdf_data = _build_pdf_data(report, db)
+    pdf_data = _build_pdf_data(*row)
     pdf_bytes = generate_lab_report_pdf(pdf_data)
 
     return StreamingResponse(
         BytesIO(pdf_bytes),
         media_type="application/pdf",
         headers={
-            "Content-Disposition": f'attachment; filename="LabReport_{report.id}.pdf"',
+            "Content-Disposition": f'attachment; filename="LabReport_{row.LabReport.id}.pdf"',
         },
     )
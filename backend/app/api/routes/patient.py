@@ -1,17 +1,20 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Query
+from fastapi import (
+    APIRouter, Depends, HTTPException, status, UploadFile, File, Query, BackgroundTasks,
+    WebSocket, WebSocketDisconnect,
+)
+from sqlalchemy import func, tuple_
 from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
+from fastapi.encoders import jsonable_encoder
 from pathlib import Path
+import asyncio
+import base64
 import uuid
-import os
-import tempfile
 from typing import Optional, List
-from pydub import AudioSegment
 import json
-import speech_recognition as sr
 
-from app.db import get_db
-from app.models import Patient, Doctor, Appointment, AIConsultation, Symptom, Specialization
+from app.db import get_db, SessionLocal
+from app.models import Patient, Doctor, Appointment, AIConsultation
 from app.schemas import (
     PatientSignUp,
     PatientSignIn,
@@ -30,8 +33,12 @@ from app.schemas import (
     SpecializationMatch,
     AIConsultationHistoryItem,
     AIConsultationHistoryResponse,
+    AIConsultationSummaryItem,
+    AIConsultationSummaryPage,
     AIChatRequest,
     AIChatResponse,
+    ChatMessage,
+    ChatSessionResponse,
 )
 from app.services import (
     get_password_hash,
@@ -41,8 +48,30 @@ from app.services import (
     validate_refresh_token,
     revoke_refresh_token,
     get_current_patient,
+    decode_token,
     ai_service,
 )
+from app.services.lookup_cache import lookup_cache
+from app.services.specialization_aliases import specialization_aliases
+from app.services.doctor_ranking import doctor_ranking
+from app.services.chat_sessions import chat_sessions
+from app.services.timing import step
+from app.services.jobs import Job, jobs
+from app.services.voice_jobs import (
+    PatientLimitError,
+    QueueFullError,
+    VoiceJobError,
+    voice_jobs,
+)
+from app.services.audio import (
+    ALLOWED_AUDIO_TYPES,
+    SAMPLE_RATE,
+    SAMPLE_WIDTH,
+    AudioDecodeError,
+    TranscriptionUnavailableError,
+    audio_pipeline,
+)
+from app.api.routes.video_call import manager as notification_manager
 from app.core.config import settings
 
 router = APIRouter(prefix="/api/patients", tags=["patients"])
@@ -379,150 +408,196 @@ async def get_patient_appointments(
 
 # ============ AI Doctor Consultation ============
 
+def _build_spec_match_map(recommended_specializations, default_reason: str = "Based on symptom analysis") -> dict:
+    """
+    Map the AI's recommended specializations onto canonical DB names.
+    Aliases such as "Cardiology" resolve to "Cardiologist"; when several
+    recommendations collapse onto one name the highest match wins.
+    """
+    spec_match_map = {}
+    for spec_info in recommended_specializations or []:
+        if isinstance(spec_info, dict):
+            name = spec_info.get("name")
+            percentage = spec_info.get("match_percentage", 75)
+            reason = spec_info.get("reason", default_reason)
+        else:
+            name, percentage, reason = spec_info, 75, default_reason
+        if not name:
+            continue
+
+        canonical = specialization_aliases.canonicalize(name)
+        current = spec_match_map.get(canonical)
+        if current is None or percentage > current["percentage"]:
+            spec_match_map[canonical] = {"percentage": percentage, "reason": reason}
+    return spec_match_map
+
+
+def _suggest_doctors(db: Session, spec_match_map: dict, default_reason: str = "Based on symptom analysis") -> List[DoctorSuggestion]:
+    """Top doctors for the matched specializations, ranked by match, rating, availability and load"""
+    with step("doctor_query"):
+        ranked_doctors = doctor_ranking.rank(db, spec_match_map, limit=10, default_reason=default_reason)
+    return [
+        DoctorSuggestion(
+            id=ranked.doctor.id,
+            name=ranked.doctor.name,
+            specialization=ranked.doctor.specialization,
+            phone=ranked.doctor.phone,
+            profile_picture=ranked.doctor.profile_picture,
+            schedule=ranked.doctor.schedule,
+            match_percentage=ranked.match_percentage,
+            match_reason=ranked.match_reason,
+            average_rating=ranked.average_rating,
+            next_available=ranked.next_available,
+        )
+        for ranked in ranked_doctors
+    ]
+
+
+def _save_chat_consultation(patient_id: int, description: str, ai_result: dict,
+                            spec_match_map: dict, health_advice: Optional[str],
+                            suggested_doctors: List[DoctorSuggestion]):
+    """Store a chat symptom analysis in the consultation history (runs after the response is sent)"""
+    db = SessionLocal()
+    try:
+        consultation_record = AIConsultation(
+            patient_id=patient_id,
+            description=description,
+            detected_symptoms=ai_result.get("detected_symptoms", []),
+            symptom_analysis=ai_result.get("symptom_analysis"),
+            recommended_specializations=[
+                {"name": k, "match_percentage": v["percentage"], "reason": v["reason"]}
+                for k, v in spec_match_map.items()
+            ],
+            severity=ai_result.get("severity"),
+            confidence=ai_result.get("confidence"),
+            additional_notes=ai_result.get("additional_notes"),
+            emergency_warning=ai_result.get("emergency_warning", False),
+            health_advice=health_advice,
+            suggested_doctors=[
+                {
+                    "id": doc.id,
+                    "name": doc.name,
+                    "specialization": doc.specialization,
+                    "phone": doc.phone,
+                    "profile_picture": doc.profile_picture,
+                    "match_percentage": doc.match_percentage,
+                    "match_reason": doc.match_reason,
+                }
+                for doc in suggested_doctors
+            ],
+            has_matching_doctors=len(suggested_doctors) > 0,
+        )
+        db.add(consultation_record)
+        db.commit()
+    except Exception as save_error:
+        db.rollback()
+        print(f"Failed to save chat consultation history: {save_error}")
+    finally:
+        db.close()
+
+
+async def _complete_chat_turn(db: Session, session, message: str, ai_result: dict) -> tuple:
+    """
+    Doctors, advice and the reply for one chat turn; the turn is appended to
+    the session. Returns (response, history_entry) where history_entry holds
+    the remaining _save_chat_consultation arguments, or None when the turn
+    is not a symptom analysis.
+    """
+    spec_match_map = {}
+    if ai_result.get("should_show_doctors") and ai_result.get("recommended_specializations"):
+        # Build specialization match map keyed by canonical DB names
+        spec_match_map = _build_spec_match_map(ai_result.get("recommended_specializations"))
+    
+    # Doctor lookup and health advice don't depend on each other, so the
+    # DB query overlaps the advice LLM call
+    pending = {}
+    if spec_match_map:
+        pending["doctors"] = asyncio.to_thread(_suggest_doctors, db, spec_match_map)
+    if ai_result.get("detected_symptoms") and not ai_result.get("emergency_warning", False):
+        pending["advice"] = asyncio.to_thread(
+            ai_service.generate_health_advice,
+            symptoms=ai_result.get("detected_symptoms", []),
+            severity=ai_result.get("severity", "moderate")
+        )
+    results = dict(zip(pending, await asyncio.gather(*pending.values())))
+    suggested_doctors = results.get("doctors", [])
+    health_advice = results.get("advice")
+    
+    # Build response
+    response = AIChatResponse(
+        response_type=ai_result.get("response_type", "conversation"),
+        message=ai_result.get("message", "I'm here to help. Could you tell me more?"),
+        detected_symptoms=ai_result.get("detected_symptoms", []),
+        symptom_analysis=ai_result.get("symptom_analysis"),
+        recommended_specializations=[
+            {"name": k, "match_percentage": v["percentage"], "reason": v["reason"]}
+            for k, v in spec_match_map.items()
+        ] if spec_match_map else [],
+        severity=ai_result.get("severity"),
+        confidence=ai_result.get("confidence"),
+        additional_notes=ai_result.get("additional_notes"),
+        emergency_warning=ai_result.get("emergency_warning", False),
+        suggested_doctors=suggested_doctors,
+        health_advice=health_advice,
+        should_show_doctors=ai_result.get("should_show_doctors", False) and len(suggested_doctors) > 0,
+        has_matching_doctors=len(suggested_doctors) > 0,
+        session_id=session.id
+    )
+    
+    chat_sessions.append(db, session, [
+        {"role": "user", "content": message},
+        {"role": "assistant", "content": response.message},
+    ])
+    
+    history_entry = None
+    if ai_result.get("response_type") == "symptom_analysis" and ai_result.get("detected_symptoms"):
+        history_entry = (message, ai_result, spec_match_map, health_advice, suggested_doctors)
+    return response, history_entry
+
+
 @router.post("/ai-chat", response_model=AIChatResponse)
 async def ai_chat(
     request: AIChatRequest,
+    background_tasks: BackgroundTasks,
     current_patient: Patient = Depends(get_current_patient),
     db: Session = Depends(get_db),
 ):
     """
     Conversational AI chat for health assistance.
-    Supports continuous conversation with context awareness.
+    Conversation state is kept server-side: clients send the session_id
+    returned by the previous reply instead of the full history.
     """
     try:
-        # Get all active specializations
-        specializations = db.query(Specialization).filter(
-            Specialization.is_active == True
-        ).all()
-        available_specs = [s.name for s in specializations]
-        
-        # Get all active symptoms with their specializations
-        symptoms = db.query(Symptom).filter(Symptom.is_active == True).all()
-        symptom_data = [
-            {
-                "name": s.name,
-                "description": s.description or "",
-                "specialization": s.specialization or "General"
-            }
-            for s in symptoms
-        ]
+        # Active specializations and symptoms from the process-wide lookup cache
+        lookups = lookup_cache.get(db)
+        specialization_aliases.sync(lookups)
+        available_specs = lookups.specializations
+        symptom_data = lookups.symptoms
         
-        # Convert conversation history to the format expected by AI service
-        conversation_history = [
-            {"role": msg.role, "content": msg.content}
-            for msg in request.conversation_history
-        ]
+        # Resume the chat session; legacy clients that still send the whole
+        # history get it stored once, when their session is created
+        session = chat_sessions.get_or_create(db, request.session_id, current_patient.id)
+        if session.message_count == 0 and request.conversation_history:
+            chat_sessions.append(db, session, [
+                {"role": msg.role, "content": msg.content}
+                for msg in request.conversation_history
+            ])
+        conversation_history = list(session.messages)
         
-        # Get AI response
-        ai_result = ai_service.chat_response(
+        # Get AI response (classification and RAG retrieval run concurrently)
+        ai_result = await ai_service.chat_response(
             user_message=request.message,
             conversation_history=conversation_history,
             available_specializations=available_specs,
-            available_symptoms=symptom_data
+            available_symptoms=symptom_data,
+            conversation_summary=session.summary
         )
         
-        # Find matching doctors if symptom analysis was performed
-        suggested_doctors = []
-        spec_match_map = {}
-        
-        if ai_result.get("should_show_doctors") and ai_result.get("recommended_specializations"):
-            # Build specialization match map
-            for spec_info in ai_result.get("recommended_specializations", []):
-                if isinstance(spec_info, dict):
-                    spec_match_map[spec_info["name"]] = {
-                        "percentage": spec_info.get("match_percentage", 75),
-                        "reason": spec_info.get("reason", "Based on symptom analysis")
-                    }
-            
-            spec_names = list(spec_match_map.keys())
-            
-            if spec_names:
-                doctors = db.query(Doctor).filter(
-                    Doctor.specialization.in_(spec_names),
-                    Doctor.is_approved == True,
-                    Doctor.is_active == True
-                ).limit(10).all()
-                
-                suggested_doctors = [
-                    DoctorSuggestion(
-                        id=doc.id,
-                        name=doc.name,
-                        specialization=doc.specialization,
-                        phone=doc.phone,
-                        profile_picture=doc.profile_picture,
-                        schedule=doc.schedule,
-                        match_percentage=spec_match_map.get(doc.specialization, {}).get("percentage", 75),
-                        match_reason=spec_match_map.get(doc.specialization, {}).get("reason", "Based on symptom analysis")
-                    )
-                    for doc in doctors
-                ]
-                
-                suggested_doctors.sort(key=lambda x: x.match_percentage, reverse=True)
-        
-        # Generate health advice if symptoms detected and not emergency
-        health_advice = None
-        if ai_result.get("detected_symptoms") and not ai_result.get("emergency_warning", False):
-            health_advice = ai_service.generate_health_advice(
-                symptoms=ai_result.get("detected_symptoms", []),
-                severity=ai_result.get("severity", "moderate")
-            )
-        
-        # Build response
-        response = AIChatResponse(
-            response_type=ai_result.get("response_type", "conversation"),
-            message=ai_result.get("message", "I'm here to help. Could you tell me more?"),
-            detected_symptoms=ai_result.get("detected_symptoms", []),
-            symptom_analysis=ai_result.get("symptom_analysis"),
-            recommended_specializations=[
-                {"name": k, "match_percentage": v["percentage"], "reason": v["reason"]}
-                for k, v in spec_match_map.items()
-            ] if spec_match_map else [],
-            severity=ai_result.get("severity"),
-            confidence=ai_result.get("confidence"),
-            additional_notes=ai_result.get("additional_notes"),
-            emergency_warning=ai_result.get("emergency_warning", False),
-            suggested_doctors=suggested_doctors,
-            health_advice=health_advice,
-            should_show_doctors=ai_result.get("should_show_doctors", False) and len(suggested_doctors) > 0,
-            has_matching_doctors=len(suggested_doctors) > 0
-        )
+        response, history_entry = await _complete_chat_turn(db, session, request.message, ai_result)
         
-        # Save to history if it's a symptom analysis
-        if ai_result.get("response_type") == "symptom_analysis" and ai_result.get("detected_symptoms"):
-            try:
-                consultation_record = AIConsultation(
-                    patient_id=current_patient.id,
-                    description=request.message,
-                    detected_symptoms=ai_result.get("detected_symptoms", []),
-                    symptom_analysis=ai_result.get("symptom_analysis"),
-                    recommended_specializations=[
-                        {"name": k, "match_percentage": v["percentage"], "reason": v["reason"]}
-                        for k, v in spec_match_map.items()
-                    ],
-                    severity=ai_result.get("severity"),
-                    confidence=ai_result.get("confidence"),
-                    additional_notes=ai_result.get("additional_notes"),
-                    emergency_warning=ai_result.get("emergency_warning", False),
-                    health_advice=health_advice,
-                    suggested_doctors=[
-                        {
-                            "id": doc.id,
-                            "name": doc.name,
-                            "specialization": doc.specialization,
-                            "phone": doc.phone,
-                            "profile_picture": doc.profile_picture,
-                            "match_percentage": doc.match_percentage,
-                            "match_reason": doc.match_reason,
-                        }
-                        for doc in suggested_doctors
-                    ],
-                    has_matching_doctors=len(suggested_doctors) > 0,
-                )
-                db.add(consultation_record)
-                db.commit()
-            except Exception as save_error:
-                print(f"Failed to save chat consultation history: {save_error}")
-                # Don't fail the request if saving history fails
+        # Save to history if it's a symptom analysis, once the reply is on its way
+        if history_entry:
+            background_tasks.add_task(_save_chat_consultation, current_patient.id, *history_entry)
         
         return response
         
@@ -534,6 +609,73 @@ async def ai_chat(
         )
 
 
+@router.get("/ai-chat/sessions/{session_id}", response_model=ChatSessionResponse)
+async def get_ai_chat_session(
+    session_id: str,
+    current_patient: Patient = Depends(get_current_patient),
+    db: Session = Depends(get_db),
+):
+    """Get the summary and recent messages of one of the patient's chat sessions"""
+    session = chat_sessions.load(db, session_id, current_patient.id)
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chat session not found"
+        )
+    
+    return ChatSessionResponse(
+        session_id=session.id,
+        summary=session.summary or None,
+        message_count=session.message_count,
+        messages=[ChatMessage(**msg) for msg in session.messages],
+    )
+
+
+@router.delete("/ai-chat/sessions/{session_id}", response_model=MessageResponse)
+async def delete_ai_chat_session(
+    session_id: str,
+    current_patient: Patient = Depends(get_current_patient),
+    db: Session = Depends(get_db),
+):
+    """Delete one of the patient's chat sessions"""
+    session = chat_sessions.load(db, session_id, current_patient.id)
+    if not session:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Chat session not found"
+        )
+    
+    chat_sessions.delete(db, session)
+    return MessageResponse(message="Chat session deleted")
+
+
+def _validate_audio_upload(audio: UploadFile):
+    if audio.content_type not in ALLOWED_AUDIO_TYPES:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid audio format. Supported formats: WAV, MP3, M4A, WEBM, OGG"
+        )
+
+
+async def _transcribe_upload(audio: UploadFile) -> Optional[str]:
+    """Decode and transcribe an upload in memory; None when the speech was not understood"""
+    content = await audio.read()
+    try:
+        return await audio_pipeline.transcribe_upload(content)
+    except AudioDecodeError as e:
+        print(f"Audio decode error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Could not read the audio file. Please record again or try another format."
+        )
+    except TranscriptionUnavailableError as e:
+        print(f"Speech recognition service error: {e}")
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Speech recognition service is currently unavailable. Please try again later."
+        )
+
+
 @router.post("/voice-to-text")
 async def voice_to_text(
     audio: UploadFile = File(...),
@@ -544,98 +686,21 @@ async def voice_to_text(
     Supports multiple audio formats (WAV, MP3, M4A, WEBM, OGG).
     """
     try:
-        # Validate file type
-        allowed_types = ["audio/wav", "audio/x-wav", "audio/mpeg", "audio/mp3", 
-                        "audio/m4a", "audio/webm", "audio/ogg", "audio/x-m4a"]
+        _validate_audio_upload(audio)
+        text = await _transcribe_upload(audio)
         
-        if audio.content_type not in allowed_types:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Invalid audio format. Supported formats: WAV, MP3, M4A, WEBM, OGG"
-            )
-        
-        # Create temporary files for processing
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(audio.filename)[1]) as temp_input:
-            # Save uploaded file
-            content = await audio.read()
-            temp_input.write(content)
-            temp_input_path = temp_input.name
-        
-        # Convert to WAV if needed
-        temp_wav_path = None
-        try:
-            file_ext = os.path.splitext(audio.filename)[1].lower()
-            
-            if file_ext != '.wav':
-                # Convert to WAV using pydub
-                temp_wav_path = tempfile.NamedTemporaryFile(delete=False, suffix='.wav').name
-                
-                # Load audio file based on format
-                if file_ext in ['.mp3', '.mpeg']:
-                    audio_segment = AudioSegment.from_mp3(temp_input_path)
-                elif file_ext in ['.m4a']:
-                    audio_segment = AudioSegment.from_file(temp_input_path, format='m4a')
-                elif file_ext in ['.webm']:
-                    audio_segment = AudioSegment.from_file(temp_input_path, format='webm')
-                elif file_ext in ['.ogg']:
-                    audio_segment = AudioSegment.from_ogg(temp_input_path)
-                else:
-                    audio_segment = AudioSegment.from_file(temp_input_path)
-                
-                # Export as WAV
-                audio_segment.export(temp_wav_path, format='wav')
-                audio_file_path = temp_wav_path
-            else:
-                audio_file_path = temp_input_path
-            
-            # Perform speech recognition
-            recognizer = sr.Recognizer()
-            
-            with sr.AudioFile(audio_file_path) as source:
-                # Adjust for ambient noise
-                recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                # Record audio
-                audio_data = recognizer.record(source)
-                
-                # Recognize speech using Google Speech Recognition
-                try:
-                    text = recognizer.recognize_google(audio_data)
-                    
-                    if not text or len(text.strip()) < 5:
-                        return {
-                            "success": False,
-                            "text": "",
-                            "message": "Could not understand the audio. Please speak clearly and try again."
-                        }
-                    
-                    return {
-                        "success": True,
-                        "text": text,
-                        "message": "Audio transcribed successfully"
-                    }
-                    
-                except sr.UnknownValueError:
-                    return {
-                        "success": False,
-                        "text": "",
-                        "message": "Could not understand the audio. Please speak clearly and try again."
-                    }
-                except sr.RequestError as e:
-                    print(f"Speech recognition service error: {e}")
-                    raise HTTPException(
-                        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-                        detail="Speech recognition service is currently unavailable. Please try again later."
-                    )
+        if not text or len(text.strip()) < 5:
+            return {
+                "success": False,
+                "text": "",
+                "message": "Could not understand the audio. Please speak clearly and try again."
+            }
         
-        finally:
-            # Clean up temporary files
-            try:
-                if os.path.exists(temp_input_path):
-                    os.unlink(temp_input_path)
-                if temp_wav_path and os.path.exists(temp_wav_path):
-                    os.unlink(temp_wav_path)
-            except Exception as cleanup_error:
-                print(f"Error cleaning up temp files: {cleanup_error}")
+        return {
+            "success": True,
+            "text": text,
+            "message": "Audio transcribed successfully"
+        }
     
     except HTTPException:
         raise
@@ -647,9 +712,73 @@ async def voice_to_text(
         )
 
 
+async def _voice_chat_reply(db: Session, session, transcribed_text: Optional[str]) -> AIChatResponse:
+    """Analyse a transcribed voice message and build the reply; understood turns are stored in the session"""
+    if not transcribed_text:
+        return AIChatResponse(
+            response_type="conversation",
+            message="I couldn't understand the audio clearly. Could you please speak more clearly or try typing your symptoms?",
+            session_id=session.id
+        )
+    
+    # Get specializations and symptoms from the lookup cache
+    lookups = lookup_cache.get(db)
+    specialization_aliases.sync(lookups)
+    available_specs = lookups.specializations
+    symptom_data = lookups.symptoms
+    
+    # Process voice with AI
+    ai_result = await asyncio.to_thread(
+        ai_service.process_voice_for_symptoms,
+        transcribed_text=transcribed_text,
+        conversation_history=list(session.messages),
+        available_specializations=available_specs,
+        available_symptoms=symptom_data,
+        conversation_summary=session.summary
+    )
+    
+    # Get suggested doctors if symptoms detected
+    suggested_doctors = []
+    spec_match_map = _build_spec_match_map(ai_result.get("recommended_specializations"))
+    if ai_result.get("should_show_doctors") and spec_match_map:
+        spec_names = list(spec_match_map.keys())
+        
+        if spec_names:
+            suggested_doctors = _suggest_doctors(db, spec_match_map, default_reason="Recommended specialist")
+    
+    # Build response
+    response = AIChatResponse(
+        response_type=ai_result.get("response_type", "conversation"),
+        message=ai_result.get("message", "I processed your voice message."),
+        detected_symptoms=ai_result.get("detected_symptoms", []),
+        symptom_analysis=ai_result.get("symptom_analysis"),
+        recommended_specializations=[
+            SpecializationMatch(name=k, match_percentage=v["percentage"], reason=v["reason"])
+            for k, v in spec_match_map.items()
+        ],
+        severity=ai_result.get("severity"),
+        confidence=ai_result.get("confidence"),
+        additional_notes=ai_result.get("additional_notes"),
+        emergency_warning=ai_result.get("emergency_warning", False),
+        should_show_doctors=len(suggested_doctors) > 0,
+        suggested_doctors=suggested_doctors,
+        session_id=session.id
+    )
+    
+    # Only store the turn when the audio was actually understood
+    if ai_result.get("transcribed_text"):
+        chat_sessions.append(db, session, [
+            {"role": "user", "content": ai_result["transcribed_text"]},
+            {"role": "assistant", "content": response.message},
+        ])
+    
+    return response
+
+
 @router.post("/voice-chat")
 async def voice_chat(
     audio: UploadFile = File(...),
+    session_id: Optional[str] = Query(None),
     conversation_history: str = Query("[]"),
     current_patient: Patient = Depends(get_current_patient),
     db: Session = Depends(get_db),
@@ -665,141 +794,21 @@ async def voice_chat(
         except:
             history = []
         
-        # Validate file type
-        allowed_types = ["audio/wav", "audio/x-wav", "audio/mpeg", "audio/mp3", 
-                        "audio/m4a", "audio/webm", "audio/ogg", "audio/x-m4a"]
+        _validate_audio_upload(audio)
         
-        if audio.content_type not in allowed_types:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Invalid audio format. Supported formats: WAV, MP3, M4A, WEBM, OGG"
-            )
+        # Resume the chat session shared with the text chat
+        session = chat_sessions.get_or_create(db, session_id, current_patient.id)
+        if session.message_count == 0 and history:
+            chat_sessions.append(db, session, [
+                {"role": msg["role"], "content": msg["content"]}
+                for msg in history
+                if isinstance(msg, dict) and msg.get("role") and msg.get("content")
+            ])
         
-        # Save audio to temporary file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(audio.filename)[1]) as temp_input:
-            content = await audio.read()
-            temp_input.write(content)
-            temp_input_path = temp_input.name
+        transcribed_text = await _transcribe_upload(audio)
+        response = await _voice_chat_reply(db, session, transcribed_text)
         
-        # Convert to WAV if needed
-        temp_wav_path = None
-        try:
-            file_ext = os.path.splitext(audio.filename)[1].lower()
-            
-            if file_ext != '.wav':
-                temp_wav_path = tempfile.NamedTemporaryFile(delete=False, suffix='.wav').name
-                
-                # Load and convert to WAV
-                if file_ext in ['.mp3', '.mpeg']:
-                    audio_segment = AudioSegment.from_mp3(temp_input_path)
-                elif file_ext in ['.m4a']:
-                    audio_segment = AudioSegment.from_file(temp_input_path, format='m4a')
-                elif file_ext in ['.webm']:
-                    audio_segment = AudioSegment.from_file(temp_input_path, format='webm')
-                elif file_ext in ['.ogg']:
-                    audio_segment = AudioSegment.from_ogg(temp_input_path)
-                else:
-                    audio_segment = AudioSegment.from_file(temp_input_path)
-                
-                audio_segment.export(temp_wav_path, format='wav')
-                audio_file_path = temp_wav_path
-            else:
-                audio_file_path = temp_input_path
-            
-            # Get specializations and symptoms
-            specializations = db.query(Specialization).filter(
-                Specialization.is_active == True
-            ).all()
-            available_specs = [s.name for s in specializations]
-            
-            symptoms = db.query(Symptom).filter(Symptom.is_active == True).all()
-            symptom_data = [
-                {
-                    "name": s.name,
-                    "description": s.description or "",
-                    "specialization": s.specialization or "General"
-                }
-                for s in symptoms
-            ]
-            
-            # Process voice with AI
-            ai_result = ai_service.process_voice_for_symptoms(
-                audio_file_path=audio_file_path,
-                conversation_history=history,
-                available_specializations=available_specs,
-                available_symptoms=symptom_data
-            )
-            
-            # Get suggested doctors if symptoms detected
-            suggested_doctors = []
-            if ai_result.get("should_show_doctors") and ai_result.get("recommended_specializations"):
-                spec_names = [
-                    spec["name"] if isinstance(spec, dict) else spec 
-                    for spec in ai_result.get("recommended_specializations", [])
-                ]
-                
-                if spec_names:
-                    doctors = db.query(Doctor).filter(
-                        Doctor.specialization.in_(spec_names),
-                        Doctor.is_approved == True,
-                        Doctor.is_active == True
-                    ).limit(10).all()
-                    
-                    spec_match_map = {}
-                    for spec_info in ai_result.get("recommended_specializations", []):
-                        if isinstance(spec_info, dict):
-                            spec_match_map[spec_info["name"]] = {
-                                "percentage": spec_info.get("match_percentage", 75),
-                                "reason": spec_info.get("reason", "Based on symptom analysis")
-                            }
-                    
-                    suggested_doctors = [
-                        DoctorSuggestion(
-                            id=doc.id,
-                            name=doc.name,
-                            specialization=doc.specialization,
-                            phone=doc.phone,
-                            profile_picture=doc.profile_picture,
-                            schedule=doc.schedule,
-                            match_percentage=spec_match_map.get(doc.specialization, {}).get("percentage", 75),
-                            match_reason=spec_match_map.get(doc.specialization, {}).get("reason", "Recommended specialist")
-                        )
-                        for doc in doctors
-                    ]
-            
-            # Build response
-            response = AIChatResponse(
-                response_type=ai_result.get("response_type", "conversation"),
-                message=ai_result.get("message", "I processed your voice message."),
-                detected_symptoms=ai_result.get("detected_symptoms", []),
-                symptom_analysis=ai_result.get("symptom_analysis"),
-                recommended_specializations=[
-                    SpecializationMatch(
-                        name=spec["name"] if isinstance(spec, dict) else spec,
-                        match_percentage=spec.get("match_percentage", 75) if isinstance(spec, dict) else 75,
-                        reason=spec.get("reason", "Based on symptom analysis") if isinstance(spec, dict) else "Based on symptom analysis"
-                    )
-                    for spec in ai_result.get("recommended_specializations", [])
-                ],
-                severity=ai_result.get("severity"),
-                confidence=ai_result.get("confidence"),
-                additional_notes=ai_result.get("additional_notes"),
-                emergency_warning=ai_result.get("emergency_warning", False),
-                should_show_doctors=len(suggested_doctors) > 0,
-                suggested_doctors=suggested_doctors
-            )
-            
-            return response
-            
-        finally:
-            # Clean up temporary files
-            try:
-                if os.path.exists(temp_input_path):
-                    os.unlink(temp_input_path)
-                if temp_wav_path and os.path.exists(temp_wav_path):
-                    os.unlink(temp_wav_path)
-            except Exception as cleanup_error:
-                print(f"Error cleaning up temp files: {cleanup_error}")
+        return response
     
     except HTTPException:
         raise
@@ -811,6 +820,345 @@ async def voice_chat(
         )
 
 
+async def _process_voice_job(patient_id: int, session_id: str, content: bytes) -> dict:
+    """Voice-chat job body: decode, check the clip length, transcribe, reply"""
+    try:
+        decoded = await audio_pipeline.run(audio_pipeline.decode, content)
+    except AudioDecodeError as e:
+        print(f"Audio decode error: {e}")
+        raise VoiceJobError("Could not read the audio file. Please record again or try another format.")
+    if decoded.source_seconds > settings.VOICE_JOB_MAX_SECONDS:
+        raise VoiceJobError(f"Voice messages can be at most {settings.VOICE_JOB_MAX_SECONDS:g} seconds long")
+    
+    try:
+        transcribed_text = await audio_pipeline.run(audio_pipeline.transcribe, decoded)
+    except TranscriptionUnavailableError as e:
+        print(f"Speech recognition service error: {e}")
+        raise VoiceJobError("Speech recognition service is currently unavailable. Please try again later.")
+    
+    db = SessionLocal()
+    try:
+        session = chat_sessions.get_or_create(db, session_id, patient_id)
+        response = await _voice_chat_reply(db, session, transcribed_text)
+    finally:
+        db.close()
+    return response.model_dump(mode="json")
+
+
+async def _notify_voice_job(job: Job):
+    """Push a finished voice job to the patient's notification WebSocket, if connected"""
+    await notification_manager.send_personal_message(
+        jsonable_encoder({"type": "voice_job_finished", **job.to_dict()}),
+        job.owner_id,
+    )
+
+
+@router.post("/voice-chat/jobs", status_code=status.HTTP_202_ACCEPTED)
+async def create_voice_chat_job(
+    audio: UploadFile = File(...),
+    session_id: Optional[str] = Query(None),
+    current_patient: Patient = Depends(get_current_patient),
+    db: Session = Depends(get_db),
+):
+    """
+    Queue a voice message for processing and return at once.
+    The reply (an AIChatResponse) is delivered through
+    GET /voice-chat/jobs/{job_id} and the patient's notification WebSocket.
+    Uploads are refused up front when the queue is full (503) or the patient
+    already has the maximum number of voice messages in flight (429).
+    """
+    _validate_audio_upload(audio)
+    
+    content = await audio.read(settings.VOICE_JOB_MAX_BYTES + 1)
+    if len(content) > settings.VOICE_JOB_MAX_BYTES:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Voice messages can be at most {settings.VOICE_JOB_MAX_BYTES // (1024 * 1024)}MB"
+        )
+    if not content:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Empty audio upload"
+        )
+    
+    session = chat_sessions.get_or_create(db, session_id, current_patient.id)
+    
+    try:
+        job = voice_jobs.submit(
+            current_patient.id, _process_voice_job, current_patient.id, session.id, content,
+            on_done=_notify_voice_job,
+        )
+    except PatientLimitError as e:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=str(e),
+            headers={"Retry-After": "10"}
+        )
+    except QueueFullError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Voice processing is busy. Please try again shortly.",
+            headers={"Retry-After": "10"}
+        )
+    
+    return {
+        "job_id": job.id,
+        "status": job.status,
+        "session_id": session.id,
+        "queued": voice_jobs.pending,
+    }
+
+
+@router.get("/voice-chat/jobs/{job_id}")
+async def get_voice_chat_job(
+    job_id: str,
+    current_patient: Patient = Depends(get_current_patient),
+):
+    """Status of a queued voice message; `results[0]` holds the reply once completed"""
+    job = jobs.get(job_id)
+    if not job or job.kind != "voice_chat" or job.owner_id != current_patient.id:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Voice job not found"
+        )
+    return job.to_dict()
+
+
+# Concurrent voice streams per worker process (each holds a decoder and STT work)
+_voice_stream_slots = asyncio.Semaphore(settings.VOICE_STREAM_MAX_SESSIONS)
+
+
+def _open_voice_stream(token: str, session_id: Optional[str]) -> Optional[tuple]:
+    """Authenticate a voice stream: (patient_id, chat session id, recent history), or None"""
+    try:
+        token_data = decode_token(token)
+    except HTTPException:
+        return None
+    if token_data.role != "patient":
+        return None
+    
+    db = SessionLocal()
+    try:
+        patient = db.query(Patient).filter(Patient.id == token_data.user_id).first()
+        if not patient or not patient.is_active:
+            return None
+        session = chat_sessions.get_or_create(db, session_id, patient.id)
+        return patient.id, session.id, list(session.messages)[-3:]
+    finally:
+        db.close()
+
+
+async def _voice_stream_reply(patient_id: int, session_id: str, text: str, prefetch: List[asyncio.Task]) -> tuple:
+    """
+    Chat reply for a streamed message, reusing the per-sentence routing and
+    retrieval. Returns (response, history_entry) like _complete_chat_turn().
+    """
+    if not text:
+        return AIChatResponse(
+            response_type="conversation",
+            message="I couldn't understand the audio clearly. Could you please speak more clearly or try typing your symptoms?",
+            session_id=session_id
+        ), None
+    
+    # Symptom-related if any sentence was; knowledge merged across sentences.
+    # A failed prefetch leaves the decision to chat_response.
+    prepared = await asyncio.gather(*prefetch, return_exceptions=True)
+    succeeded = [p for p in prepared if not isinstance(p, BaseException)]
+    symptoms_related = None
+    if any(p[0] for p in succeeded):
+        symptoms_related = True
+    elif len(succeeded) == len(prepared):
+        symptoms_related = False
+    contexts = [p[1] for p in succeeded if p[1]]
+    rag_context = ai_service.rag.merge_contexts(contexts) if contexts else None
+    
+    db = SessionLocal()
+    try:
+        lookups = lookup_cache.get(db)
+        specialization_aliases.sync(lookups)
+        session = chat_sessions.get_or_create(db, session_id, patient_id)
+        
+        ai_result = await ai_service.chat_response(
+            user_message=text,
+            conversation_history=list(session.messages),
+            available_specializations=lookups.specializations,
+            available_symptoms=lookups.symptoms,
+            conversation_summary=session.summary,
+            symptoms_related=symptoms_related,
+            rag_context=rag_context
+        )
+        return await _complete_chat_turn(db, session, text, ai_result)
+    finally:
+        db.close()
+
+
+async def _run_voice_stream(websocket: WebSocket, patient_id: int, session_id: str,
+                            recent_history: List[dict], audio_format: str, channels: int = 1):
+    stream = audio_pipeline.stt.create_stream()
+    decoder = audio_pipeline.streaming_decoder(audio_format, channels)
+    max_pcm_bytes = int(settings.VOICE_STREAM_MAX_SECONDS * SAMPLE_RATE * SAMPLE_WIDTH)
+    stable: List[str] = []
+    prefetch: List[asyncio.Task] = []
+    
+    async def publish(transcripts):
+        interim = ""
+        for transcript in transcripts:
+            if transcript.final:
+                stable.append(transcript.text)
+                # The sentence is settled: start its classification and retrieval now
+                prefetch.append(asyncio.create_task(ai_service.prepare_chat(transcript.text, recent_history)))
+            else:
+                interim = transcript.text
+        if transcripts:
+            await websocket.send_json({
+                "type": "partial",
+                "text": " ".join(stable + [interim] if interim else stable),
+                "stable": " ".join(stable),
+            })
+    
+    async def transcribe():
+        decoded = 0
+        while True:
+            pcm = await decoder.read()
+            if not pcm:
+                break
+            # Audio beyond the cap is drained but not transcribed
+            pcm = pcm[:max_pcm_bytes - decoded]
+            if pcm:
+                decoded += len(pcm)
+                await publish(await audio_pipeline.run(stream.feed, pcm))
+        await publish(await audio_pipeline.run(stream.finish))
+    
+    await decoder.start()
+    transcriber = asyncio.create_task(transcribe())
+    receiver: Optional[asyncio.Task] = None
+    try:
+        await websocket.send_json({"type": "ready", "session_id": session_id})
+        
+        received = 0
+        while True:
+            # Wait on the transcriber too, so a decode/STT failure is reported
+            # straight away instead of after the client's next frame or the idle timeout
+            if receiver is None:
+                receiver = asyncio.create_task(websocket.receive())
+            done, _ = await asyncio.wait(
+                {receiver, transcriber},
+                timeout=settings.VOICE_STREAM_IDLE_TIMEOUT_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if not done:
+                raise asyncio.TimeoutError()
+            if transcriber in done:
+                transcriber.result()  # re-raises the transcriber's error
+                break
+            message = receiver.result()
+            receiver = None
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            
+            if message.get("bytes"):
+                received += len(message["bytes"])
+                if received > settings.VOICE_STREAM_MAX_BYTES:
+                    await websocket.send_json({"type": "error", "detail": "Voice message is too long"})
+                    await websocket.close(code=1009)
+                    return
+                await decoder.feed(message["bytes"])
+            elif message.get("text"):
+                try:
+                    control = json.loads(message["text"])
+                except ValueError:
+                    control = {}
+                if control.get("type") == "ping":
+                    await websocket.send_json({"type": "pong"})
+                elif control.get("type") == "end":
+                    break
+        
+        await decoder.close()
+        await transcriber
+        
+        text = " ".join(stable)
+        await websocket.send_json({"type": "transcript", "text": text})
+        response, history_entry = await _voice_stream_reply(patient_id, session_id, text, prefetch)
+        await websocket.send_json({"type": "reply", "data": response.model_dump(mode="json")})
+        await websocket.close(code=1000)
+        
+        # Save to history once the reply has been sent
+        if history_entry:
+            await asyncio.to_thread(_save_chat_consultation, patient_id, *history_entry)
+    finally:
+        decoder.kill()
+        for task in [transcriber, receiver, *prefetch]:
+            if task is not None and not task.done():
+                task.cancel()
+
+
+@router.websocket("/voice-stream")
+async def voice_stream(websocket: WebSocket):
+    """
+    Streamed voice chat: audio is sent while it is recorded, partial
+    transcripts come back as each sentence is recognised, and the chat reply
+    follows as soon as recording stops.
+    
+    Query params: token (access token), session_id (chat session to resume),
+    format ("pcm16" for raw 16 kHz s16le; anything else is decoded with
+    ffmpeg, e.g. MediaRecorder WebM/Opus chunks), channels (interleaved
+    channels of pcm16 input, downmixed server-side; default 1).
+    
+    Binary frames carry audio; text frames are JSON control messages:
+    {"type": "end"} when recording stops, {"type": "ping"}.
+    Server messages: ready, partial, transcript, reply (an AIChatResponse),
+    error, pong.
+    """
+    token = websocket.query_params.get("token")
+    auth_header = websocket.headers.get("authorization", "")
+    if not token and auth_header.startswith("Bearer "):
+        token = auth_header[7:]
+    
+    stream_auth = await asyncio.to_thread(
+        _open_voice_stream, token, websocket.query_params.get("session_id")
+    ) if token else None
+    if stream_auth is None:
+        try:
+            await websocket.close(code=1008, reason="Authentication failed")
+        except:
+            pass
+        return
+    
+    # Backpressure: refuse rather than queue when every slot is busy
+    if _voice_stream_slots.locked():
+        try:
+            await websocket.close(code=1013, reason="Too many voice streams, try again shortly")
+        except:
+            pass
+        return
+    
+    async with _voice_stream_slots:
+        await websocket.accept()
+        try:
+            await _run_voice_stream(
+                websocket, *stream_auth,
+                audio_format=websocket.query_params.get("format", "auto"),
+                channels=min(max(int(websocket.query_params.get("channels", 1)), 1), 8),
+            )
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            if isinstance(e, asyncio.TimeoutError):
+                detail, code = "No audio received, closing the stream", 1000
+            elif isinstance(e, AudioDecodeError):
+                detail, code = "Could not read the audio stream. Please record again or try another format.", 1003
+            elif isinstance(e, TranscriptionUnavailableError):
+                detail, code = "Speech recognition service is currently unavailable. Please try again later.", 1011
+            else:
+                detail, code = "Failed to process voice message", 1011
+            print(f"Voice stream error: {e}")
+            try:
+                await websocket.send_json({"type": "error", "detail": detail})
+                await websocket.close(code=code)
+            except:
+                pass
+
+
 @router.post("/ai-consultation")
 async def ai_doctor_consultation(
     request: AIConsultationRequest,
@@ -822,22 +1170,11 @@ async def ai_doctor_consultation(
     Analyzes symptoms and suggests appropriate doctors from the database.
     """
     try:
-        # Get all active specializations
-        specializations = db.query(Specialization).filter(
-            Specialization.is_active == True
-        ).all()
-        available_specs = [s.name for s in specializations]
-        
-        # Get all active symptoms with their specializations
-        symptoms = db.query(Symptom).filter(Symptom.is_active == True).all()
-        symptom_data = [
-            {
-                "name": s.name,
-                "description": s.description or "",
-                "specialization": s.specialization or "General"
-            }
-            for s in symptoms
-        ]
+        # Active specializations and symptoms from the process-wide lookup cache
+        lookups = lookup_cache.get(db)
+        specialization_aliases.sync(lookups)
+        available_specs = lookups.specializations
+        symptom_data = lookups.symptoms
         
         # Analyze patient's description using AI
         analysis = ai_service.analyze_symptoms(
@@ -846,16 +1183,8 @@ async def ai_doctor_consultation(
             available_symptoms=symptom_data
         )
         
-        # Create a mapping of specialization to match info
-        spec_match_map = {}
-        for spec_info in analysis["recommended_specializations"]:
-            if isinstance(spec_info, dict):
-                spec_match_map[spec_info["name"]] = {
-                    "percentage": spec_info.get("match_percentage", 75),
-                    "reason": spec_info.get("reason", "Based on symptom analysis")
-                }
-            else:
-                spec_match_map[spec_info] = {"percentage": 75, "reason": "Based on symptom analysis"}
+        # Create a mapping of canonical specialization name to match info
+        spec_match_map = _build_spec_match_map(analysis["recommended_specializations"])
         
         # Get list of specialization names for querying
         spec_names = list(spec_match_map.keys())
@@ -863,29 +1192,8 @@ async def ai_doctor_consultation(
         # Find matching doctors based on recommended specializations
         suggested_doctors = []
         if spec_names:
-            # Query doctors with matching specializations who are approved and active
-            doctors = db.query(Doctor).filter(
-                Doctor.specialization.in_(spec_names),
-                Doctor.is_approved == True,
-                Doctor.is_active == True
-            ).limit(10).all()
-            
-            suggested_doctors = [
-                DoctorSuggestion(
-                    id=doc.id,
-                    name=doc.name,
-                    specialization=doc.specialization,
-                    phone=doc.phone,
-                    profile_picture=doc.profile_picture,
-                    schedule=doc.schedule,
-                    match_percentage=spec_match_map.get(doc.specialization, {}).get("percentage", 75),
-                    match_reason=spec_match_map.get(doc.specialization, {}).get("reason", "Based on symptom analysis")
-                )
-                for doc in doctors
-            ]
-            
-            # Sort doctors by match percentage (highest first)
-            suggested_doctors.sort(key=lambda x: x.match_percentage, reverse=True)
+            # Rank approved, active doctors with matching specializations
+            suggested_doctors = _suggest_doctors(db, spec_match_map)
         
         # Generate health advice if symptoms detected and not emergency
         health_advice = None
@@ -1038,6 +1346,86 @@ async def get_ai_consultation_history(
         )
 
 
+# Characters of the description returned by the history summary list
+HISTORY_DESCRIPTION_PREVIEW_CHARS = 120
+
+
+def _encode_history_cursor(created_at: datetime, consultation_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{consultation_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def _decode_history_cursor(cursor: str) -> tuple:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, consultation_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(consultation_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid cursor"
+        )
+
+
+@router.get("/ai-consultation/history/summary", response_model=AIConsultationSummaryPage)
+async def get_ai_consultation_history_summary(
+    limit: int = Query(default=20, ge=1, le=100, description="Number of consultations to retrieve"),
+    cursor: Optional[str] = Query(default=None, description="next_cursor from the previous page"),
+    current_patient: Patient = Depends(get_current_patient),
+    db: Session = Depends(get_db),
+):
+    """
+    Lightweight consultation history for list views (newest first).
+    Only a description preview, symptoms, severity and date are returned;
+    fetch a consultation's full analysis from the detail endpoint. Pages are
+    keyset-paginated on (created_at, id), so there is no offset scan or count.
+    """
+    preview_chars = HISTORY_DESCRIPTION_PREVIEW_CHARS
+    query = db.query(
+        AIConsultation.id,
+        func.substr(AIConsultation.description, 1, preview_chars).label("description"),
+        (func.length(AIConsultation.description) > preview_chars).label("description_truncated"),
+        AIConsultation.detected_symptoms,
+        AIConsultation.severity,
+        AIConsultation.emergency_warning,
+        AIConsultation.created_at,
+    ).filter(
+        AIConsultation.patient_id == current_patient.id
+    )
+    
+    if cursor:
+        cursor_created_at, cursor_id = _decode_history_cursor(cursor)
+        query = query.filter(
+            tuple_(AIConsultation.created_at, AIConsultation.id) < tuple_(cursor_created_at, cursor_id)
+        )
+    
+    # One extra row tells whether another page exists
+    rows = query.order_by(
+        AIConsultation.created_at.desc(),
+        AIConsultation.id.desc()
+    ).limit(limit + 1).all()
+    
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    
+    return AIConsultationSummaryPage(
+        consultations=[
+            AIConsultationSummaryItem(
+                id=row.id,
+                description=row.description,
+                description_truncated=bool(row.description_truncated),
+                detected_symptoms=row.detected_symptoms or [],
+                severity=row.severity,
+                emergency_warning=row.emergency_warning or False,
+                created_at=row.created_at,
+            )
+            for row in rows
+        ],
+        next_cursor=_encode_history_cursor(rows[-1].created_at, rows[-1].id) if has_more else None,
+        has_more=has_more,
+    )
+
+
 @router.get("/ai-consultation/history/{consultation_id}", response_model=AIConsultationHistoryItem)
 async def get_ai_consultation_detail(
     consultation_id: int,
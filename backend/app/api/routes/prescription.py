@@ -1,6 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, BackgroundTasks, Query
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy.orm import Session, load_only
+from typing import List, Optional
 import json
 
 from app.db import get_db
@@ -12,12 +13,17 @@ from app.services.email_service import send_prescription_email
 router = APIRouter(prefix="/api/prescriptions", tags=["prescriptions"])
 
 
+# Stored JSON text is parsed and validated in one pass
+_MEDICINES = TypeAdapter(List[MedicineItem])
+_LAB_TESTS = TypeAdapter(List[LabTestItem])
+
+
 def _parse_medicines(raw: str | None) -> List[MedicineItem]:
     if not raw:
         return []
     try:
-        return [MedicineItem(**m) for m in json.loads(raw)]
-    except Exception:
+        return _MEDICINES.validate_json(raw)
+    except ValidationError:
         return []
 
 
@@ -25,11 +31,26 @@ def _parse_lab_tests(raw: str | None) -> List[LabTestItem]:
     if not raw:
         return []
     try:
-        return [LabTestItem(**t) for t in json.loads(raw)]
-    except Exception:
+        return _LAB_TESTS.validate_json(raw)
+    except ValidationError:
         return []
 
 
+def _query_prescriptions(db: Session):
+    """(Prescription, Doctor, Patient, Appointment) rows from one joined query, loading only the columns _build_out uses"""
+    return (
+        db.query(Prescription, Doctor, Patient, Appointment)
+        .outerjoin(Doctor, Doctor.id == Prescription.doctor_id)
+        .outerjoin(Patient, Patient.id == Prescription.patient_id)
+        .outerjoin(Appointment, Appointment.id == Prescription.appointment_id)
+        .options(
+            load_only(Doctor.id, Doctor.name, Doctor.specialization, Doctor.bmdc_number),
+            load_only(Patient.id, Patient.name, Patient.age, Patient.gender, Patient.phone, Patient.email),
+            load_only(Appointment.id, Appointment.date, Appointment.time),
+        )
+    )
+
+
 def _build_out(prescription: Prescription, doctor: Doctor, patient: Patient, appointment: Appointment) -> PrescriptionOut:
     return PrescriptionOut(
         id=prescription.id,
@@ -62,35 +83,51 @@ def _build_out(prescription: Prescription, doctor: Doctor, patient: Patient, app
 
 @router.get("/doctor/completed-appointments", response_model=List[dict])
 async def get_completed_appointments(
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size (all appointments when omitted)"),
     current_doctor: Doctor = Depends(get_current_doctor),
     db: Session = Depends(get_db),
 ):
-    """Return all completed appointments for the current doctor, with prescription status."""
-    print(f"DEBUG: Fetching completed appointments for doctor ID: {current_doctor.id}") 
-    appointments = db.query(Appointment).filter(
-        Appointment.doctor_id == current_doctor.id,
-        Appointment.status == "Completed",
-    ).order_by(Appointment.date.desc(), Appointment.time.desc()).all()
-
-    results = []
-    for apt in appointments:
-        patient = db.query(Patient).filter(Patient.id == apt.patient_id).first()
-        existing_rx = db.query(Prescription).filter(
-            Prescription.appointment_id == apt.id
-        ).first()
-        results.append({
-            "id": apt.id,
-            "appointment_date": str(apt.date),
-            "appointment_time": str(apt.time),
-            "patient_name": patient.name if patient else "Unknown",
-            "patient_id": apt.patient_id,
-            "reason": apt.reason,
-            "symptoms": apt.symptoms,
-            "has_prescription": existing_rx is not None,
-            "prescription_id": existing_rx.id if existing_rx else None,
-            "prescription_finalized": existing_rx.is_finalized if existing_rx else False,
-        })
-    return results
+    """Return the current doctor's completed appointments, with prescription status."""
+    query = (
+        db.query(
+            Appointment.id,
+            Appointment.date,
+            Appointment.time,
+            Appointment.patient_id,
+            Appointment.reason,
+            Appointment.symptoms,
+            Patient.name.label("patient_name"),
+            Prescription.id.label("prescription_id"),
+            Prescription.is_finalized.label("prescription_finalized"),
+        )
+        .outerjoin(Patient, Patient.id == Appointment.patient_id)
+        .outerjoin(Prescription, Prescription.appointment_id == Appointment.id)
+        .filter(
+            Appointment.doctor_id == current_doctor.id,
+            Appointment.status == "Completed",
+        )
+        .order_by(Appointment.date.desc(), Appointment.time.desc(), Appointment.id.desc())
+        .offset(skip)
+    )
+    if limit:
+        query = query.limit(limit)
+
+    return [
+        {
+            "id": row.id,
+            "appointment_date": str(row.date),
+            "appointment_time": str(row.time),
+            "patient_name": row.patient_name or "Unknown",
+            "patient_id": row.patient_id,
+            "reason": row.reason,
+            "symptoms": row.symptoms,
+            "has_prescription": row.prescription_id is not None,
+            "prescription_id": row.prescription_id,
+            "prescription_finalized": bool(row.prescription_finalized),
+        }
+        for row in query.all()
+    ]
 
 
 @router.post("", response_model=PrescriptionOut, status_code=status.HTTP_201_CREATED)
@@ -159,16 +196,14 @@ async def get_prescription(
     current_doctor: Doctor = Depends(get_current_doctor),
     db: Session = Depends(get_db),
 ):
-    rx = db.query(Prescription).filter(
+    row = _query_prescriptions(db).filter(
         Prescription.id == prescription_id,
         Prescription.doctor_id == current_doctor.id,
     ).first()
-    if not rx:
+    if not row:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prescription not found")
 
-    appointment = db.query(Appointment).filter(Appointment.id == rx.appointment_id).first()
-    patient = db.query(Patient).filter(Patient.id == rx.patient_id).first()
-    return _build_out(rx, current_doctor, patient, appointment)
+    return _build_out(*row)
 
 
 @router.get("/by-appointment/{appointment_id}", response_model=PrescriptionOut)
@@ -177,16 +212,14 @@ async def get_prescription_by_appointment(
     current_doctor: Doctor = Depends(get_current_doctor),
     db: Session = Depends(get_db),
 ):
-    rx = db.query(Prescription).filter(
+    row = _query_prescriptions(db).filter(
         Prescription.appointment_id == appointment_id,
         Prescription.doctor_id == current_doctor.id,
     ).first()
-    if not rx:
+    if not row:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prescription not found")
 
-    appointment = db.query(Appointment).filter(Appointment.id == rx.appointment_id).first()
-    patient = db.query(Patient).filter(Patient.id == rx.patient_id).first()
-    return _build_out(rx, current_doctor, patient, appointment)
+    return _build_out(*row)
 
 
 @router.patch("/{prescription_id}", response_model=PrescriptionOut)
@@ -222,11 +255,10 @@ async def update_prescription(
         rx.is_finalized = payload.is_finalized
 
     db.commit()
-    db.refresh(rx)
 
-    appointment = db.query(Appointment).filter(Appointment.id == rx.appointment_id).first()
-    patient = db.query(Patient).filter(Patient.id == rx.patient_id).first()
-    result = _build_out(rx, current_doctor, patient, appointment)
+    # Reloads the prescription together with its doctor, patient and appointment
+    rx, doctor, patient, appointment = _query_prescriptions(db).filter(Prescription.id == prescription_id).one()
+    result = _build_out(rx, doctor, patient, appointment)
 
     # Send email when prescription is newly finalized
     if rx.is_finalized and not was_finalized_before and patient and patient.email:
@@ -245,20 +277,19 @@ async def update_prescription(
 
 @router.get("/patient/my-prescriptions", response_model=List[PrescriptionOut])
 async def get_patient_prescriptions(
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size (all prescriptions when omitted)"),
     current_patient: Patient = Depends(get_current_patient),
     db: Session = Depends(get_db),
 ):
-    prescriptions = db.query(Prescription).filter(
+    query = _query_prescriptions(db).filter(
         Prescription.patient_id == current_patient.id,
         Prescription.is_finalized == True,
-    ).order_by(Prescription.created_at.desc()).all()
+    ).order_by(Prescription.created_at.desc(), Prescription.id.desc()).offset(skip)
+    if limit:
+        query = query.limit(limit)
 
-    results = []
-    for rx in prescriptions:
-        doctor = db.query(Doctor).filter(Doctor.id == rx.doctor_id).first()
-        appointment = db.query(Appointment).filter(Appointment.id == rx.appointment_id).first()
-        results.append(_build_out(rx, doctor, current_patient, appointment))
-    return results
+    return [_build_out(*row) for row in query.all()]
 
 
 @router.get("/patient/prescription/{prescription_id}", response_model=PrescriptionOut)
@@ -267,13 +298,11 @@ async def get_patient_prescription_detail(
     current_patient: Patient = Depends(get_current_patient),
     db: Session = Depends(get_db),
 ):
-    rx = db.query(Prescription).filter(
+    row = _query_prescriptions(db).filter(
         Prescription.id == prescription_id,
         Prescription.patient_id == current_patient.id,
     ).first()
-    if not rx:
+    if not row:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Prescription not found")
 
-    doctor = db.query(Doctor).filter(Doctor.id == rx.doctor_id).first()
-    appointment = db.query(Appointment).filter(Appointment.id == rx.appointment_id).first()
-    return _build_out(rx, doctor, current_patient, appointment)
+    return _build_out(*row)
@@ -25,12 +25,44 @@ router = APIRouter(prefix="/api/quotations", tags=["quotations"])
 
 
 # ── Helpers ─────────────────────────────────────────────────────────
+#
+# Request listings are enriched in bulk: the related patients, pharmacies,
+# prescriptions (with their doctor) and responses are each loaded with one
+# IN (...) query for the whole page and joined up in memory, instead of
+# four or five lookups per row.
+
+def _load_lookups(requests: List[QReqModel], responses: List[QResModel], db: Session) -> dict:
+    """Display columns for everything the requests/responses reference, keyed by id"""
+    patient_ids = {qr.patient_id for qr in requests}
+    pharmacy_ids = {qr.pharmacy_id for qr in requests} | {qres.pharmacy_id for qres in responses}
+    prescription_ids = {qr.prescription_id for qr in requests}
+
+    patients = (
+        db.query(Patient.id, Patient.name, Patient.phone).filter(Patient.id.in_(patient_ids)).all()
+        if patient_ids else []
+    )
+    pharmacies = (
+        db.query(Pharmacy.id, Pharmacy.pharmacy_name).filter(Pharmacy.id.in_(pharmacy_ids)).all()
+        if pharmacy_ids else []
+    )
+    prescriptions = (
+        db.query(Prescription.id, Prescription.diagnosis, Doctor.name.label("doctor_name"))
+        .outerjoin(Doctor, Doctor.id == Prescription.doctor_id)
+        .filter(Prescription.id.in_(prescription_ids))
+        .all()
+        if prescription_ids else []
+    )
+    return {
+        "patients": {row.id: row for row in patients},
+        "pharmacies": {row.id: row for row in pharmacies},
+        "prescriptions": {row.id: row for row in prescriptions},
+    }
 
-def _enrich_request(qr: QReqModel, db: Session) -> QuotationRequestOut:
-    patient = db.query(Patient).filter(Patient.id == qr.patient_id).first()
-    pharmacy = db.query(Pharmacy).filter(Pharmacy.id == qr.pharmacy_id).first()
-    rx = db.query(Prescription).filter(Prescription.id == qr.prescription_id).first()
-    doctor = db.query(Doctor).filter(Doctor.id == rx.doctor_id).first() if rx else None
+
+def _request_out(qr: QReqModel, lookups: dict) -> QuotationRequestOut:
+    patient = lookups["patients"].get(qr.patient_id)
+    pharmacy = lookups["pharmacies"].get(qr.pharmacy_id)
+    rx = lookups["prescriptions"].get(qr.prescription_id)
 
     return QuotationRequestOut(
         id=qr.id,
@@ -45,13 +77,13 @@ def _enrich_request(qr: QReqModel, db: Session) -> QuotationRequestOut:
         patient_name=patient.name if patient else None,
         patient_phone=patient.phone if patient else None,
         pharmacy_name=pharmacy.pharmacy_name if pharmacy else None,
-        doctor_name=doctor.name if doctor else None,
+        doctor_name=rx.doctor_name if rx else None,
         diagnosis=rx.diagnosis if rx else None,
     )
 
 
-def _enrich_response(qres: QResModel, db: Session) -> QuotationResponseOut:
-    pharmacy = db.query(Pharmacy).filter(Pharmacy.id == qres.pharmacy_id).first()
+def _response_out(qres: QResModel, lookups: dict) -> QuotationResponseOut:
+    pharmacy = lookups["pharmacies"].get(qres.pharmacy_id)
     return QuotationResponseOut(
         id=qres.id,
         request_id=qres.request_id,
@@ -67,6 +99,36 @@ def _enrich_response(qres: QResModel, db: Session) -> QuotationResponseOut:
     )
 
 
+def _enrich_request(qr: QReqModel, db: Session) -> QuotationRequestOut:
+    return _request_out(qr, _load_lookups([qr], [], db))
+
+
+def _enrich_response(qres: QResModel, db: Session) -> QuotationResponseOut:
+    return _response_out(qres, _load_lookups([], [qres], db))
+
+
+def _enrich_full(requests: List[QReqModel], db: Session) -> List[QuotationFull]:
+    """Requests with their response (if any), in the given order"""
+    if not requests:
+        return []
+    responses = (
+        db.query(QResModel)
+        .filter(QResModel.request_id.in_([qr.id for qr in requests]))
+        .all()
+    )
+    by_request = {qres.request_id: qres for qres in responses}
+
+    lookups = _load_lookups(requests, responses, db)
+    results = []
+    for qr in requests:
+        qres = by_request.get(qr.id)
+        results.append(QuotationFull(
+            request=_request_out(qr, lookups),
+            response=_response_out(qres, lookups) if qres else None,
+        ))
+    return results
+
+
 # ═══════════════════════════════════════════════════════════════════
 # PATIENT ENDPOINTS
 # ═══════════════════════════════════════════════════════════════════
@@ -152,15 +214,7 @@ async def get_my_quotation_requests(
         .all()
     )
 
-    results = []
-    for qr in requests:
-        enriched_req = _enrich_request(qr, db)
-        # Check for response
-        qres = db.query(QResModel).filter(QResModel.request_id == qr.id).first()
-        enriched_res = _enrich_response(qres, db) if qres else None
-        results.append(QuotationFull(request=enriched_req, response=enriched_res))
-
-    return results
+    return _enrich_full(requests, db)
 
 
 @router.get("/patient/prescription/{prescription_id}", response_model=List[QuotationFull])
@@ -180,14 +234,7 @@ async def get_quotations_for_prescription(
         .all()
     )
 
-    results = []
-    for qr in requests:
-        enriched_req = _enrich_request(qr, db)
-        qres = db.query(QResModel).filter(QResModel.request_id == qr.id).first()
-        enriched_res = _enrich_response(qres, db) if qres else None
-        results.append(QuotationFull(request=enriched_req, response=enriched_res))
-
-    return results
+    return _enrich_full(requests, db)
 
 
 @router.patch("/patient/{request_id}/accept", response_model=QuotationRequestOut)
@@ -250,13 +297,7 @@ async def get_pharmacy_requests(
         q = q.filter(QReqModel.status == status_filter)
     requests = q.order_by(QReqModel.created_at.desc()).all()
 
-    results = []
-    for qr in requests:
-        enriched_req = _enrich_request(qr, db)
-        qres = db.query(QResModel).filter(QResModel.request_id == qr.id).first()
-        enriched_res = _enrich_response(qres, db) if qres else None
-        results.append(QuotationFull(request=enriched_req, response=enriched_res))
-    return results
+    return _enrich_full(requests, db)
 
 
 @router.get("/pharmacy/request/{request_id}", response_model=QuotationFull)
@@ -273,10 +314,7 @@ async def get_pharmacy_request_detail(
     if not qr:
         raise HTTPException(status_code=404, detail="Request not found")
 
-    enriched_req = _enrich_request(qr, db)
-    qres = db.query(QResModel).filter(QResModel.request_id == qr.id).first()
-    enriched_res = _enrich_response(qres, db) if qres else None
-    return QuotationFull(request=enriched_req, response=enriched_res)
+    return _enrich_full([qr], db)[0]
 
 
 @router.post("/pharmacy/respond", response_model=QuotationResponseOut, status_code=status.HTTP_201_CREATED)
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+
+from app.db import get_db
+from app.schemas.symptom import SymptomSuggestion, SymptomSuggestResponse
+from app.services.lookup_cache import lookup_cache
+from app.services.symptom_index import symptom_index
+
+# ---------------------------------------------------------------------------
+# Symptom Routes
+# Public symptom lookups for the patient dashboard (typeahead).
+# ---------------------------------------------------------------------------
+
+router = APIRouter(prefix="/api/symptoms", tags=["symptoms"])
+
+
+@router.get("/suggest", response_model=SymptomSuggestResponse)
+async def suggest_symptoms(
+    q: str = Query(..., min_length=1, max_length=100, description="Prefix typed by the user"),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(get_db),
+):
+    """
+    Ranked symptom suggestions for a typed prefix.
+    Served from the in-memory symptom index; the database is only touched
+    by the lookup cache's periodic version check.
+    """
+    symptom_index.sync(lookup_cache.get(db))
+    return SymptomSuggestResponse(
+        query=q,
+        suggestions=[SymptomSuggestion(**s) for s in symptom_index.suggest(q, limit=limit)],
+    )
@@ -58,5 +58,116 @@ class Settings(BaseSettings):
     SMTP_FROM_EMAIL: Optional[str] = None
     SMTP_USE_TLS: bool = True
 
+    # Voice uploads: decoded in memory through an ffmpeg pipe
+    FFMPEG_PATH: str = "ffmpeg"
+    AUDIO_WORKERS: int = 4  # concurrent decode + transcription jobs per worker process
+    AUDIO_DECODE_TIMEOUT_SECONDS: float = 30.0
+
+    # Preprocessing before STT: silence trim, duration cap, peak normalisation
+    AUDIO_TRIM_MARGIN_MS: int = 200  # audio kept either side of the detected speech
+    AUDIO_MAX_SPEECH_SECONDS: float = 60.0  # speech beyond this is not transcribed
+    AUDIO_NORMALIZE_DBFS: float = -1.0  # target peak level
+    AUDIO_MAX_GAIN_DB: float = 20.0  # quiet recordings are amplified at most this much
+
+    # Asynchronous voice-chat jobs (POST /api/patients/voice-chat/jobs)
+    VOICE_JOB_WORKERS: int = 2  # jobs processed concurrently per worker process
+    VOICE_JOB_QUEUE_SIZE: int = 20  # jobs waiting for a worker; further uploads get 503
+    VOICE_JOB_MAX_PER_PATIENT: int = 2  # queued or running jobs per patient; further uploads get 429
+    VOICE_JOB_MAX_BYTES: int = 5 * 1024 * 1024  # upload size
+    VOICE_JOB_MAX_SECONDS: float = 120.0  # decoded clip duration
+
+    # Speech-to-text backend: "google" (Web Speech API), "vosk" (offline, CPU) or
+    # "fake" (local deterministic stand-in)
+    STT_BACKEND: str = "google"
+    STT_TIMEOUT_SECONDS: Optional[float] = 15.0  # per Google request
+    STT_VOSK_MODEL_PATH: str = "./models/vosk-model-small-en-us-0.15"
+    STT_FAKE_LATENCY_MS: float = 0.0  # fixed artificial latency per clip
+    STT_FAKE_JITTER_MS: float = 0.0  # plus up to this much random latency
+    STT_FAKE_ERROR_RATE: float = 0.0  # fraction of clips that fail
+    STT_FAKE_SEED: int = 0
+
+    # Speech segmentation: streamed audio is transcribed a sentence at a time
+    STT_SEGMENT_SILENCE_MS: int = 600  # pause that ends a sentence
+    STT_SEGMENT_MAX_SECONDS: float = 15.0  # longer stretches are cut anyway
+    STT_SILENCE_RMS: float = 300.0  # frame RMS (of 32768) below which a frame counts as silence
+
+    # Streaming voice input (WebSocket /api/patients/voice-stream)
+    VOICE_STREAM_MAX_SESSIONS: int = 20  # concurrent streams per worker process
+    VOICE_STREAM_MAX_SECONDS: float = 120.0  # decoded audio per stream
+    VOICE_STREAM_MAX_BYTES: int = 10 * 1024 * 1024  # audio bytes received per stream
+    VOICE_STREAM_IDLE_TIMEOUT_SECONDS: float = 30.0  # closes a stream that stops sending
+
+    # Lookup cache (specializations / symptoms)
+    LOOKUP_CACHE_POLL_SECONDS: float = 2.0  # how often a worker checks the version row
+
+    # AI chat sessions
+    CHAT_SESSION_WINDOW: int = 10  # recent messages kept verbatim; older ones are summarised
+    CHAT_SESSION_SUMMARY_MAX_CHARS: int = 1500
+    CHAT_SESSION_CACHE_SIZE: int = 1000  # sessions held in memory per worker
+    CHAT_SESSION_TTL_SECONDS: int = 3600
+    CHAT_SESSION_SUMMARY_WORKERS: int = 2  # threads refining summaries with the model, off the request path
+
+    # Prompt budget (estimated input tokens per Gemini call)
+    PROMPT_MAX_TOKENS: int = 4000
+    PROMPT_MESSAGE_MAX_TOKENS: int = 400  # a single chat message / description
+    PROMPT_DIGEST_MAX_TOKENS: int = 300  # digest of history that no longer fits verbatim
+    PROMPT_DIGEST_REFINE_WORKERS: int = 2  # threads rewriting digests with the model, off the request path
+
+    # Local triage: RAG hits closer than this (Chroma L2 distance) grade severity
+    TRIAGE_RAG_MAX_DISTANCE: float = 0.8
+
+    # Per-step AI timings: also return them as a Server-Timing response header
+    SERVER_TIMING_HEADER: bool = False
+
+    # LLM backend: "gemini" (Google API) or "fake" (local deterministic stand-in)
+    LLM_BACKEND: str = "gemini"
+    LLM_FAKE_LATENCY_MS: float = 0.0  # fixed artificial latency per call
+    LLM_FAKE_JITTER_MS: float = 0.0  # plus up to this much random latency
+    LLM_FAKE_ERROR_RATE: float = 0.0  # fraction of calls that fail
+    LLM_FAKE_SEED: int = 0
+
+    # LLM task routing: model, temperature, max output tokens and timeout per task
+    LLM_CLASSIFY_MODEL: str = "gemini-2.5-flash-lite"  # YES/NO symptom check
+    LLM_CLASSIFY_TEMPERATURE: float = 0.0
+    LLM_CLASSIFY_MAX_OUTPUT_TOKENS: int = 16
+    LLM_CLASSIFY_TIMEOUT_SECONDS: float = 5.0
+
+    LLM_CONVERSE_MODEL: str = "gemini-2.5-flash-lite"  # small talk
+    LLM_CONVERSE_TEMPERATURE: float = 0.7
+    LLM_CONVERSE_MAX_OUTPUT_TOKENS: int = 512
+    LLM_CONVERSE_TIMEOUT_SECONDS: float = 15.0
+
+    LLM_ANALYZE_MODEL: str = "gemini-2.5-flash"  # symptom analysis (chat and consultation)
+    LLM_ANALYZE_TEMPERATURE: float = 0.2
+    LLM_ANALYZE_MAX_OUTPUT_TOKENS: int = 2048
+    LLM_ANALYZE_TIMEOUT_SECONDS: float = 30.0
+
+    LLM_ADVISE_MODEL: str = "gemini-2.5-flash-lite"  # short health advice
+    LLM_ADVISE_TEMPERATURE: float = 0.4
+    LLM_ADVISE_MAX_OUTPUT_TOKENS: int = 512
+    LLM_ADVISE_TIMEOUT_SECONDS: float = 15.0
+
+    LLM_VOICE_MODEL: str = "gemini-2.5-flash"  # transcribed voice analysis
+    LLM_VOICE_TEMPERATURE: float = 0.2
+    LLM_VOICE_MAX_OUTPUT_TOKENS: int = 2048
+    LLM_VOICE_TIMEOUT_SECONDS: float = 30.0
+
+    LLM_SUMMARIZE_MODEL: str = "gemini-2.5-flash-lite"  # conversation summaries
+    LLM_SUMMARIZE_TEMPERATURE: float = 0.0
+    LLM_SUMMARIZE_MAX_OUTPUT_TOKENS: int = 512
+    LLM_SUMMARIZE_TIMEOUT_SECONDS: float = 15.0
+
+    LLM_BATCH_MODEL: str = "gemini-2.5-flash"  # several consultation descriptions per call
+    LLM_BATCH_TEMPERATURE: float = 0.2
+    LLM_BATCH_MAX_OUTPUT_TOKENS: int = 8192
+    LLM_BATCH_TIMEOUT_SECONDS: float = 90.0
+
+    # Batch symptom analysis (admin backfills / re-scoring)
+    BATCH_ANALYSIS_MAX_ITEMS: int = 5000  # per job
+    BATCH_ANALYSIS_CHUNK_SIZE: int = 50  # descriptions per RAG query and per bulk write
+    BATCH_ANALYSIS_PACK_SIZE: int = 5  # descriptions packed into one LLM call
+    BATCH_ANALYSIS_CONCURRENCY: int = 4  # LLM calls in flight across all batch jobs
+    JOB_TTL_SECONDS: int = 86400  # finished jobs are kept this long for polling
+
 
 settings = Settings()
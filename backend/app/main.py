@@ -1,4 +1,4 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 from fastapi.staticfiles import StaticFiles
@@ -15,7 +15,13 @@ from app.api.routes import clinic as clinic_router
 from app.api.routes import lab_quotation as lab_quotation_router
 from app.api.routes import lab_report as lab_report_router
 from app.api.routes import rating as rating_router
-from app.db import Base, engine
+from app.api.routes import symptom as symptom_router
+from app.db import Base, engine, SessionLocal
+from app.services.lookup_cache import lookup_cache
+from app.services.rag_service import rag_service
+from app.services.specialization_aliases import specialization_aliases
+from app.services.voice_jobs import voice_jobs
+from app.services.timing import start_request_timing, stop_request_timing, server_timing_header
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
@@ -79,6 +85,22 @@ try:
             # Table might not exist yet, SQLAlchemy will create it with correct default
             pass
 
+        # AI consultation history: keyset pagination index for existing tables
+        conn.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_ai_consultations_patient_created "
+                "ON ai_consultations (patient_id, created_at, id)"
+            )
+        )
+
+        # Appointments: a doctor's schedule by date (listing and slot checks)
+        conn.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_appointments_doctor_date_time "
+                "ON appointments (doctor_id, date, time)"
+            )
+        )
+
         # Core lookup: doctor specializations (from doctor sign-up page)
         conn.execute(
             text(
@@ -128,6 +150,14 @@ try:
                 """
             )
         )
+
+        # Version counter polled by the in-process lookup cache
+        conn.execute(
+            text(
+                "INSERT INTO lookup_versions (name, version) VALUES ('lookups', 0) "
+                "ON CONFLICT (name) DO NOTHING"
+            )
+        )
 except Exception as _e:
     # Don't block app startup if migration isn't supported (or DB is read-only).
     pass
@@ -151,6 +181,20 @@ app.add_middleware(
     max_age=3600,
 )
 
+# Collect per-step AI timings for each API request (see app/services/timing.py)
+@app.middleware("http")
+async def request_timing_middleware(request: Request, call_next):
+    if not request.url.path.startswith("/api/"):
+        return await call_next(request)
+    token = start_request_timing()
+    try:
+        response = await call_next(request)
+    finally:
+        timings = stop_request_timing(token)
+    if settings.SERVER_TIMING_HEADER and timings:
+        response.headers["Server-Timing"] = server_timing_header(timings)
+    return response
+
 # Include routers
 app.include_router(health.router, tags=["health"])
 app.include_router(patient.router)
@@ -165,6 +209,7 @@ app.include_router(clinic_router.router)
 app.include_router(lab_quotation_router.router)
 app.include_router(lab_report_router.router)
 app.include_router(rating_router.router)
+app.include_router(symptom_router.router)
 
 # Mount static files for uploads
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
@@ -187,10 +232,28 @@ async def startup_event():
     print(f"📝 API Documentation: http://localhost:{settings.PORT}/docs")
     print(f"🔧 Debug Mode: {settings.DEBUG}")
 
+    # Precompute the specialization alias index from DB names + RAG categories
+    db = SessionLocal()
+    try:
+        snapshot = lookup_cache.get(db)
+        specialization_aliases.build(
+            snapshot.specializations,
+            categories=rag_service.get_stats().get("categories", []),
+            version=snapshot.version,
+        )
+    except Exception as e:
+        print(f"⚠ Could not build specialization alias index: {e}")
+    finally:
+        db.close()
+
+    # Workers for queued voice-chat jobs
+    voice_jobs.start()
+
 # Shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
     print(f"👋 {settings.APP_NAME} shutting down...")
+    await voice_jobs.stop()
 
 
 if __name__ == "__main__":
@@ -12,5 +12,7 @@ from app.models.clinic import Clinic
 from app.models.lab_quotation import LabQuotationRequest, LabQuotationResponse
 from app.models.lab_report import LabReport
 from app.models.rating import DoctorRating
+from app.models.lookup_version import LookupVersion
+from app.models.ai_chat_session import AIChatSession, AIChatMessage
 
-__all__ = ["Patient", "UserRole", "Doctor", "Specialization", "Symptom", "Appointment", "AIConsultation", "RefreshToken", "Prescription", "Pharmacy", "QuotationRequest", "QuotationResponse", "Clinic", "LabQuotationRequest", "LabQuotationResponse", "LabReport", "DoctorRating"]
+__all__ = ["Patient", "UserRole", "Doctor", "Specialization", "Symptom", "Appointment", "AIConsultation", "RefreshToken", "Prescription", "Pharmacy", "QuotationRequest", "QuotationResponse", "Clinic", "LabQuotationRequest", "LabQuotationResponse", "LabReport", "DoctorRating", "LookupVersion", "AIChatSession", "AIChatMessage"]
@@ -0,0 +1,41 @@
+"""
+AI Chat Session Models
+Server-side conversation state for the AI health assistant chat
+"""
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.db.database import Base
+
+
+class AIChatSession(Base):
+    """
+    A patient's chat session with the AI assistant.
+    Older turns are folded into `summary`; `summarized_count` is how many
+    messages (in order) the summary already covers.
+    """
+    __tablename__ = "ai_chat_sessions"
+
+    id = Column(String(36), primary_key=True)  # uuid4 hex string
+    patient_id = Column(Integer, ForeignKey("patients.id", ondelete="CASCADE"), nullable=False, index=True)
+
+    summary = Column(Text, nullable=True)
+    summarized_count = Column(Integer, nullable=False, default=0)
+    message_count = Column(Integer, nullable=False, default=0)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<AIChatSession(id={self.id}, patient_id={self.patient_id}, messages={self.message_count})>"
+
+
+class AIChatMessage(Base):
+    """Append-only log of messages in an AI chat session"""
+    __tablename__ = "ai_chat_messages"
+
+    id = Column(Integer, primary_key=True, index=True)
+    session_id = Column(String(36), ForeignKey("ai_chat_sessions.id", ondelete="CASCADE"), nullable=False, index=True)
+    role = Column(String(20), nullable=False)  # 'user' or 'assistant'
+    content = Column(Text, nullable=False)
+
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -2,7 +2,7 @@
 AI Consultation History Model
 Stores conversation history between patients and AI Doctor
 """
-from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, JSON
+from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey, JSON, Index
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from app.db.database import Base
@@ -38,5 +38,10 @@ class AIConsultation(Base):
     # Relationship
     patient = relationship("Patient", backref="ai_consultations")
 
+    __table_args__ = (
+        # Keyset pagination of a patient's history, newest first
+        Index("ix_ai_consultations_patient_created", "patient_id", "created_at", "id"),
+    )
+
     def __repr__(self):
         return f"<AIConsultation(id={self.id}, patient_id={self.patient_id}, severity={self.severity})>"
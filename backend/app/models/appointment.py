@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Text, Date, Time, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Text, Date, Time, ForeignKey, DateTime, Index
 from sqlalchemy.sql import func
 
 from app.db.database import Base
@@ -25,4 +25,9 @@ class Appointment(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
 
+    __table_args__ = (
+        # A doctor's appointments by date (listing, date ranges, slot checks)
+        Index("ix_appointments_doctor_date_time", "doctor_id", "date", "time"),
+    )
+
 
@@ -0,0 +1,18 @@
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+
+from app.db.database import Base
+
+
+class LookupVersion(Base):
+    """
+    Version counter for cached lookup data (specializations, symptoms).
+    Admin CRUD bumps the counter; every worker polls it to know when its
+    in-process lookup cache is stale.
+    """
+    __tablename__ = "lookup_versions"
+
+    name = Column(String(50), primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
@@ -17,11 +17,14 @@ from app.schemas.ai_doctor import (
     AIChatRequest,
     AIChatResponse,
     ChatMessage,
+    ChatSessionResponse,
     DoctorSuggestion,
     SymptomInfo,
     SpecializationMatch,
     AIConsultationHistoryItem,
     AIConsultationHistoryResponse,
+    AIConsultationSummaryItem,
+    AIConsultationSummaryPage,
 )
 from app.schemas.pharmacy import (
     PharmacySignUp,
@@ -56,9 +59,12 @@ __all__ = [
     "AIChatRequest",
     "AIChatResponse",
     "ChatMessage",
+    "ChatSessionResponse",
     "DoctorSuggestion",
     "SymptomInfo",
     "SpecializationMatch",
     "AIConsultationHistoryItem",
     "AIConsultationHistoryResponse",
+    "AIConsultationSummaryItem",
+    "AIConsultationSummaryPage",
 ]
@@ -2,7 +2,7 @@
 Schemas for AI Doctor Consultation
 """
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import List, Literal, Optional
 from datetime import datetime
 
 
@@ -15,7 +15,8 @@ class ChatMessage(BaseModel):
 class AIChatRequest(BaseModel):
     """Request schema for AI chat"""
     message: str = Field(..., min_length=1, max_length=2000, description="User's message")
-    conversation_history: List[ChatMessage] = Field(default_factory=list, description="Previous messages in conversation")
+    session_id: Optional[str] = Field(None, max_length=36, description="Chat session to continue; omit to start a new one")
+    conversation_history: List[ChatMessage] = Field(default_factory=list, description="Previous messages (legacy clients); only used to seed a new session")
 
 
 class SpecializationMatch(BaseModel):
@@ -35,6 +36,8 @@ class DoctorSuggestion(BaseModel):
     schedule: Optional[str] = None
     match_percentage: int = Field(default=0, ge=0, le=100, description="Match percentage based on specialization")
     match_reason: str = Field(default="", description="Reason for the match")
+    average_rating: Optional[float] = Field(None, description="Average patient rating (1-5)")
+    next_available: Optional[datetime] = Field(None, description="Next free appointment slot")
     
     class Config:
         from_attributes = True
@@ -55,6 +58,15 @@ class AIChatResponse(BaseModel):
     health_advice: Optional[str] = Field(None, description="General health advice")
     should_show_doctors: bool = Field(default=False, description="Whether to show doctor recommendations")
     has_matching_doctors: bool = Field(default=False, description="Whether matching doctors were found")
+    session_id: Optional[str] = Field(None, description="Chat session this message belongs to")
+
+
+class ChatSessionResponse(BaseModel):
+    """Server-side chat session state"""
+    session_id: str
+    summary: Optional[str] = Field(None, description="Rolling summary of messages older than the recent window")
+    message_count: int = Field(..., description="Total number of messages in the session")
+    messages: List[ChatMessage] = Field(default_factory=list, description="Most recent messages")
 
 
 class AIConsultationRequest(BaseModel):
@@ -110,3 +122,75 @@ class AIConsultationHistoryResponse(BaseModel):
     """Response schema for consultation history"""
     total: int
     consultations: List[AIConsultationHistoryItem] = Field(default_factory=list)
+
+
+class AIConsultationSummaryItem(BaseModel):
+    """Lightweight history entry; full details come from the detail endpoint"""
+    id: int
+    description: str = Field(..., description="Start of the patient's description")
+    description_truncated: bool = False
+    detected_symptoms: List[str] = Field(default_factory=list)
+    severity: Optional[str] = None
+    emergency_warning: bool = False
+    created_at: datetime
+
+
+class AIConsultationSummaryPage(BaseModel):
+    """One keyset-paginated page of consultation summaries"""
+    consultations: List[AIConsultationSummaryItem] = Field(default_factory=list)
+    next_cursor: Optional[str] = Field(None, description="Pass as cursor to get the next (older) page")
+    has_more: bool = False
+
+
+# ============ LLM Output Schemas ============
+# Shapes Gemini is asked to return (via response_schema) and validated against.
+
+class LLMSpecialization(BaseModel):
+    """Specialization recommended by the model"""
+    name: str = Field(..., description="Specialization name from the available list")
+    match_percentage: int = Field(..., description="Match percentage 0-100")
+    reason: Optional[str] = Field(None, description="Why this specialization fits")
+
+
+class LLMChatAnalysis(BaseModel):
+    """Model output for a symptom message in the chat"""
+    response_type: Literal["symptom_analysis", "conversation", "follow_up"]
+    message: str = Field(..., description="Empathetic response acknowledging the symptoms")
+    detected_symptoms: List[str] = Field(default_factory=list)
+    recommended_specializations: List[LLMSpecialization] = Field(default_factory=list)
+    should_show_doctors: bool = True
+
+
+class LLMConsultationAnalysis(BaseModel):
+    """Model output for a one-shot consultation description"""
+    detected_symptoms: List[str] = Field(default_factory=list)
+    symptom_analysis: Optional[str] = Field(None, description="Brief analysis of the symptoms")
+    recommended_specializations: List[LLMSpecialization] = Field(default_factory=list)
+    severity: Literal["low", "moderate", "high"] = "moderate"
+    confidence: Optional[Literal["low", "medium", "high"]] = None
+    additional_notes: Optional[str] = None
+    emergency_warning: bool = False
+
+
+class LLMBatchConsultationItem(LLMConsultationAnalysis):
+    """One description's analysis inside a packed batch response"""
+    index: int = Field(..., description="Index of the description in the batch prompt")
+
+
+class LLMBatchConsultationAnalysis(BaseModel):
+    """Model output for several consultation descriptions analysed in one call"""
+    results: List[LLMBatchConsultationItem] = Field(default_factory=list)
+
+
+class LLMVoiceAnalysis(BaseModel):
+    """Model output for a transcribed voice message"""
+    response_type: Literal["symptom_analysis", "conversation"]
+    message: str = Field(..., description="Response in the patient's language")
+    detected_symptoms: List[str] = Field(default_factory=list)
+    symptom_analysis: Optional[str] = None
+    recommended_specializations: List[LLMSpecialization] = Field(default_factory=list)
+    severity: Optional[Literal["low", "moderate", "high"]] = None
+    confidence: Optional[Literal["low", "medium", "high"]] = None
+    additional_notes: Optional[str] = None
+    emergency_warning: bool = False
+    should_show_doctors: bool = False
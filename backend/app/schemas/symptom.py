@@ -0,0 +1,18 @@
+"""
+Schemas for symptom lookup and autocomplete
+"""
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+
+class SymptomSuggestion(BaseModel):
+    """A single typeahead suggestion"""
+    name: str
+    specialization: Optional[str] = None
+    source: str = Field(..., description="'symptom' for curated symptoms, 'knowledge_base' for RAG mappings")
+
+
+class SymptomSuggestResponse(BaseModel):
+    """Response schema for symptom autocomplete"""
+    query: str
+    suggestions: List[SymptomSuggestion] = Field(default_factory=list)
@@ -2,69 +2,482 @@
 AI Service for symptom analysis and doctor recommendation using Google Gemini
 Enhanced with RAG (Retrieval-Augmented Generation) for better medical knowledge
 """
-import os
-import json
-import re
+import asyncio
+import time
 from typing import List, Dict, Optional
-import google.generativeai as genai
 from app.core.config import settings
+from app.schemas.ai_doctor import (
+    LLMBatchConsultationAnalysis,
+    LLMChatAnalysis,
+    LLMConsultationAnalysis,
+    LLMVoiceAnalysis,
+)
+from app.services.structured_output import parse_structured
+from app.services.metrics import metrics
+from app.services.timing import record_step, step
+from app.services.llm_backend import LLMResponse, LLMTask, RouteConfig, create_backend
 from app.services.rag_service import rag_service
+from app.services.prompt_budget import PromptBudget, count_tokens, truncate_to_tokens
+from app.services.chat_sessions import chat_sessions, extractive_summary
+from app.services.triage import TriageResult, triage
 from pathlib import Path
 
 
+# ── System instructions ──────────────────────────────────────
+# Fixed role, rules and few-shot examples for each task. They are set once on
+# the task's GenerativeModel, so per-request prompts only carry the patient
+# message, RAG context and history.
+
+SYMPTOM_CHECK_SYSTEM = """Decide whether the user's message is about health/symptoms. Answer YES or NO only.
+
+Examples:
+Message: "Hello there" -> NO
+Message: "I have a headache" -> YES
+Message: "What is your name?" -> NO
+Message: "I feel nauseous" -> YES
+Message: "How does this work?" -> NO
+Message: "My stomach hurts" -> YES
+
+Answer YES if the message asks about pain, illness, symptoms, or medical concerns."""
+
+GENERAL_CONVERSATION_SYSTEM = """You are MedNexus AI Health Assistant. Keep responses brief and helpful.
+Respond helpfully. If greeting, greet back and offer health assistance. Return only your response text, no JSON."""
+
+SYMPTOM_ANALYSIS_SYSTEM = """You are an AI Health Assistant for MedNexus. Analyze symptoms and suggest specialists.
+
+Examples:
+Input: "I have a severe headache and feel dizzy"
+Output: {
+    "response_type": "symptom_analysis",
+    "message": "I understand you're experiencing a severe headache and dizziness. These symptoms can be concerning and may indicate several conditions that would benefit from professional evaluation.",
+    "detected_symptoms": ["headache", "dizziness"],
+    "recommended_specializations": [{"name": "Neurology", "match_percentage": 85, "reason": "Severe headaches with dizziness may indicate neurological issues"}],
+    "should_show_doctors": true
+}
+
+Input: "I've been feeling tired lately"
+Output: {
+    "response_type": "symptom_analysis",
+    "message": "I understand you've been experiencing fatigue. This is a common symptom that can have various causes. Let me help you find the right specialist to evaluate this properly.",
+    "detected_symptoms": ["fatigue"],
+    "recommended_specializations": [{"name": "Internal Medicine", "match_percentage": 75, "reason": "General fatigue is best evaluated by an internist initially"}],
+    "should_show_doctors": true
+}
+
+INSTRUCTIONS:
+1. Use the Medical Knowledge Base to understand symptoms and map to specializations
+2. Recommend ONLY specializations that exist in our AVAILABLE SPECIALIZATIONS list
+3. Provide empathetic, clear responses
+4. Be specific about why you're recommending each specialization"""
+
+ANALYZE_SYMPTOMS_SYSTEM = """Analyze symptoms using medical knowledge and recommend specialists.
+
+Examples:
+Patient: "I have stomach pain and nausea"
+{
+    "detected_symptoms": ["stomach pain", "nausea"],
+    "recommended_specializations": [{"name": "Gastroenterology", "match_percentage": 85}],
+    "severity": "moderate"
+}
+
+Patient: "I have chest pain and shortness of breath"
+{
+    "detected_symptoms": ["chest pain", "shortness of breath"],
+    "recommended_specializations": [{"name": "Cardiology", "match_percentage": 90}],
+    "severity": "high"
+}
+
+Use the Medical Knowledge Base to inform your analysis."""
+
+ANALYZE_SYMPTOMS_BATCH_SYSTEM = """Analyze several independent patient descriptions using medical knowledge and recommend specialists for each.
+
+Each description is numbered [index]. Return one entry in "results" per description, with its "index",
+and analyze every description on its own - never mix symptoms between descriptions.
+
+Example:
+[0] PATIENT DESCRIPTION: "I have stomach pain and nausea"
+[1] PATIENT DESCRIPTION: "I have chest pain and shortness of breath"
+{
+    "results": [
+        {"index": 0, "detected_symptoms": ["stomach pain", "nausea"], "recommended_specializations": [{"name": "Gastroenterology", "match_percentage": 85}], "severity": "moderate"},
+        {"index": 1, "detected_symptoms": ["chest pain", "shortness of breath"], "recommended_specializations": [{"name": "Cardiology", "match_percentage": 90}], "severity": "high"}
+    ]
+}
+
+Use the Medical Knowledge Base to inform your analysis."""
+
+HEALTH_ADVICE_SYSTEM = """Provide brief, general health advice for the given symptoms.
+
+Examples:
+Symptoms: ["headache", "fever"] | Severity: moderate
+Advice: "For headache and fever, rest in a cool, dark room and stay hydrated. Consider over-the-counter pain relievers if needed. If fever exceeds 101°F or symptoms worsen, seek medical attention promptly."
+
+Symptoms: ["chest pain"] | Severity: high
+Advice: "Chest pain can be serious. Seek immediate medical attention, especially if accompanied by shortness of breath, nausea, or arm pain. Do not delay - call emergency services if severe."
+"""
+
+VOICE_ANALYSIS_SYSTEM = """You are a medical AI assistant. Patients send voice messages that are transcribed to text.
+
+IMPORTANT: Respond in the SAME LANGUAGE as the patient's message. If they spoke in Arabic, respond in Arabic. If they spoke in Spanish, respond in Spanish, etc.
+
+Your task:
+1. Analyze what the patient said about their symptoms
+2. Extract all mentioned symptoms
+3. Determine severity (low/moderate/high)
+4. Recommend appropriate medical specializations
+5. Provide helpful health advice
+
+Write "message", "symptom_analysis", the specialization reasons and "additional_notes" in the patient's language.
+"message" is a natural, empathetic response acknowledging you heard their voice message and summarizing the symptoms.
+
+Important: Acknowledge that this was a voice message and be empathetic. Respond entirely in the patient's language."""
+
+SUMMARIZE_SYSTEM = """Summarize conversations between a patient and a health assistant.
+Keep every symptom, duration, severity, medication and specialist mentioned. Plain text only."""
+
+
+# ── Per-request prompt templates ─────────────────────────────
+# Filled with str.format; the prompt budget counts their fixed text once.
+
+SYMPTOM_CHECK_PROMPT = """{history_text}Message: "{message}"
+YES or NO:"""
+
+GENERAL_CONVERSATION_PROMPT = """Recent chat:
+{history_text}
+
+User: "{message}"
+"""
+
+SYMPTOM_ANALYSIS_PROMPT = """MEDICAL KNOWLEDGE BASE (Retrieved from comprehensive database):
+{medical_knowledge}
+
+AVAILABLE SPECIALIZATIONS IN OUR SYSTEM:
+{spec_context}
+
+CONVERSATION HISTORY:
+{history_text}
+
+CURRENT PATIENT MESSAGE: "{user_message}"
+"""
+
+ANALYZE_SYMPTOMS_PROMPT = """MEDICAL KNOWLEDGE BASE:
+{medical_knowledge}
+
+AVAILABLE SPECIALIZATIONS: {spec_context}
+
+PATIENT DESCRIPTION: "{patient_description}"
+"""
+
+ANALYZE_SYMPTOMS_BATCH_PROMPT = """MEDICAL KNOWLEDGE BASE:
+{medical_knowledge}
+
+AVAILABLE SPECIALIZATIONS: {spec_context}
+
+{descriptions}
+"""
+
+HEALTH_ADVICE_PROMPT = """Symptoms: {symptoms} | Severity: {severity}
+Advice:"""
+
+VOICE_ANALYSIS_PROMPT = """Patient's voice message (transcribed): "{transcribed_text}"
+
+Previous conversation:
+{history_text}
+
+Available specializations: {spec_context}"""
+
+SUMMARIZE_PROMPT = """Summarize in at most {max_words} words.
+
+{previous}{transcript}
+
+Summary:"""
+
+# Tasks whose output is JSON validated against a Pydantic model
+TASK_OUTPUT_SCHEMAS = {
+    "symptom_analysis": LLMChatAnalysis,
+    "analyze_symptoms": LLMConsultationAnalysis,
+    "analyze_symptoms_batch": LLMBatchConsultationAnalysis,
+    "voice_analysis": LLMVoiceAnalysis,
+}
+
+# Task -> model route; each route has its own model settings (LLM_<ROUTE>_* in Settings)
+TASK_ROUTES = {
+    "symptom_check": "classify",
+    "general_conversation": "converse",
+    "symptom_analysis": "analyze",
+    "analyze_symptoms": "analyze",
+    "analyze_symptoms_batch": "batch",
+    "health_advice": "advise",
+    "voice_analysis": "voice",
+    "summarize": "summarize",
+}
+
+# Task name -> system instruction; one GenerativeModel is created per task
+TASK_SYSTEM_INSTRUCTIONS = {
+    "symptom_check": SYMPTOM_CHECK_SYSTEM,
+    "general_conversation": GENERAL_CONVERSATION_SYSTEM,
+    "symptom_analysis": SYMPTOM_ANALYSIS_SYSTEM,
+    "analyze_symptoms": ANALYZE_SYMPTOMS_SYSTEM,
+    "analyze_symptoms_batch": ANALYZE_SYMPTOMS_BATCH_SYSTEM,
+    "health_advice": HEALTH_ADVICE_SYSTEM,
+    "voice_analysis": VOICE_ANALYSIS_SYSTEM,
+    "summarize": SUMMARIZE_SYSTEM,
+}
+
+
+def _merge_knowledge(rag_contexts: List[Dict]) -> str:
+    """One numbered knowledge block for several retrievals, without duplicates"""
+    lines = []
+    for context in rag_contexts:
+        for meta in context.get("metadatas") or []:
+            line = f"{meta['category']}: {meta['mapping']}"
+            if line not in lines:
+                lines.append(line)
+    return "\n".join(f"{i + 1}. {line}" for i, line in enumerate(lines))
+
+
 class AIService:
-    def __init__(self):
-        """Initialize Gemini AI with API key and RAG service"""
-        api_key = os.getenv("GOOGLE_API_KEY")
-        if not api_key:
-            raise ValueError("GOOGLE_API_KEY not found in environment variables")
-        
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
+    def __init__(self, backend: Optional[str] = None):
+        """Initialize the LLM backend (settings.LLM_BACKEND) and RAG service"""
+        # Each task carries its fixed instructions and few-shot examples, its
+        # route's model settings, and structured tasks their output schema
+        routes = {route: RouteConfig.from_settings(route) for route in set(TASK_ROUTES.values())}
+        self.tasks = {
+            task: LLMTask(
+                name=task,
+                route=TASK_ROUTES[task],
+                config=routes[TASK_ROUTES[task]],
+                system_instruction=instruction,
+                output_model=TASK_OUTPUT_SCHEMAS.get(task),
+            )
+            for task, instruction in TASK_SYSTEM_INSTRUCTIONS.items()
+        }
+        self.backend = create_backend(self.tasks, backend)
+        self._system_tokens = {
+            task: count_tokens(instruction)
+            for task, instruction in TASK_SYSTEM_INSTRUCTIONS.items()
+        }
         self.rag = rag_service  # RAG service for medical knowledge retrieval
         
+        # Token ceiling per Gemini call; history that does not fit is digested
+        self.budget = PromptBudget(
+            max_tokens=settings.PROMPT_MAX_TOKENS,
+            message_max_tokens=settings.PROMPT_MESSAGE_MAX_TOKENS,
+            digest_max_tokens=settings.PROMPT_DIGEST_MAX_TOKENS,
+            refiner=self.summarize_turns,
+            refine_workers=settings.PROMPT_DIGEST_REFINE_WORKERS,
+        )
+        # Chat windows roll with the extractive summary; the model summary follows in the background
+        chat_sessions.refiner = self.summarize_turns
+        
         # Log RAG status
         stats = self.rag.get_stats()
-        print(f"✓ AI Service initialized with RAG")
+        print(f"✓ AI Service initialized with RAG ({self.backend.name} LLM backend)")
         print(f"  → Medical knowledge base: {stats['total_documents']} mappings")
         print(f"  → Specializations covered: {stats['unique_categories']}")
 
+    def _generate(self, task: str, prompt: str) -> LLMResponse:
+        """
+        Run a task prompt on the backend, recording latency, token usage and
+        errors per route.
+        """
+        route = TASK_ROUTES[task]
+        started = time.perf_counter()
+        try:
+            response = self.backend.generate(task, prompt)
+        except Exception:
+            metrics.increment("llm_errors_total", route=route, task=task)
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.observe("llm_request_seconds", elapsed, route=route, task=task)
+            record_step(f"{route}_llm", elapsed)
+
+        metrics.increment("llm_prompt_tokens_total", response.prompt_tokens, route=route)
+        metrics.increment("llm_output_tokens_total", response.output_tokens, route=route)
+        return response
+
+    def summarize_turns(self, previous: str, messages: List[Dict[str, str]]) -> str:
+        """
+        Fold messages into a running conversation summary.
+        Used for chat session summaries and prompt-budget digests; falls back to
+        an extractive summary when the model call fails.
+        """
+        max_tokens = settings.PROMPT_DIGEST_MAX_TOKENS
+        transcript = "\n".join(
+            f"{'Patient' if m['role'] == 'user' else 'Assistant'}: {self.budget.fit_message(m['content'])}"
+            for m in messages
+        )
+        prompt = SUMMARIZE_PROMPT.format(
+            max_words=int(max_tokens * 0.75),
+            previous=f"Summary so far: {previous}\n\n" if previous else "",
+            transcript=truncate_to_tokens(transcript, settings.PROMPT_MAX_TOKENS - max_tokens),
+        )
+        try:
+            response = self._generate("summarize", prompt)
+            summary = response.text.strip()
+            if summary:
+                return truncate_to_tokens(summary, max_tokens)
+        except Exception as e:
+            print(f"Conversation summary AI call failed: {e}")
+        return extractive_summary(previous, messages, max_tokens * 4)
+
+    def _fit_prompt(
+        self,
+        name: str,
+        template: str,
+        message: str,
+        fixed_parts: tuple = (),
+        knowledge: str = "",
+        history: Optional[List[Dict[str, str]]] = None,
+        summary: str = "",
+        user_label: str = "Patient",
+        assistant_label: str = "Health Assistant",
+    ) -> tuple:
+        """
+        Trim the variable parts of a prompt to the per-call token budget.
+        The task's system instruction counts against the budget too.
+        Returns (message, knowledge, history_text); knowledge gets at most half
+        of what is left when there is history to fit as well.
+        """
+        with step("prompt_build"):
+            return self._fit_prompt_parts(
+                name, template, message, fixed_parts, knowledge,
+                history, summary, user_label, assistant_label,
+            )
+
+    def _fit_prompt_parts(
+        self,
+        name: str,
+        template: str,
+        message: str,
+        fixed_parts: tuple,
+        knowledge: str,
+        history: Optional[List[Dict[str, str]]],
+        summary: str,
+        user_label: str,
+        assistant_label: str,
+    ) -> tuple:
+        message = self.budget.fit_message(message)
+        available = max(
+            self.budget.remaining(name, template, message, *fixed_parts) - self._system_tokens.get(name, 0),
+            0,
+        )
+        
+        if knowledge:
+            share = available // 2 if (history or summary) else available
+            knowledge = truncate_to_tokens(knowledge, share)
+            available -= count_tokens(knowledge)
+        
+        history_text = ""
+        if history or summary:
+            history_text = self.budget.history_block(
+                history or [], summary, available,
+                user_label=user_label, assistant_label=assistant_label,
+            )
+        return message, knowledge, history_text
+
     
-    def chat_response(
+    @staticmethod
+    def _apply_triage(result: Dict, local: TriageResult) -> Dict:
+        """
+        Reconcile a chat or voice reply with the local triage. On an emergency
+        the notice leads the reply, and a reply the model failed to produce
+        still refers the patient to the red flags' specializations.
+        """
+        triage.reconcile(result, local)
+        notice = local.notice
+        if notice:
+            if notice not in result.get("message", ""):
+                result["message"] = f"⚠️ {notice}\n\n{result.get('message', '')}".strip()
+            result["response_type"] = "symptom_analysis"
+            result["should_show_doctors"] = bool(result.get("recommended_specializations"))
+        return result
+    
+    async def prepare_chat(
+        self,
+        user_message: str,
+        recent_history: List[Dict[str, str]],
+        symptoms_related: Optional[bool] = None,
+        rag_context: Optional[Dict] = None
+    ) -> tuple:
+        """
+        Routing and retrieval for a chat message: (symptoms_related, rag_context, triage).
+        
+        Local triage and the keyword check run first; when they don't decide
+        the routing, the LLM classification and the RAG retrieval run
+        concurrently (in worker threads). Values already known by the caller
+        (e.g. prefetched while a voice message was still streaming) are reused.
+        """
+        # Local triage; a red flag settles the routing and emergency handling
+        # before any model call
+        local_triage = triage.assess(user_message)
+        if symptoms_related is None and (local_triage.red_flags or self._has_health_keywords(user_message)):
+            symptoms_related = True
+        
+        pending = {}
+        if symptoms_related is None:
+            pending["symptoms"] = asyncio.to_thread(self._classify_symptoms, user_message, recent_history)
+        if rag_context is None and symptoms_related is not False:
+            pending["rag"] = asyncio.to_thread(self.rag.retrieve_context, user_message, 5)
+        done = dict(zip(pending, await asyncio.gather(*pending.values())))
+        
+        return done.get("symptoms", symptoms_related), done.get("rag", rag_context), local_triage
+    
+    async def chat_response(
         self,
         user_message: str,
         conversation_history: List[Dict[str, str]],
         available_specializations: List[str],
-        available_symptoms: List[Dict[str, str]]
+        available_symptoms: List[Dict[str, str]],
+        conversation_summary: str = "",
+        symptoms_related: Optional[bool] = None,
+        rag_context: Optional[Dict] = None
     ) -> Dict:
         """
         Generate a conversational response. Uses minimal prompt for simple conversation,
         full analysis only when symptoms are detected.
         
+        When the keyword check is inconclusive, the LLM classification and the
+        RAG retrieval run concurrently (in worker threads), so a symptom
+        message waits for the slower of the two rather than both.
+        
         Args:
             user_message: The current message from the user
             conversation_history: List of previous messages [{role: "user"|"assistant", content: str}]
             available_specializations: List of available doctor specializations
             available_symptoms: List of symptom objects
+            conversation_summary: Summary of older messages no longer in conversation_history
+            symptoms_related: Routing decision, when already made by the caller
+            rag_context: Retrieved knowledge, when already fetched by the caller
         
         Returns:
             Dict containing response text and optional symptom analysis
         """
         try:
-            # Step 1: Quick check if this might be symptoms-related
-            is_likely_symptoms = self._is_symptoms_related(user_message, conversation_history[-3:])
+            recent_history = conversation_history[-3:]
+            
+            is_likely_symptoms, rag_context, local_triage = await self.prepare_chat(
+                user_message, recent_history, symptoms_related, rag_context
+            )
             
             print(f"DEBUG: Message: '{user_message}' -> Symptoms related: {is_likely_symptoms}")
             
             if not is_likely_symptoms:
                 # Simple conversation - minimal prompt
-                return self._handle_general_conversation(user_message, conversation_history[-3:])
+                return await asyncio.to_thread(
+                    self._handle_general_conversation,
+                    user_message, recent_history, conversation_summary
+                )
             else:
                 # Potential symptoms - full analysis
-                return self._handle_symptom_analysis(
+                result = await asyncio.to_thread(
+                    self._handle_symptom_analysis,
                     user_message, conversation_history, 
-                    available_specializations, available_symptoms
+                    available_specializations, available_symptoms,
+                    conversation_summary, rag_context
                 )
+                return self._apply_triage(result, triage.refine(local_triage, rag_context))
                 
         except Exception as e:
             print(f"Chat response error: {e}")
@@ -74,11 +487,11 @@ class AIService:
                 "should_show_doctors": False
             }
     
-    def _is_symptoms_related(self, message: str, recent_history: List[Dict[str, str]]) -> bool:
+    def _has_health_keywords(self, message: str) -> bool:
         """
         Quick lightweight check if message might be health/symptom related
         """
-        # First do a simple keyword check for common health terms
+        # Simple keyword check for common health terms
         health_keywords = [
             'pain', 'hurt', 'ache', 'sick', 'ill', 'fever', 'headache', 'stomach', 'nausea',
             'vomit', 'diarrhea', 'constipation', 'cough', 'cold', 'flu', 'tired', 'fatigue',
@@ -86,48 +499,39 @@ class AIService:
             'breathe', 'breathing', 'symptom', 'symptoms', 'feel', 'feeling', 'doctor', 'medical'
         ]
         
+        with step("keyword_check"):
+            message_lower = message.lower()
+            return any(keyword in message_lower for keyword in health_keywords)
+    
+    def _classify_symptoms(self, message: str, recent_history: List[Dict[str, str]]) -> bool:
+        """
+        LLM check for messages the keyword check could not place
+        """
         message_lower = message.lower()
-        if any(keyword in message_lower for keyword in health_keywords):
-            return True
-        
-        # If no obvious keywords, try AI check but with timeout/fallback
         try:
             # Build minimal context
-            history_text = ""
-            for msg in recent_history:
-                role = "User" if msg["role"] == "user" else "Assistant"
-                history_text += f"{role}: {msg['content']}\n"
-            
-            prompt = f"""Is this about health/symptoms? Answer YES or NO only.
-
-Examples:
-Message: "Hello there" -> NO
-Message: "I have a headache" -> YES  
-Message: "What is your name?" -> NO
-Message: "I feel nauseous" -> YES
-Message: "How does this work?" -> NO
-Message: "My stomach hurts" -> YES
-
-{history_text}Message: "{message}"
-
-Is this asking about pain, illness, symptoms, or medical concerns? YES or NO:"""
+            message, _, history_text = self._fit_prompt(
+                "symptom_check", SYMPTOM_CHECK_PROMPT, message,
+                history=recent_history, user_label="User", assistant_label="Assistant",
+            )
+            prompt = SYMPTOM_CHECK_PROMPT.format(history_text=history_text, message=message)
             
-            response = self.model.generate_content(prompt)
+            response = self._generate("symptom_check", prompt)
             return "YES" in response.text.upper()
         except Exception as e:
             print(f"Symptom detection AI call failed: {e}")
             # If AI fails, be more permissive for potential symptoms
             return len(message) > 10 and any(word in message_lower for word in ['feel', 'have', 'get', 'am', 'been'])
     
-    def _handle_general_conversation(self, message: str, recent_history: List[Dict[str, str]]) -> Dict:
+    def _handle_general_conversation(
+        self,
+        message: str,
+        recent_history: List[Dict[str, str]],
+        conversation_summary: str = ""
+    ) -> Dict:
         """
         Handle non-symptom conversation with minimal prompt
         """
-        history_text = ""
-        for msg in recent_history:
-            role = "User" if msg["role"] == "user" else "Assistant"
-            history_text += f"{role}: {msg['content']}\n"
-        
         # Simple responses for common greetings without AI call
         message_lower = message.lower().strip()
         if message_lower in ['hi', 'hello', 'hey', 'good morning', 'good afternoon', 'good evening']:
@@ -145,17 +549,15 @@ Is this asking about pain, illness, symptoms, or medical concerns? YES or NO:"""
             }
         
         # For other messages, try AI response
-        prompt = f"""You are MedNexus AI Health Assistant. Keep responses brief and helpful.
-
-Recent chat:
-{history_text}
-
-User: "{message}"
-
-Respond helpfully. If greeting, greet back and offer health assistance. Return only your response text, no JSON."""
+        message, _, history_text = self._fit_prompt(
+            "general_conversation", GENERAL_CONVERSATION_PROMPT, message,
+            history=recent_history, summary=conversation_summary,
+            user_label="User", assistant_label="Assistant",
+        )
+        prompt = GENERAL_CONVERSATION_PROMPT.format(history_text=history_text, message=message)
         
         try:
-            response = self.model.generate_content(prompt)
+            response = self._generate("general_conversation", prompt)
             response_text = response.text.strip().strip('"')
             
             return {
@@ -176,106 +578,49 @@ Respond helpfully. If greeting, greet back and offer health assistance. Return o
         user_message: str, 
         conversation_history: List[Dict[str, str]],
         available_specializations: List[str],
-        available_symptoms: List[Dict[str, str]]
+        available_symptoms: List[Dict[str, str]],
+        conversation_summary: str = "",
+        rag_context: Optional[Dict] = None
     ) -> Dict:
         """
         Full symptom analysis with RAG-enhanced context
+        (rag_context may be prefetched by the caller)
         """
-        # Build conversation context (reduced to 5 messages)
-        history_text = ""
-        for msg in conversation_history[-5:]:
-            role = "Patient" if msg["role"] == "user" else "Health Assistant"
-            history_text += f"{role}: {msg['content']}\n"
-        
         # RAG: Retrieve relevant medical knowledge
-        rag_context = self.rag.retrieve_context(user_message, n_results=5)
-        medical_knowledge = rag_context['context_text']
-        
-        # Get unique specializations from RAG results
-        rag_specializations = list(set(rag_context['categories']))
+        if rag_context is None:
+            rag_context = self.rag.retrieve_context(user_message, n_results=5)
         
         # Combine available specializations with RAG-suggested ones
         spec_context = ", ".join(available_specializations[:10])
         
-        prompt = f"""You are an AI Health Assistant for MedNexus. Analyze symptoms and suggest specialists.
-
-MEDICAL KNOWLEDGE BASE (Retrieved from comprehensive database):
-{medical_knowledge}
-
-AVAILABLE SPECIALIZATIONS IN OUR SYSTEM:
-{spec_context}
-
-Examples:
-Input: "I have a severe headache and feel dizzy"
-Output: {{
-    "response_type": "symptom_analysis",
-    "message": "I understand you're experiencing a severe headache and dizziness. These symptoms can be concerning and may indicate several conditions that would benefit from professional evaluation.",
-    "detected_symptoms": ["headache", "dizziness"],
-    "recommended_specializations": [{{"name": "Neurology", "match_percentage": 85, "reason": "Severe headaches with dizziness may indicate neurological issues"}}],
-    "should_show_doctors": true
-}}
-
-Input: "I've been feeling tired lately"
-Output: {{
-    "response_type": "symptom_analysis", 
-    "message": "I understand you've been experiencing fatigue. This is a common symptom that can have various causes. Let me help you find the right specialist to evaluate this properly.",
-    "detected_symptoms": ["fatigue"],
-    "recommended_specializations": [{{"name": "Internal Medicine", "match_percentage": 75, "reason": "General fatigue is best evaluated by an internist initially"}}],
-    "should_show_doctors": true
-}}
-
-CONVERSATION HISTORY:
-{history_text}
-
-CURRENT PATIENT MESSAGE: "{user_message}"
-
-INSTRUCTIONS:
-1. Use the Medical Knowledge Base to understand symptoms and map to specializations
-2. Recommend ONLY specializations that exist in our AVAILABLE SPECIALIZATIONS list
-3. Provide empathetic, clear responses
-4. Be specific about why you're recommending each specialization
-
-Return JSON:
-{{
-    "response_type": "symptom_analysis",
-    "message": "empathetic response acknowledging symptoms",
-    "detected_symptoms": ["symptom1"],
-    "recommended_specializations": [{{"name": "spec", "match_percentage": 80, "reason": "why"}}],
-    "should_show_doctors": true
-}}"""
+        # Fit message, knowledge and history (summary + recent messages) to the budget
+        user_message, medical_knowledge, history_text = self._fit_prompt(
+            "symptom_analysis", SYMPTOM_ANALYSIS_PROMPT, user_message,
+            fixed_parts=(spec_context,),
+            knowledge=rag_context['context_text'],
+            history=conversation_history, summary=conversation_summary,
+        )
+        
+        prompt = SYMPTOM_ANALYSIS_PROMPT.format(
+            medical_knowledge=medical_knowledge,
+            spec_context=spec_context,
+            history_text=history_text,
+            user_message=user_message,
+        )
 
         try:
-            response = self.model.generate_content(prompt)
-            response_text = response.text.strip()
+            response = self._generate("symptom_analysis", prompt)
             
-            # Extract JSON from response
-            json_match = re.search(r'```json\n(.*?)\n```', response_text, re.DOTALL)
-            if json_match:
-                response_text = json_match.group(1)
-            else:
-                json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-                if json_match:
-                    response_text = json_match.group(0)
-            
-            result = json.loads(response_text)
-            
-            # Ensure required fields
-            if "message" not in result:
-                result["message"] = "I understand you're experiencing some health concerns. Could you please tell me more about your symptoms?"
-            if "response_type" not in result:
-                result["response_type"] = "symptom_analysis"
-            if "should_show_doctors" not in result:
-                result["should_show_doctors"] = True
+            analysis = parse_structured(LLMChatAnalysis, response.text, "symptom_analysis")
+            if analysis is None:
+                return {
+                    "response_type": "symptom_analysis",
+                    "message": "I understand you may have some health concerns. Could you please describe your symptoms in more detail so I can help you better?",
+                    "should_show_doctors": False
+                }
             
-            return result
+            return analysis.model_dump(exclude_none=True)
             
-        except json.JSONDecodeError as e:
-            print(f"JSON parsing error in symptom analysis: {e}")
-            return {
-                "response_type": "symptom_analysis",
-                "message": "I understand you may have some health concerns. Could you please describe your symptoms in more detail so I can help you better?",
-                "should_show_doctors": False
-            }
         except Exception as e:
             print(f"Symptom analysis error: {e}")
             return {
@@ -288,92 +633,138 @@ Return JSON:
         self, 
         patient_description: str, 
         available_specializations: List[str],
-        available_symptoms: List[Dict[str, str]]
+        available_symptoms: Optional[List[Dict[str, str]]] = None,
+        rag_context: Optional[Dict] = None
     ) -> Dict:
         """
         Analyze patient's natural language description with RAG enhancement
         """
         try:
-            # RAG: Retrieve relevant medical knowledge
-            rag_context = self.rag.retrieve_context(patient_description, n_results=5)
-            medical_knowledge = rag_context['context_text']
+            # RAG: Retrieve relevant medical knowledge (batch jobs pass it in)
+            if rag_context is None:
+                rag_context = self.rag.retrieve_context(patient_description, n_results=5)
+            
+            # Local triage: severity and emergency flags that don't depend on the model
+            local_triage = triage.assess(patient_description, rag_context)
             
             spec_context = ", ".join(available_specializations[:8])
             
+            patient_description, medical_knowledge, _ = self._fit_prompt(
+                "analyze_symptoms", ANALYZE_SYMPTOMS_PROMPT, patient_description,
+                fixed_parts=(spec_context,),
+                knowledge=rag_context['context_text'],
+            )
+            
             # RAG-enhanced prompt with few-shot examples
-            prompt = f"""Analyze symptoms using medical knowledge and recommend specialists.
-
-MEDICAL KNOWLEDGE BASE:
-{medical_knowledge}
-
-AVAILABLE SPECIALIZATIONS: {spec_context}
-
-Examples:
-Patient: "I have stomach pain and nausea"
-{{
-    "detected_symptoms": ["stomach pain", "nausea"],
-    "recommended_specializations": [{{"name": "Gastroenterology", "match_percentage": 85}}],
-    "severity": "moderate"
-}}
-
-Patient: "I have chest pain and shortness of breath"
-{{
-    "detected_symptoms": ["chest pain", "shortness of breath"],
-    "recommended_specializations": [{{"name": "Cardiology", "match_percentage": 90}}],
-    "severity": "high"
-}}
+            prompt = ANALYZE_SYMPTOMS_PROMPT.format(
+                medical_knowledge=medical_knowledge,
+                spec_context=spec_context,
+                patient_description=patient_description,
+            )
 
-PATIENT DESCRIPTION: "{patient_description}"
-
-Use the Medical Knowledge Base to inform your analysis. Return JSON:
-{{
-    "detected_symptoms": ["symptom1"],
-    "recommended_specializations": [{{"name": "spec", "match_percentage": 80}}],
-    "severity": "low|moderate|high"
-}}"""
-
-            response = self.model.generate_content(prompt)
-            response_text = response.text.strip()
-            
-            # Extract JSON
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            if json_match:
-                response_text = json_match.group(0)
+            response = self._generate("analyze_symptoms", prompt)
             
-            analysis = json.loads(response_text)
+            analysis = parse_structured(LLMConsultationAnalysis, response.text, "analyze_symptoms")
+            if analysis is not None:
+                return triage.reconcile(self._consultation_result(analysis), local_triage)
             
-            # Ensure required fields
-            return {
-                "detected_symptoms": analysis.get("detected_symptoms", []),
-                "symptom_analysis": analysis.get("symptom_analysis", "Symptoms analyzed based on description"),
-                "recommended_specializations": analysis.get("recommended_specializations", []),
-                "severity": analysis.get("severity", "moderate"),
-                "confidence": analysis.get("confidence", "medium"),
-                "additional_notes": analysis.get("additional_notes", ""),
-                "emergency_warning": analysis.get("emergency_warning", False)
-            }
-        except json.JSONDecodeError as e:
-            print(f"JSON parsing error: {e}")
-            return {
+            return triage.reconcile({
                 "detected_symptoms": [],
                 "symptom_analysis": "Unable to analyze symptoms. Please try rephrasing your description.",
                 "recommended_specializations": [],
                 "severity": "moderate",
                 "confidence": "low",
                 "additional_notes": "Please consult a healthcare professional.",
-                "emergency_warning": False
-            }
+                "emergency_warning": False,
+                "analysis_failed": True
+            }, local_triage)
         except Exception as e:
             print(f"AI analysis error: {e}")
-            return {
+            return triage.reconcile({
                 "detected_symptoms": [],
                 "symptom_analysis": f"Error analyzing symptoms: {str(e)}",
                 "recommended_specializations": [],
                 "severity": "moderate", 
                 "confidence": "low",
                 "additional_notes": "Please consult a healthcare professional for proper diagnosis.",
-                "emergency_warning": False
-            }
+                "emergency_warning": False,
+                "analysis_failed": True
+            }, triage.assess(patient_description))
+    
+    @staticmethod
+    def _consultation_result(analysis: LLMConsultationAnalysis) -> Dict:
+        return {
+            "detected_symptoms": analysis.detected_symptoms,
+            "symptom_analysis": analysis.symptom_analysis or "Symptoms analyzed based on description",
+            "recommended_specializations": [
+                spec.model_dump(exclude_none=True) for spec in analysis.recommended_specializations
+            ],
+            "severity": analysis.severity,
+            "confidence": analysis.confidence or "medium",
+            "additional_notes": analysis.additional_notes or "",
+            "emergency_warning": analysis.emergency_warning
+        }
+    
+    def analyze_symptoms_batch(
+        self,
+        descriptions: List[str],
+        available_specializations: List[str],
+        rag_contexts: Optional[List[Dict]] = None
+    ) -> List[Dict]:
+        """
+        Analyze several descriptions in one LLM call (admin batch jobs)
+        
+        The knowledge retrieved for each description is merged into a single
+        block. Descriptions missing from the model's answer, or a whole answer
+        that fails validation, fall back to one analyze_symptoms() call each.
+        
+        Returns:
+            One analyze_symptoms()-shaped dict per description, in order
+        """
+        if not descriptions:
+            return []
+        if rag_contexts is None:
+            rag_contexts = self.rag.retrieve_contexts(descriptions, n_results=5)
+        if len(descriptions) == 1:
+            return [self.analyze_symptoms(descriptions[0], available_specializations, rag_context=rag_contexts[0])]
+        
+        spec_context = ", ".join(available_specializations[:8])
+        descriptions_text = "\n".join(
+            f'[{i}] PATIENT DESCRIPTION: "{self.budget.fit_message(text)}"'
+            for i, text in enumerate(descriptions)
+        )
+        _, medical_knowledge, _ = self._fit_prompt(
+            "analyze_symptoms_batch", ANALYZE_SYMPTOMS_BATCH_PROMPT, "",
+            fixed_parts=(spec_context, descriptions_text),
+            knowledge=_merge_knowledge(rag_contexts),
+        )
+        prompt = ANALYZE_SYMPTOMS_BATCH_PROMPT.format(
+            medical_knowledge=medical_knowledge,
+            spec_context=spec_context,
+            descriptions=descriptions_text,
+        )
+        
+        results: List[Optional[Dict]] = [None] * len(descriptions)
+        try:
+            response = self._generate("analyze_symptoms_batch", prompt)
+            batch = parse_structured(LLMBatchConsultationAnalysis, response.text, "analyze_symptoms_batch")
+            for item in (batch.results if batch is not None else []):
+                if 0 <= item.index < len(results) and results[item.index] is None:
+                    results[item.index] = triage.reconcile(
+                        self._consultation_result(item),
+                        triage.assess(descriptions[item.index], rag_contexts[item.index]),
+                    )
+        except Exception as e:
+            print(f"⚠ Batch analysis call failed, analyzing descriptions one by one: {e}")
+        
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            metrics.increment("batch_analysis_fallback_total", len(missing))
+        for i in missing:
+            results[i] = self.analyze_symptoms(
+                descriptions[i], available_specializations, rag_context=rag_contexts[i]
+            )
+        return results
     
     def generate_health_advice(self, symptoms: List[str], severity: str) -> str:
         """
@@ -388,19 +779,12 @@ Use the Medical Knowledge Base to inform your analysis. Return JSON:
         """
         try:
             # Few-shot examples for health advice
-            prompt = f"""Provide brief, general health advice for these symptoms.
-
-Examples:
-Symptoms: ["headache", "fever"] | Severity: moderate
-Advice: "For headache and fever, rest in a cool, dark room and stay hydrated. Consider over-the-counter pain relievers if needed. If fever exceeds 101°F or symptoms worsen, seek medical attention promptly."
-
-Symptoms: ["chest pain"] | Severity: high  
-Advice: "Chest pain can be serious. Seek immediate medical attention, especially if accompanied by shortness of breath, nausea, or arm pain. Do not delay - call emergency services if severe."
+            prompt = HEALTH_ADVICE_PROMPT.format(
+                symptoms=truncate_to_tokens(str(symptoms), settings.PROMPT_MESSAGE_MAX_TOKENS),
+                severity=severity,
+            )
 
-Symptoms: {symptoms} | Severity: {severity}
-Advice:"""
-
-            response = self.model.generate_content(prompt)
+            response = self._generate("health_advice", prompt)
             advice = response.text.strip()
             
             # Ensure advice ends with medical consultation recommendation
@@ -415,127 +799,61 @@ Advice:"""
     
     def process_voice_for_symptoms(
         self,
-        audio_file_path: str,
+        transcribed_text: str,
         conversation_history: List[Dict[str, str]],
         available_specializations: List[str],
-        available_symptoms: List[Dict[str, str]]
+        available_symptoms: List[Dict[str, str]],
+        conversation_summary: str = ""
     ) -> Dict:
         """
-        Process voice audio with Gemini AI to extract symptoms and provide analysis.
-        Uses speech-to-text first, then sends text to Gemini for analysis.
+        Analyze a transcribed voice message for symptoms.
+        Decoding and speech-to-text happen in the audio pipeline
+        (app.services.audio) before this is called.
         
         Args:
-            audio_file_path: Path to the audio file
+            transcribed_text: Speech-to-text result for the voice message
             conversation_history: Previous conversation messages
             available_specializations: List of available specializations
             available_symptoms: List of symptom objects
+            conversation_summary: Summary of older messages no longer in conversation_history
         
         Returns:
-            Dict containing AI response with symptom analysis
+            Dict containing AI response with symptom analysis and the transcribed_text
         """
         try:
-            import speech_recognition as sr
-            
-            # Convert audio to text using speech recognition
-            recognizer = sr.Recognizer()
-            
-            with sr.AudioFile(audio_file_path) as source:
-                recognizer.adjust_for_ambient_noise(source, duration=0.5)
-                audio_data = recognizer.record(source)
-                
-                try:
-                    # Auto-detect language - Google will detect the spoken language
-                    transcribed_text = recognizer.recognize_google(audio_data, show_all=False)
-                    detected_language = "auto-detected"
-                except sr.UnknownValueError:
-                    return {
-                        "response_type": "conversation",
-                        "message": "I couldn't understand the audio clearly. Could you please speak more clearly or try typing your symptoms?",
-                        "detected_symptoms": [],
-                        "should_show_doctors": False
-                    }
-                except sr.RequestError:
-                    return {
-                        "response_type": "conversation",
-                        "message": "I'm having trouble processing audio right now. Could you please type your symptoms instead?",
-                        "detected_symptoms": [],
-                        "should_show_doctors": False
-                    }
-            
-            # Build context from conversation history
-            history_text = ""
-            if conversation_history:
-                for msg in conversation_history[-5:]:  # Last 5 messages for context
-                    role = "Patient" if msg["role"] == "user" else "AI Assistant"
-                    history_text += f"{role}: {msg['content']}\n"
+            # Build context from conversation summary + recent messages within the budget
+            spec_context = ', '.join(available_specializations)
+            prompt_text, _, history_text = self._fit_prompt(
+                "voice_analysis", VOICE_ANALYSIS_PROMPT, transcribed_text,
+                fixed_parts=(spec_context,),
+                history=conversation_history, summary=conversation_summary,
+                assistant_label="AI Assistant",
+            )
             
             # Create comprehensive prompt for symptom analysis
-            prompt = f"""You are a medical AI assistant. A patient just sent a voice message that was transcribed to text.
-
-Patient's voice message (transcribed): "{transcribed_text}"
-
-Previous conversation:
-{history_text if history_text else "No previous conversation"}
-
-Available specializations: {', '.join(available_specializations)}
-
-IMPORTANT: Respond in the SAME LANGUAGE as the patient's message. If they spoke in Arabic, respond in Arabic. If they spoke in Spanish, respond in Spanish, etc.
-
-Your task:
-1. Analyze what the patient said about their symptoms
-2. Extract all mentioned symptoms
-3. Determine severity (low/moderate/high)
-4. Recommend appropriate medical specializations
-5. Provide helpful health advice
-
-Respond in this exact JSON format (but translate the message and analysis to the patient's language):
-{{
-  "response_type": "symptom_analysis",
-  "message": "A natural, empathetic response acknowledging you heard their voice message and summarizing the symptoms IN THEIR LANGUAGE",
-  "detected_symptoms": ["symptom1", "symptom2"],
-  "symptom_analysis": "Brief analysis of the symptoms IN THEIR LANGUAGE",
-  "recommended_specializations": [
-    {{"name": "Specialization Name", "match_percentage": 85, "reason": "Why this specialist IN THEIR LANGUAGE"}}
-  ],
-  "severity": "low|moderate|high",
-  "confidence": "low|medium|high",
-  "additional_notes": "Any important notes or warnings IN THEIR LANGUAGE",
-  "emergency_warning": true|false,
-  "should_show_doctors": true|false
-}}
-
-Important: Acknowledge that this was a voice message and be empathetic. Respond entirely in the patient's language."""
+            prompt = VOICE_ANALYSIS_PROMPT.format(
+                transcribed_text=prompt_text,
+                history_text=history_text if history_text else "No previous conversation",
+                spec_context=spec_context,
+            )
 
             # Generate response with Gemini
-            response = self.model.generate_content(prompt)
-            response_text = response.text.strip()
-            
-            # Clean up markdown code blocks if present
-            if response_text.startswith('```'):
-                response_text = response_text.split('```')[1]
-                if response_text.startswith('json'):
-                    response_text = response_text[4:]
-                response_text = response_text.strip()
+            response = self._generate("voice_analysis", prompt)
             
-            # Parse JSON response
-            try:
-                result = json.loads(response_text)
-            except json.JSONDecodeError:
-                # Fallback if JSON parsing fails
+            analysis = parse_structured(LLMVoiceAnalysis, response.text, "voice_analysis")
+            if analysis is not None:
+                result = analysis.model_dump(exclude_none=True)
+            else:
+                # Fallback if the output does not match the schema
                 result = {
                     "response_type": "conversation",
-                    "message": f"I heard your voice message. You mentioned: {transcribed_text}. " + response_text,
+                    "message": f"I heard your voice message. You mentioned: {transcribed_text}. Could you tell me a bit more about your symptoms?",
                     "detected_symptoms": [],
                     "should_show_doctors": False
                 }
+            result["transcribed_text"] = transcribed_text
             
-            # Ensure required fields
-            if "response_type" not in result:
-                result["response_type"] = "symptom_analysis" if result.get("detected_symptoms") else "conversation"
-            if "should_show_doctors" not in result:
-                result["should_show_doctors"] = bool(result.get("detected_symptoms"))
-            
-            return result
+            return self._apply_triage(result, triage.assess(transcribed_text))
             
         except Exception as e:
             print(f"Voice processing error: {e}")
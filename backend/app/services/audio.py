@@ -0,0 +1,267 @@
+"""
+Audio Pipeline
+Shared voice-upload processing for the voice routes. Upload bytes are piped
+through ffmpeg once, resampled to 16 kHz mono 16-bit PCM, cleaned up by the
+preprocessing stage (silence trim, duration cap, peak normalisation) and
+handed to the STT backend in memory: no temp files and no second decode.
+Decoding and recognition run in a bounded worker pool so a burst of voice
+uploads cannot start an unbounded number of ffmpeg processes.
+
+Streamed input (the voice WebSocket) is decoded by a long-running ffmpeg
+process per stream (StreamingDecoder) that turns container chunks into PCM as
+they arrive; clients that already send 16 kHz PCM skip ffmpeg entirely. It
+uses blocking pipes and threads, so it works on any event loop.
+"""
+import asyncio
+import subprocess
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Optional
+
+from app.core.config import settings
+from app.services.audio_preprocess import AudioPreprocessor, downmix, preprocessor, to_pcm, to_samples
+from app.services.stt import (
+    SAMPLE_RATE,
+    SAMPLE_WIDTH,
+    STTBackend,
+    TranscriptionUnavailableError,
+    stt_backend,
+)
+
+
+# Upload content types accepted by the voice routes
+ALLOWED_AUDIO_TYPES = (
+    "audio/wav", "audio/x-wav", "audio/mpeg", "audio/mp3",
+    "audio/m4a", "audio/webm", "audio/ogg", "audio/x-m4a",
+)
+
+
+class AudioDecodeError(Exception):
+    """The upload could not be decoded as audio"""
+
+
+@dataclass
+class DecodedAudio:
+    """Mono 16-bit little-endian PCM"""
+    pcm: bytes
+    sample_rate: int = SAMPLE_RATE
+    sample_width: int = SAMPLE_WIDTH
+    source_seconds: Optional[float] = None  # length of the recording before preprocessing
+
+    def __post_init__(self):
+        if self.source_seconds is None:
+            self.source_seconds = self.duration_seconds
+
+    @property
+    def duration_seconds(self) -> float:
+        return len(self.pcm) / (self.sample_rate * self.sample_width)
+
+
+class AudioPipeline:
+    """
+    Decode -> recognise, in memory.
+
+    - decode(): any ffmpeg-readable upload to preprocessed 16 kHz mono PCM via stdin/stdout pipes
+    - transcribe(): recognise decoded audio (None when nothing intelligible was said)
+    - transcribe_upload(): both, on the bounded worker pool
+    """
+
+    def __init__(
+        self,
+        stt: STTBackend,
+        preprocessor: AudioPreprocessor,
+        max_workers: int = 4,
+        ffmpeg_path: str = "ffmpeg",
+        timeout_seconds: float = 30.0,
+    ):
+        self.stt = stt
+        self.preprocessor = preprocessor
+        self.ffmpeg_path = ffmpeg_path
+        self.timeout_seconds = timeout_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="audio")
+
+    def decode(self, data: bytes) -> DecodedAudio:
+        """Decode an upload to mono 16 kHz s16le PCM with a single ffmpeg pass, then preprocess it"""
+        if not data:
+            raise AudioDecodeError("Empty audio upload")
+        try:
+            result = subprocess.run(
+                [
+                    self.ffmpeg_path, "-hide_banner", "-loglevel", "error",
+                    "-i", "pipe:0",
+                    "-ac", "1", "-ar", str(SAMPLE_RATE),
+                    "-f", "s16le", "-acodec", "pcm_s16le",
+                    "pipe:1",
+                ],
+                input=data,
+                capture_output=True,
+                timeout=self.timeout_seconds,
+                check=False,
+            )
+        except FileNotFoundError:
+            raise AudioDecodeError(f"ffmpeg not found at '{self.ffmpeg_path}'")
+        except subprocess.TimeoutExpired:
+            raise AudioDecodeError(f"Audio decoding timed out after {self.timeout_seconds}s")
+
+        if result.returncode != 0 or not result.stdout:
+            error = result.stderr.decode("utf-8", "replace").strip().splitlines()
+            raise AudioDecodeError(error[-1] if error else "Could not decode audio")
+        return DecodedAudio(
+            pcm=self.preprocessor.process(result.stdout, SAMPLE_RATE),
+            source_seconds=len(result.stdout) / (SAMPLE_RATE * SAMPLE_WIDTH),
+        )
+
+    def transcribe(self, audio: DecodedAudio) -> Optional[str]:
+        """Recognise speech; None when the audio was not intelligible"""
+        if not audio.pcm:
+            # Preprocessing found no speech: skip the STT call
+            return None
+        return self.stt.transcribe(audio.pcm, audio.sample_rate)
+
+    def _decode_and_transcribe(self, data: bytes) -> Optional[str]:
+        return self.transcribe(self.decode(data))
+
+    async def transcribe_upload(self, data: bytes) -> Optional[str]:
+        """Decode and transcribe an upload on the audio worker pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, self._decode_and_transcribe, data)
+
+    async def run(self, fn, *args):
+        """Run blocking audio work (e.g. an STTStream call) on the audio worker pool"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, fn, *args)
+
+    def streaming_decoder(self, audio_format: str = "auto", channels: int = 1):
+        """Decoder for one streamed recording ("pcm16" = raw 16 kHz s16le, interleaved if channels > 1)"""
+        if audio_format == "pcm16":
+            return RawPCMDecoder(channels)
+        return StreamingDecoder(self.ffmpeg_path)
+
+
+class RawPCMDecoder:
+    """Pass-through for clients that stream 16 kHz s16le PCM themselves; multi-channel input is downmixed"""
+
+    def __init__(self, channels: int = 1):
+        self.channels = channels
+        self._chunks: asyncio.Queue = asyncio.Queue()
+        self._partial = b""  # bytes of an incomplete multi-channel frame
+
+    async def start(self):
+        pass
+
+    async def feed(self, data: bytes):
+        if self.channels > 1:
+            data = self._partial + data
+            frame_bytes = SAMPLE_WIDTH * self.channels
+            cut = len(data) - len(data) % frame_bytes
+            data, self._partial = to_pcm(downmix(to_samples(data[:cut], self.channels))), data[cut:]
+        await self._chunks.put(data)
+
+    async def close(self):
+        await self._chunks.put(b"")
+
+    async def read(self) -> bytes:
+        """Next chunk of PCM; b"" once the stream is finished"""
+        return await self._chunks.get()
+
+    def kill(self):
+        pass
+
+
+class StreamingDecoder:
+    """
+    One ffmpeg process decoding a streamed recording (e.g. MediaRecorder
+    WebM/Opus chunks) to 16 kHz mono s16le PCM as the chunks arrive.
+    Probing and output buffering are kept minimal so PCM comes out with
+    little delay behind the input.
+
+    ffmpeg is driven with plain subprocess pipes rather than asyncio
+    subprocesses, which the SelectorEventLoop (uvicorn's loop on Windows)
+    does not support: a dedicated thread per stream forwards stdout to the
+    event loop, and writes to stdin go through a worker thread.
+    """
+
+    READ_SIZE = 8192
+
+    def __init__(self, ffmpeg_path: str = "ffmpeg"):
+        self.ffmpeg_path = ffmpeg_path
+        self._process: Optional[subprocess.Popen] = None
+        self._chunks: asyncio.Queue = asyncio.Queue()
+
+    async def start(self):
+        try:
+            self._process = subprocess.Popen(
+                [
+                    self.ffmpeg_path, "-hide_banner", "-loglevel", "error",
+                    "-probesize", "32768", "-analyzeduration", "0", "-fflags", "+nobuffer",
+                    "-i", "pipe:0",
+                    "-ac", "1", "-ar", str(SAMPLE_RATE),
+                    "-f", "s16le", "-acodec", "pcm_s16le",
+                    "-flush_packets", "1",
+                    "pipe:1",
+                ],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                bufsize=0,
+            )
+        except FileNotFoundError:
+            raise AudioDecodeError(f"ffmpeg not found at '{self.ffmpeg_path}'")
+        threading.Thread(
+            target=self._forward_output,
+            args=(asyncio.get_running_loop(),),
+            name="ffmpeg-stream-reader",
+            daemon=True,
+        ).start()
+
+    def _forward_output(self, loop: asyncio.AbstractEventLoop):
+        """Reader thread: hand each PCM chunk to the event loop; b"" once ffmpeg has finished"""
+        try:
+            while True:
+                try:
+                    data = self._process.stdout.read(self.READ_SIZE)
+                except (OSError, ValueError):
+                    data = b""
+                if not data:
+                    self._process.wait()
+                loop.call_soon_threadsafe(self._chunks.put_nowait, data)
+                if not data:
+                    return
+        except RuntimeError:
+            # Event loop closed while the stream was still running
+            self.kill()
+
+    def _write(self, data: bytes):
+        try:
+            self._process.stdin.write(data)
+        except (OSError, ValueError):
+            raise AudioDecodeError("Could not decode audio stream")
+
+    async def feed(self, data: bytes):
+        await asyncio.to_thread(self._write, data)
+
+    async def close(self):
+        if self._process.stdin and not self._process.stdin.closed:
+            try:
+                self._process.stdin.close()
+            except OSError:
+                pass
+
+    async def read(self) -> bytes:
+        """Next chunk of PCM; b"" once ffmpeg has finished"""
+        return await self._chunks.get()
+
+    def kill(self):
+        if self._process and self._process.poll() is None:
+            self._process.kill()
+
+
+# Singleton instance
+audio_pipeline = AudioPipeline(
+    stt=stt_backend,
+    preprocessor=preprocessor,
+    max_workers=settings.AUDIO_WORKERS,
+    ffmpeg_path=settings.FFMPEG_PATH,
+    timeout_seconds=settings.AUDIO_DECODE_TIMEOUT_SECONDS,
+)
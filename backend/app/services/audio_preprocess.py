@@ -0,0 +1,149 @@
+"""
+Audio Preprocessing
+Vectorised clean-up of decoded PCM before speech recognition: downmix to
+mono, peak-normalise, trim leading and trailing silence and cap the duration.
+Normalisation evens out quiet recordings and runs first, so the fixed silence
+threshold is applied to the normalised level and a quiet but clear recording
+is not trimmed away. Trimming and the cap shrink what the STT backend has to
+process (and what a cloud backend bills for).
+"""
+from typing import Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.metrics import metrics
+
+
+SAMPLE_WIDTH = 2  # bytes per sample (s16le)
+_INT16_MAX = 32767
+
+
+def to_samples(pcm: bytes, channels: int = 1) -> np.ndarray:
+    """s16le bytes -> int16 array, shaped (frames, channels) for multi-channel audio"""
+    usable = len(pcm) - len(pcm) % (SAMPLE_WIDTH * channels)
+    samples = np.frombuffer(pcm[:usable], dtype="<i2")
+    return samples.reshape(-1, channels) if channels > 1 else samples
+
+
+def to_pcm(samples: np.ndarray) -> bytes:
+    """Float or int samples -> clipped s16le bytes"""
+    return np.clip(np.rint(samples), -_INT16_MAX - 1, _INT16_MAX).astype("<i2").tobytes()
+
+
+def downmix(samples: np.ndarray) -> np.ndarray:
+    """(frames, channels) -> mono float32 by averaging the channels"""
+    if samples.ndim == 1:
+        return samples.astype(np.float32)
+    return samples.astype(np.float32).mean(axis=1)
+
+
+def frame_rms(samples: np.ndarray, frame_len: int) -> np.ndarray:
+    """RMS level of each whole frame of a mono signal"""
+    n_frames = len(samples) // frame_len
+    frames = samples[:n_frames * frame_len].astype(np.float32).reshape(n_frames, frame_len)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+
+def trim_silence(
+    samples: np.ndarray,
+    sample_rate: int,
+    silence_rms: float,
+    frame_ms: int = 30,
+    margin_ms: int = 200,
+) -> np.ndarray:
+    """
+    Cut leading and trailing frames quieter than silence_rms, keeping
+    margin_ms around the speech; empty when nothing reaches the threshold.
+    """
+    frame_len = sample_rate * frame_ms // 1000
+    voiced = np.flatnonzero(frame_rms(samples, frame_len) >= silence_rms)
+    if not voiced.size:
+        return samples[:0]
+    margin = sample_rate * margin_ms // 1000
+    start = max(0, voiced[0] * frame_len - margin)
+    end = min(len(samples), (voiced[-1] + 1) * frame_len + margin)
+    return samples[start:end]
+
+
+def peak_normalize(samples: np.ndarray, target_dbfs: float = -1.0, max_gain_db: float = 20.0) -> np.ndarray:
+    """Scale so the peak sits at target_dbfs, amplifying by at most max_gain_db"""
+    peak = float(np.max(np.abs(samples))) if samples.size else 0.0
+    if not peak:
+        return samples
+    gain = min(_INT16_MAX * 10 ** (target_dbfs / 20) / peak, 10 ** (max_gain_db / 20))
+    return samples * np.float32(gain)
+
+
+class AudioPreprocessor:
+    """
+    Downmix -> normalise -> trim -> cap, on 16-bit PCM.
+
+    - silence_rms: frame RMS (of 32768, after normalisation) below which audio counts as silence
+    - margin_ms: audio kept either side of the detected speech
+    - max_seconds: speech beyond this is dropped
+    """
+
+    def __init__(
+        self,
+        silence_rms: float = 300.0,
+        margin_ms: int = 200,
+        target_dbfs: float = -1.0,
+        max_gain_db: float = 20.0,
+        max_seconds: Optional[float] = 60.0,
+    ):
+        self.silence_rms = silence_rms
+        self.margin_ms = margin_ms
+        self.target_dbfs = target_dbfs
+        self.max_gain_db = max_gain_db
+        self.max_seconds = max_seconds
+
+    def process(self, pcm: bytes, sample_rate: int, channels: int = 1) -> bytes:
+        """Preprocessed mono PCM (empty when the input held no speech)"""
+        samples = downmix(to_samples(pcm, channels))
+        source_seconds = len(samples) / sample_rate
+
+        samples = peak_normalize(samples, self.target_dbfs, self.max_gain_db)
+        samples = trim_silence(samples, sample_rate, self.silence_rms, margin_ms=self.margin_ms)
+        if self.max_seconds:
+            samples = samples[:int(self.max_seconds * sample_rate)]
+
+        metrics.increment("audio_seconds_removed_total", source_seconds - len(samples) / sample_rate)
+        return to_pcm(samples)
+
+
+    def stream_normalizer(self) -> "StreamNormalizer":
+        """Level normalisation for audio that arrives in chunks (no trimming)"""
+        return StreamNormalizer(self.target_dbfs, self.max_gain_db)
+
+
+class StreamNormalizer:
+    """
+    Peak normalisation across the chunks of one stream. The gain follows the
+    loudest sample seen so far, so it can only step down; normalising each
+    chunk on its own would pump the level between chunks.
+    """
+
+    def __init__(self, target_dbfs: float = -1.0, max_gain_db: float = 20.0):
+        self.target_dbfs = target_dbfs
+        self.max_gain_db = max_gain_db
+        self._peak = 0.0
+
+    def process(self, pcm: bytes) -> bytes:
+        samples = to_samples(pcm).astype(np.float32)
+        if samples.size:
+            self._peak = max(self._peak, float(np.max(np.abs(samples))))
+        if not self._peak:
+            return pcm
+        gain = min(_INT16_MAX * 10 ** (self.target_dbfs / 20) / self._peak, 10 ** (self.max_gain_db / 20))
+        return to_pcm(samples * np.float32(gain))
+
+
+# Singleton instance
+preprocessor = AudioPreprocessor(
+    silence_rms=settings.STT_SILENCE_RMS,
+    margin_ms=settings.AUDIO_TRIM_MARGIN_MS,
+    target_dbfs=settings.AUDIO_NORMALIZE_DBFS,
+    max_gain_db=settings.AUDIO_MAX_GAIN_DB,
+    max_seconds=settings.AUDIO_MAX_SPEECH_SECONDS,
+)
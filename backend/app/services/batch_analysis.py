@@ -0,0 +1,195 @@
+"""
+Batch Symptom Analysis
+Re-runs the consultation symptom analysis over many descriptions or stored
+ai_consultations (backfills after a knowledge-base update, re-scoring).
+Work is done in chunks: one RAG query per chunk, several descriptions packed
+into each LLM call, a bounded number of calls in flight across all jobs, and
+one bulk write per chunk. Re-scored consultations also get their suggested
+doctors recomputed. Progress is reported through the job registry.
+"""
+import asyncio
+from typing import Dict, List, Optional, Sequence
+
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import SessionLocal
+from app.models import AIConsultation
+from app.services.ai_service import ai_service
+from app.services.doctor_ranking import doctor_ranking
+from app.services.jobs import Job, jobs
+from app.services.lookup_cache import lookup_cache
+from app.services.specialization_aliases import specialization_aliases
+
+
+# Analysis fields rewritten on a stored consultation
+_ANALYSIS_FIELDS = (
+    "detected_symptoms",
+    "symptom_analysis",
+    "severity",
+    "confidence",
+    "additional_notes",
+    "emergency_warning",
+)
+
+
+def _stored_specializations(recommended: List[Dict]) -> List[Dict]:
+    """Recommendations keyed by canonical DB names, as the consultation routes store them"""
+    best: Dict[str, Dict] = {}
+    for spec in recommended:
+        name = spec.get("name")
+        if not name:
+            continue
+        canonical = specialization_aliases.canonicalize(name)
+        percentage = spec.get("match_percentage", 75)
+        if canonical not in best or percentage > best[canonical]["match_percentage"]:
+            best[canonical] = {
+                "name": canonical,
+                "match_percentage": percentage,
+                "reason": spec.get("reason", "Based on symptom analysis"),
+            }
+    return list(best.values())
+
+
+def _stored_doctors(db: Session, specializations: List[Dict]) -> List[Dict]:
+    """Suggested doctors for stored recommendations, in the shape the consultation routes store"""
+    spec_match_map = {
+        spec["name"]: {"percentage": spec["match_percentage"], "reason": spec["reason"]}
+        for spec in specializations
+    }
+    return [
+        {
+            "id": ranked.doctor.id,
+            "name": ranked.doctor.name,
+            "specialization": ranked.doctor.specialization,
+            "phone": ranked.doctor.phone,
+            "profile_picture": ranked.doctor.profile_picture,
+            "match_percentage": ranked.match_percentage,
+            "match_reason": ranked.match_reason,
+        }
+        for ranked in doctor_ranking.rank(db, spec_match_map, limit=10)
+    ]
+
+
+class BatchAnalysisService:
+    """
+    Runs batch analysis jobs.
+
+    - chunk_size: descriptions per RAG query and per bulk write
+    - pack_size: descriptions packed into one LLM call
+    - concurrency: LLM calls in flight, shared by all running jobs
+    """
+
+    def __init__(self, chunk_size: int = 50, pack_size: int = 5, concurrency: int = 4):
+        self.chunk_size = chunk_size
+        self.pack_size = pack_size
+        self.concurrency = concurrency
+        self._llm_slots = asyncio.Semaphore(concurrency)
+
+    async def _analyze(self, texts: List[str], available_specs: List[str]) -> List[Dict]:
+        """Analyses for one chunk, in order"""
+        rag_contexts = await asyncio.to_thread(ai_service.rag.retrieve_contexts, texts, 5)
+
+        async def run_pack(start: int) -> List[Dict]:
+            end = start + self.pack_size
+            async with self._llm_slots:
+                return await asyncio.to_thread(
+                    ai_service.analyze_symptoms_batch,
+                    texts[start:end], available_specs, rag_contexts[start:end],
+                )
+
+        packs = await asyncio.gather(*(run_pack(start) for start in range(0, len(texts), self.pack_size)))
+        return [analysis for pack in packs for analysis in pack]
+
+    @staticmethod
+    def _load_descriptions(db: Session, ids: Sequence[int]) -> Dict[int, str]:
+        rows = db.query(AIConsultation.id, AIConsultation.description).filter(AIConsultation.id.in_(ids)).all()
+        return {row.id: row.description for row in rows}
+
+    @staticmethod
+    def _write(db: Session, rows: List[Dict]):
+        if rows:
+            # Identical recommendation sets share one ranking query
+            suggestions: Dict[tuple, List[Dict]] = {}
+            for row in rows:
+                key = tuple((s["name"], s["match_percentage"], s["reason"]) for s in row["recommended_specializations"])
+                if key not in suggestions:
+                    suggestions[key] = _stored_doctors(db, row["recommended_specializations"])
+                row["suggested_doctors"] = suggestions[key]
+                row["has_matching_doctors"] = len(suggestions[key]) > 0
+
+            db.bulk_update_mappings(AIConsultation, rows)
+            db.commit()
+
+    async def _run_descriptions(self, job: Job, descriptions: List[str], available_specs: List[str]):
+        for offset in range(0, len(descriptions), self.chunk_size):
+            chunk = descriptions[offset:offset + self.chunk_size]
+            analyses = await self._analyze(chunk, available_specs)
+
+            results, failed = [], 0
+            for i, analysis in enumerate(analyses):
+                failed += bool(analysis.get("analysis_failed"))
+                results.append({
+                    "index": offset + i,
+                    **{key: analysis.get(key) for key in _ANALYSIS_FIELDS},
+                    "recommended_specializations": _stored_specializations(analysis.get("recommended_specializations", [])),
+                    "analysis_failed": bool(analysis.get("analysis_failed")),
+                })
+            jobs.advance(job, succeeded=len(analyses) - failed, failed=failed, results=results)
+
+    async def _run_consultations(self, job: Job, db: Session, ids: List[int], available_specs: List[str]):
+        for offset in range(0, len(ids), self.chunk_size):
+            chunk_ids = ids[offset:offset + self.chunk_size]
+            stored = await asyncio.to_thread(self._load_descriptions, db, chunk_ids)
+            missing = [cid for cid in chunk_ids if cid not in stored]
+
+            found_ids = list(stored)
+            analyses = await self._analyze([stored[cid] for cid in found_ids], available_specs)
+
+            rows, failures = [], [{"consultation_id": cid, "error": "not found"} for cid in missing]
+            for cid, analysis in zip(found_ids, analyses):
+                if analysis.get("analysis_failed"):
+                    # Keep the stored analysis rather than overwrite it with a failure
+                    failures.append({"consultation_id": cid, "error": analysis.get("symptom_analysis")})
+                    continue
+                rows.append({
+                    "id": cid,
+                    **{key: analysis.get(key) for key in _ANALYSIS_FIELDS},
+                    "recommended_specializations": _stored_specializations(analysis.get("recommended_specializations", [])),
+                })
+            await asyncio.to_thread(self._write, db, rows)
+            jobs.advance(job, succeeded=len(rows), failed=len(failures), results=failures)
+
+    async def run(
+        self,
+        job: Job,
+        descriptions: Optional[List[str]] = None,
+        consultation_ids: Optional[List[int]] = None,
+    ):
+        """Process a job created by jobs.create(); meant to run as a background task"""
+        jobs.start(job)
+        db = SessionLocal()
+        try:
+            lookups = lookup_cache.get(db)
+            specialization_aliases.sync(lookups)
+
+            if consultation_ids:
+                await self._run_consultations(job, db, consultation_ids, lookups.specializations)
+            else:
+                await self._run_descriptions(job, descriptions or [], lookups.specializations)
+            jobs.finish(job)
+            print(f"✓ Batch analysis {job.id}: {job.succeeded} analyzed, {job.failed} failed")
+        except Exception as e:
+            db.rollback()
+            jobs.finish(job, error=str(e))
+            print(f"✗ Batch analysis {job.id} failed: {e}")
+        finally:
+            db.close()
+
+
+# Singleton instance
+batch_analysis = BatchAnalysisService(
+    chunk_size=settings.BATCH_ANALYSIS_CHUNK_SIZE,
+    pack_size=settings.BATCH_ANALYSIS_PACK_SIZE,
+    concurrency=settings.BATCH_ANALYSIS_CONCURRENCY,
+)
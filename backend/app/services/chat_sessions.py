@@ -0,0 +1,276 @@
+"""
+AI Chat Session Store
+Keeps conversation state on the server so clients only send the new message.
+Sessions live in a per-worker memory cache and are written through to
+Postgres, which is read back on a cache miss (restart, other worker).
+Postgres stays the source of truth: counters are only ever incremented in
+SQL, and a cached copy that turns out to be behind is re-read before the
+window is rolled.
+
+Rolling the window must not wait on the model: the request path folds the
+oldest messages with the extractive summary, and the model-backed summary
+(when configured) replaces it from a small background thread pool.
+"""
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+from cachetools import TTLCache
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db import SessionLocal
+from app.models import AIChatSession, AIChatMessage
+
+
+# (previous summary, messages being folded) -> new summary
+Summarizer = Callable[[str, List[Dict[str, str]]], str]
+
+
+@dataclass
+class ChatSession:
+    """In-memory view of a chat session: rolling summary plus recent messages"""
+    id: str
+    patient_id: int
+    summary: str = ""
+    summarized_count: int = 0
+    message_count: int = 0
+    messages: List[Dict[str, str]] = field(default_factory=list)
+
+
+def extractive_summary(previous: str, messages: List[Dict[str, str]], max_chars: int = 1500) -> str:
+    """
+    Cheap summariser used when no model-backed one is configured: keeps the
+    start of each folded message and trims the oldest text first.
+    """
+    lines = [previous] if previous else []
+    for msg in messages:
+        role = "Patient" if msg["role"] == "user" else "Assistant"
+        content = " ".join(msg["content"].split())
+        if len(content) > 200:
+            content = content[:197] + "..."
+        lines.append(f"{role}: {content}")
+    summary = "\n".join(lines)
+    if len(summary) > max_chars:
+        summary = "..." + summary[-(max_chars - 3):]
+    return summary
+
+
+class ChatSessionStore:
+    """
+    Append-only chat message store with a rolling summary.
+
+    - Messages are inserted into ai_chat_messages and never updated.
+    - Only the last `window` messages are kept verbatim; when the window
+      overflows the oldest messages are folded into the session summary.
+    """
+
+    def __init__(
+        self,
+        window: int = 10,
+        summary_max_chars: int = 1500,
+        cache_size: int = 1000,
+        ttl_seconds: int = 3600,
+        summary_workers: int = 2,
+    ):
+        self.window = window
+        self.summary_max_chars = summary_max_chars
+        self._cache: TTLCache = TTLCache(maxsize=cache_size, ttl=ttl_seconds)
+        self._lock = threading.Lock()
+        # Runs inline in append(): must be cheap
+        self.summarizer: Summarizer = lambda previous, messages: extractive_summary(
+            previous, messages, self.summary_max_chars
+        )
+        # Optional slow (model-backed) summariser, run on the summary pool after each roll
+        self.refiner: Optional[Summarizer] = None
+        self._summary_pool = ThreadPoolExecutor(max_workers=summary_workers, thread_name_prefix="chat-summary")
+
+    # ── Lookup ────────────────────────────────────────────────
+
+    def _cache_get(self, session_id: str) -> Optional[ChatSession]:
+        with self._lock:
+            return self._cache.get(session_id)
+
+    def _cache_put(self, session: ChatSession):
+        with self._lock:
+            self._cache[session.id] = session
+
+    def load(self, db: Session, session_id: str, patient_id: int) -> Optional[ChatSession]:
+        """Fetch a patient's session from memory, falling back to Postgres"""
+        session = self._cache_get(session_id)
+        if session is not None:
+            return session if session.patient_id == patient_id else None
+
+        row = (
+            db.query(AIChatSession)
+            .filter(AIChatSession.id == session_id, AIChatSession.patient_id == patient_id)
+            .first()
+        )
+        if not row:
+            return None
+
+        session = ChatSession(id=row.id, patient_id=row.patient_id)
+        self._refresh(db, session, row.summary, row.summarized_count, row.message_count)
+        self._cache_put(session)
+        return session
+
+    @staticmethod
+    def _refresh(db: Session, session: ChatSession, summary: Optional[str], summarized_count: int, message_count: int):
+        """Reset session to the stored state: the given counters plus the messages the summary does not cover"""
+        recent = (
+            db.query(AIChatMessage.role, AIChatMessage.content)
+            .filter(AIChatMessage.session_id == session.id)
+            .order_by(AIChatMessage.id.asc())
+            .offset(summarized_count)
+            .all()
+        )
+        session.summary = summary or ""
+        session.summarized_count = summarized_count
+        session.message_count = message_count
+        session.messages = [{"role": role, "content": content} for role, content in recent]
+
+    def get_or_create(self, db: Session, session_id: Optional[str], patient_id: int) -> ChatSession:
+        """
+        Return the patient's session, or start a new one when no id is given
+        or the id is unknown/expired/owned by someone else.
+        """
+        if session_id:
+            session = self.load(db, session_id, patient_id)
+            if session is not None:
+                return session
+
+        session = ChatSession(id=uuid.uuid4().hex, patient_id=patient_id)
+        db.add(AIChatSession(id=session.id, patient_id=patient_id, summarized_count=0, message_count=0))
+        db.commit()
+        self._cache_put(session)
+        return session
+
+    # ── Writes ────────────────────────────────────────────────
+
+    def append(self, db: Session, session: ChatSession, messages: List[Dict[str, str]]):
+        """Append messages to the session and roll the summary if the window overflowed"""
+        if not messages:
+            return
+
+        db.add_all([
+            AIChatMessage(session_id=session.id, role=m["role"], content=m["content"])
+            for m in messages
+        ])
+        db.flush()
+        stored = db.execute(
+            update(AIChatSession)
+            .where(AIChatSession.id == session.id)
+            .values(message_count=AIChatSession.message_count + len(messages))
+            .returning(AIChatSession.summary, AIChatSession.summarized_count, AIChatSession.message_count)
+            .execution_options(synchronize_session=False)
+        ).one()
+
+        if (
+            stored.message_count != session.message_count + len(messages)
+            or stored.summarized_count != session.summarized_count
+        ):
+            # Another worker (or a job with its own DB session) wrote to this
+            # conversation since it was cached: continue from the stored state
+            self._refresh(db, session, stored.summary, stored.summarized_count, stored.message_count)
+        else:
+            session.messages.extend({"role": m["role"], "content": m["content"]} for m in messages)
+            session.message_count = stored.message_count
+
+        rolled = True
+        overflow = len(session.messages) - self.window
+        if overflow > 0:
+            folded = session.messages[:overflow]
+            summary = self.summarizer(session.summary, folded)
+            # Only applied if nobody rolled the window in the meantime
+            rolled = (
+                db.query(AIChatSession)
+                .filter(
+                    AIChatSession.id == session.id,
+                    AIChatSession.summarized_count == session.summarized_count,
+                )
+                .update(
+                    {
+                        AIChatSession.summary: summary or None,
+                        AIChatSession.summarized_count: AIChatSession.summarized_count + overflow,
+                    },
+                    synchronize_session=False,
+                )
+            )
+            if rolled:
+                previous_summary = session.summary
+                session.summary = summary
+                session.summarized_count += overflow
+                del session.messages[:overflow]
+
+        db.commit()
+        if not rolled:
+            # Lost the race to another writer; the next load reads its result
+            with self._lock:
+                self._cache.pop(session.id, None)
+        else:
+            self._cache_put(session)
+            if overflow > 0 and self.refiner is not None:
+                self._summary_pool.submit(
+                    self._refine_summary, session.id, previous_summary, folded, session.summarized_count
+                )
+
+    def _refine_summary(
+        self,
+        session_id: str,
+        previous: str,
+        folded: List[Dict[str, str]],
+        summarized_count: int,
+    ):
+        """Replace the extractive summary of one roll with the refiner's, unless the window has rolled again"""
+        try:
+            summary = self.refiner(previous, folded)
+        except Exception as e:
+            print(f"⚠ Chat summary refinement failed for session {session_id}: {e}")
+            return
+        if not summary:
+            return
+
+        db = SessionLocal()
+        try:
+            updated = (
+                db.query(AIChatSession)
+                .filter(
+                    AIChatSession.id == session_id,
+                    AIChatSession.summarized_count == summarized_count,
+                )
+                .update({AIChatSession.summary: summary}, synchronize_session=False)
+            )
+            db.commit()
+        except Exception as e:
+            db.rollback()
+            print(f"✗ Could not store refined chat summary for session {session_id}: {e}")
+            return
+        finally:
+            db.close()
+
+        if updated:
+            with self._lock:
+                cached = self._cache.get(session_id)
+                if cached is not None and cached.summarized_count == summarized_count:
+                    cached.summary = summary
+
+    def delete(self, db: Session, session: ChatSession):
+        """Remove a session and its messages"""
+        db.query(AIChatMessage).filter(AIChatMessage.session_id == session.id).delete(synchronize_session=False)
+        db.query(AIChatSession).filter(AIChatSession.id == session.id).delete(synchronize_session=False)
+        db.commit()
+        with self._lock:
+            self._cache.pop(session.id, None)
+
+
+# Singleton instance
+chat_sessions = ChatSessionStore(
+    window=settings.CHAT_SESSION_WINDOW,
+    summary_max_chars=settings.CHAT_SESSION_SUMMARY_MAX_CHARS,
+    cache_size=settings.CHAT_SESSION_CACHE_SIZE,
+    ttl_seconds=settings.CHAT_SESSION_TTL_SECONDS,
+    summary_workers=settings.CHAT_SESSION_SUMMARY_WORKERS,
+)
@@ -0,0 +1,207 @@
+"""
+Doctor Recommendation Ranking Engine
+Scores doctors for the AI suggestions by specialization match, patient
+ratings, how soon they can be booked and how loaded their calendar is.
+"""
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from app.models import Appointment, Doctor, DoctorRating
+from app.services.schedule import next_free_slot
+
+
+# Appointment statuses that occupy a slot
+ACTIVE_STATUSES = ("Pending", "Confirmed")
+
+
+@dataclass
+class RankedDoctor:
+    """A candidate doctor with its ranking signals and final score"""
+    doctor: Doctor
+    score: float
+    match_percentage: int
+    match_reason: str
+    average_rating: Optional[float]
+    rating_count: int
+    next_available: Optional[datetime]
+    upcoming_load: int
+
+
+class DoctorRankingEngine:
+    """
+    Ranks candidate doctors for a set of recommended specializations.
+
+    All signals for every candidate come from one set-based query (doctor row,
+    rating aggregate, upcoming appointments aggregated into an array), so the
+    cost is bounded by `candidate_limit` rather than by history size (past the
+    limit, the best-rated doctors are kept). Scores are then computed for all
+    candidates at once with NumPy.
+
+    Score = w_match · match% + w_rating · bayesian rating
+          + w_availability · exp(-hours to next free slot / τ)
+          + w_load · (1 - load / max load)
+    """
+
+    def __init__(
+        self,
+        match_weight: float = 0.45,
+        rating_weight: float = 0.20,
+        availability_weight: float = 0.25,
+        load_weight: float = 0.10,
+        rating_prior: float = 3.5,
+        rating_prior_weight: int = 3,
+        availability_tau_hours: float = 48.0,
+        horizon_days: int = 14,
+        candidate_limit: int = 200,
+    ):
+        self.weights = np.array([match_weight, rating_weight, availability_weight, load_weight])
+        self.rating_prior = rating_prior
+        self.rating_prior_weight = rating_prior_weight
+        self.availability_tau_hours = availability_tau_hours
+        self.horizon_days = horizon_days
+        self.candidate_limit = candidate_limit
+
+    def _fetch_candidates(self, db: Session, spec_names: List[str], now: datetime):
+        """One round trip: candidate doctors joined with their rating and load aggregates"""
+        candidate_ids = select(Doctor.id).where(
+            Doctor.specialization.in_(spec_names),
+            Doctor.is_approved == True,
+            Doctor.is_active == True,
+        )
+
+        ratings = (
+            db.query(
+                DoctorRating.doctor_id.label("doctor_id"),
+                func.avg(DoctorRating.rating).label("avg_rating"),
+                func.count(DoctorRating.id).label("rating_count"),
+            )
+            .filter(DoctorRating.doctor_id.in_(candidate_ids))
+            .group_by(DoctorRating.doctor_id)
+            .subquery()
+        )
+
+        horizon_end = now.date() + timedelta(days=self.horizon_days)
+        upcoming = (
+            db.query(
+                Appointment.doctor_id.label("doctor_id"),
+                func.count(Appointment.id).label("load"),
+                func.array_agg(Appointment.date + Appointment.time).label("booked"),
+            )
+            .filter(
+                Appointment.doctor_id.in_(candidate_ids),
+                Appointment.status.in_(ACTIVE_STATUSES),
+                Appointment.date >= now.date(),
+                Appointment.date <= horizon_end,
+            )
+            .group_by(Appointment.doctor_id)
+            .subquery()
+        )
+
+        return (
+            db.query(
+                Doctor,
+                ratings.c.avg_rating,
+                ratings.c.rating_count,
+                upcoming.c.load,
+                upcoming.c.booked,
+            )
+            .outerjoin(ratings, ratings.c.doctor_id == Doctor.id)
+            .outerjoin(upcoming, upcoming.c.doctor_id == Doctor.id)
+            .filter(
+                Doctor.specialization.in_(spec_names),
+                Doctor.is_approved == True,
+                Doctor.is_active == True,
+            )
+            # Deterministic cut when more doctors match than are ranked
+            .order_by(ratings.c.avg_rating.desc().nullslast(), Doctor.id)
+            .limit(self.candidate_limit)
+            .all()
+        )
+
+    def rank(
+        self,
+        db: Session,
+        spec_match_map: Dict[str, Dict],
+        limit: int = 10,
+        default_reason: str = "Based on symptom analysis",
+        now: Optional[datetime] = None,
+    ) -> List[RankedDoctor]:
+        """
+        Rank doctors for the recommended specializations.
+
+        Args:
+            db: Database session
+            spec_match_map: {canonical specialization: {"percentage", "reason"}}
+            limit: Number of doctors to return
+            default_reason: Match reason when the AI gave none
+            now: Reference time (defaults to the current local time)
+
+        Returns:
+            Top `limit` doctors, best first
+        """
+        spec_names = list(spec_match_map.keys())
+        if not spec_names:
+            return []
+
+        now = now or datetime.now()
+        rows = self._fetch_candidates(db, spec_names, now)
+        if not rows:
+            return []
+
+        n = len(rows)
+        match = np.empty(n)
+        rating_sum = np.zeros(n)
+        rating_count = np.zeros(n)
+        load = np.zeros(n)
+        hours_to_slot = np.full(n, np.inf)
+        next_slots: List[Optional[datetime]] = []
+
+        for i, (doc, avg_rating, count, upcoming_load, booked) in enumerate(rows):
+            match[i] = spec_match_map.get(doc.specialization, {}).get("percentage", 75)
+            if count:
+                rating_count[i] = count
+                rating_sum[i] = float(avg_rating) * count
+            load[i] = upcoming_load or 0
+
+            slot = next_free_slot(doc.schedule, set(booked or ()), now, self.horizon_days)
+            next_slots.append(slot)
+            if slot is not None:
+                hours_to_slot[i] = (slot - now).total_seconds() / 3600
+
+        bayes_rating = (
+            (self.rating_prior * self.rating_prior_weight + rating_sum)
+            / (self.rating_prior_weight + rating_count)
+        )
+        features = np.column_stack([
+            match / 100.0,
+            bayes_rating / 5.0,
+            np.exp(-hours_to_slot / self.availability_tau_hours),
+            1.0 - load / max(load.max(), 1.0),
+        ])
+        scores = features @ self.weights
+
+        order = np.argsort(-scores, kind="stable")[:limit]
+        ranked = []
+        for i in order:
+            doc = rows[i][0]
+            spec_info = spec_match_map.get(doc.specialization, {})
+            ranked.append(RankedDoctor(
+                doctor=doc,
+                score=float(scores[i]),
+                match_percentage=int(match[i]),
+                match_reason=spec_info.get("reason", default_reason),
+                average_rating=round(float(rating_sum[i] / rating_count[i]), 1) if rating_count[i] else None,
+                rating_count=int(rating_count[i]),
+                next_available=next_slots[i],
+                upcoming_load=int(load[i]),
+            ))
+        return ranked
+
+
+# Singleton instance
+doctor_ranking = DoctorRankingEngine()
@@ -0,0 +1,94 @@
+"""
+Background Job Registry
+Tracks long-running jobs (e.g. batch symptom analysis, queued voice chats)
+so clients can poll their progress by id. Jobs live in a per-worker memory cache and are
+dropped JOB_TTL_SECONDS after they were created.
+"""
+import threading
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+
+from cachetools import TTLCache
+
+from app.core.config import settings
+
+
+@dataclass
+class Job:
+    """Progress and outcome of one background job"""
+    id: str
+    kind: str
+    total: int
+    owner_id: Optional[int] = None  # patient a job belongs to, when it isn't an admin job
+    status: str = "pending"  # pending, running, completed, failed
+    processed: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    error: Optional[str] = None
+    results: List[Dict[str, Any]] = field(default_factory=list)
+    created_at: datetime = field(default_factory=lambda: datetime.now(timezone.utc))
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    def to_dict(self, include_results: bool = True) -> Dict[str, Any]:
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "total": self.total,
+            "processed": self.processed,
+            "succeeded": self.succeeded,
+            "failed": self.failed,
+            "progress": round(self.processed / self.total, 4) if self.total else 1.0,
+            "error": self.error,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+        }
+        if include_results:
+            data["results"] = list(self.results)
+        return data
+
+
+class JobRegistry:
+    """Thread-safe in-memory job store with progress updates"""
+
+    def __init__(self, cache_size: int = 1000, ttl_seconds: int = 86400):
+        self._jobs: TTLCache = TTLCache(maxsize=cache_size, ttl=ttl_seconds)
+        self._lock = threading.Lock()
+
+    def create(self, kind: str, total: int, owner_id: Optional[int] = None) -> Job:
+        job = Job(id=str(uuid.uuid4()), kind=kind, total=total, owner_id=owner_id)
+        with self._lock:
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def start(self, job: Job):
+        with self._lock:
+            job.status = "running"
+            job.started_at = datetime.now(timezone.utc)
+
+    def advance(self, job: Job, succeeded: int = 0, failed: int = 0, results: Optional[List[Dict[str, Any]]] = None):
+        """Record a finished chunk of work"""
+        with self._lock:
+            job.succeeded += succeeded
+            job.failed += failed
+            job.processed += succeeded + failed
+            if results:
+                job.results.extend(results)
+
+    def finish(self, job: Job, error: Optional[str] = None):
+        with self._lock:
+            job.status = "failed" if error else "completed"
+            job.error = error
+            job.finished_at = datetime.now(timezone.utc)
+
+
+# Singleton instance
+jobs = JobRegistry(ttl_seconds=settings.JOB_TTL_SECONDS)
@@ -0,0 +1,314 @@
+"""
+LLM Backends
+Interface between AIService and the model provider. GeminiBackend talks to
+Google's API; FakeLLMBackend is a deterministic local stand-in with
+configurable latency and error rate for load and regression testing.
+Selected with settings.LLM_BACKEND ("gemini" or "fake").
+"""
+import os
+import re
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Type
+
+from pydantic import BaseModel
+
+from app.core.config import settings
+from app.schemas.ai_doctor import (
+    LLMBatchConsultationAnalysis,
+    LLMBatchConsultationItem,
+    LLMChatAnalysis,
+    LLMConsultationAnalysis,
+    LLMSpecialization,
+    LLMVoiceAnalysis,
+)
+from app.services.structured_output import gemini_schema
+
+
+class LLMBackendError(RuntimeError):
+    """Raised when a backend fails to produce a response"""
+
+
+@dataclass(frozen=True)
+class RouteConfig:
+    """Model settings for one LLM route"""
+    model: str
+    temperature: float
+    max_output_tokens: int
+    timeout_seconds: float
+
+    @classmethod
+    def from_settings(cls, route: str) -> "RouteConfig":
+        prefix = f"LLM_{route.upper()}_"
+        return cls(
+            model=getattr(settings, prefix + "MODEL"),
+            temperature=getattr(settings, prefix + "TEMPERATURE"),
+            max_output_tokens=getattr(settings, prefix + "MAX_OUTPUT_TOKENS"),
+            timeout_seconds=getattr(settings, prefix + "TIMEOUT_SECONDS"),
+        )
+
+
+@dataclass(frozen=True)
+class LLMTask:
+    """Everything a backend needs to serve one AIService task"""
+    name: str
+    route: str
+    config: RouteConfig
+    system_instruction: str
+    output_model: Optional[Type[BaseModel]] = None
+
+
+@dataclass
+class LLMResponse:
+    """Backend-neutral model response"""
+    text: str
+    prompt_tokens: int = 0
+    output_tokens: int = 0
+
+
+class LLMBackend:
+    """Base class for model providers"""
+    name = "base"
+
+    def __init__(self, tasks: Dict[str, LLMTask]):
+        self.tasks = tasks
+
+    def generate(self, task: str, prompt: str) -> LLMResponse:
+        """Run one task prompt and return the model's text"""
+        raise NotImplementedError
+
+
+class GeminiBackend(LLMBackend):
+    """Google Gemini via google-generativeai; one GenerativeModel per task"""
+    name = "gemini"
+
+    def __init__(self, tasks: Dict[str, LLMTask]):
+        super().__init__(tasks)
+        import google.generativeai as genai
+
+        api_key = settings.GOOGLE_API_KEY or os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            raise ValueError("GOOGLE_API_KEY not found in environment variables")
+
+        genai.configure(api_key=api_key)
+        self.models = {
+            name: genai.GenerativeModel(
+                task.config.model,
+                system_instruction=task.system_instruction,
+                generation_config=self._generation_config(genai, task),
+            )
+            for name, task in tasks.items()
+        }
+
+    @staticmethod
+    def _generation_config(genai, task: LLMTask):
+        config = {
+            "temperature": task.config.temperature,
+            "max_output_tokens": task.config.max_output_tokens,
+        }
+        if task.output_model is not None:
+            config["response_mime_type"] = "application/json"
+            config["response_schema"] = gemini_schema(task.output_model)
+        return genai.GenerationConfig(**config)
+
+    def generate(self, task: str, prompt: str) -> LLMResponse:
+        response = self.models[task].generate_content(
+            prompt,
+            request_options={"timeout": self.tasks[task].config.timeout_seconds},
+        )
+        usage = getattr(response, "usage_metadata", None)
+        return LLMResponse(
+            text=response.text,
+            prompt_tokens=(usage.prompt_token_count or 0) if usage else 0,
+            output_tokens=(usage.candidates_token_count or 0) if usage else 0,
+        )
+
+
+# ── Fake backend ──────────────────────────────────────────────
+
+# keyword -> (symptom, specialization, severity) used by the fake analyses
+_FAKE_SYMPTOMS = (
+    ("chest pain", "chest pain", "Cardiology", "high"),
+    ("palpitation", "palpitations", "Cardiology", "moderate"),
+    ("shortness of breath", "shortness of breath", "Pulmonology", "high"),
+    ("cough", "cough", "Pulmonology", "low"),
+    ("headache", "headache", "Neurology", "moderate"),
+    ("dizz", "dizziness", "Neurology", "moderate"),
+    ("stomach", "stomach pain", "Gastroenterology", "moderate"),
+    ("nausea", "nausea", "Gastroenterology", "low"),
+    ("rash", "rash", "Dermatology", "low"),
+    ("itch", "itching", "Dermatology", "low"),
+    ("joint", "joint pain", "Orthopedics", "low"),
+    ("back pain", "back pain", "Orthopedics", "low"),
+    ("anxi", "anxiety", "Psychiatry", "low"),
+    ("fever", "fever", "General Physician", "moderate"),
+    ("tired", "fatigue", "General Physician", "low"),
+    ("fatigue", "fatigue", "General Physician", "low"),
+)
+_HEALTH_WORDS = ("pain", "hurt", "ache", "sick", "ill", "symptom", "feel") + tuple(k for k, *_ in _FAKE_SYMPTOMS)
+_SEVERITY_RANK = {"low": 0, "moderate": 1, "high": 2}
+
+# Quoted patient text in the per-request prompt templates
+_PATIENT_TEXT_RE = re.compile(
+    r'(?:CURRENT PATIENT MESSAGE|PATIENT DESCRIPTION|\(transcribed\)|Message|User): "(.*?)"\s*$',
+    re.MULTILINE | re.DOTALL,
+)
+
+# Numbered descriptions in the packed batch-analysis prompt
+_BATCH_ITEM_RE = re.compile(r'^\[(\d+)\] PATIENT DESCRIPTION: "(.*?)"\s*$', re.MULTILINE)
+
+
+def _patient_text(prompt: str) -> str:
+    matches = _PATIENT_TEXT_RE.findall(prompt)
+    return matches[-1] if matches else prompt
+
+
+class FakeLLMBackend(LLMBackend):
+    """
+    Deterministic offline stand-in for Gemini.
+
+    Responses are built from keyword matches on the patient text and are
+    valid against each task's output model. Latency is `latency_ms` plus up
+    to `jitter_ms`, and `error_rate` of calls raise LLMBackendError; both
+    draw from one RNG seeded with `seed`, so a run is reproducible.
+    """
+    name = "fake"
+
+    def __init__(
+        self,
+        tasks: Dict[str, LLMTask],
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+    ):
+        super().__init__(tasks)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _simulate(self, timeout: float):
+        with self._lock:
+            delay = (self.latency_ms + self._rng.random() * self.jitter_ms) / 1000.0
+            fail = self._rng.random() < self.error_rate
+        if delay:
+            time.sleep(min(delay, timeout))
+        if delay > timeout:
+            raise LLMBackendError(f"fake backend timed out after {timeout}s")
+        if fail:
+            raise LLMBackendError("fake backend injected error")
+
+    @staticmethod
+    def _analyze(text: str):
+        lowered = text.lower()
+        symptoms: List[str] = []
+        specs: Dict[str, List[str]] = {}
+        severity = "low"
+        for keyword, symptom, spec, level in _FAKE_SYMPTOMS:
+            if keyword in lowered and symptom not in symptoms:
+                symptoms.append(symptom)
+                specs.setdefault(spec, []).append(symptom)
+                if _SEVERITY_RANK[level] > _SEVERITY_RANK[severity]:
+                    severity = level
+        if not symptoms and any(word in lowered for word in _HEALTH_WORDS):
+            specs["General Physician"] = ["general symptoms"]
+        recommended = [
+            LLMSpecialization(
+                name=name,
+                match_percentage=max(90 - 5 * rank, 50),
+                reason=f"Commonly evaluates {', '.join(spec_symptoms)}",
+            )
+            for rank, (name, spec_symptoms) in enumerate(specs.items())
+        ]
+        return symptoms, recommended, severity
+
+    def _consultation(self, text: str) -> LLMConsultationAnalysis:
+        symptoms, recommended, severity = self._analyze(text)
+        return LLMConsultationAnalysis(
+            detected_symptoms=symptoms,
+            symptom_analysis=f"Reported symptoms: {', '.join(symptoms)}." if symptoms else "No specific symptoms identified.",
+            recommended_specializations=recommended,
+            severity=severity,
+            confidence="medium" if symptoms else "low",
+            additional_notes="Generated by the local fake LLM backend.",
+            emergency_warning=severity == "high",
+        )
+
+    def _respond(self, task: str, prompt: str) -> str:
+        text = _patient_text(prompt)
+        lowered = text.lower()
+
+        if task == "symptom_check":
+            return "YES" if any(word in lowered for word in _HEALTH_WORDS) else "NO"
+        if task == "general_conversation":
+            return "I'm here to help with your health concerns. Could you tell me how you're feeling?"
+        if task == "health_advice":
+            return ("Rest, stay hydrated and monitor your symptoms. "
+                    "Please consult a healthcare professional if they persist or worsen.")
+        if task == "summarize":
+            return " ".join(prompt.split())[-600:]
+        if task == "analyze_symptoms_batch":
+            return LLMBatchConsultationAnalysis(results=[
+                LLMBatchConsultationItem(index=int(index), **self._consultation(item_text).model_dump())
+                for index, item_text in _BATCH_ITEM_RE.findall(prompt)
+            ]).model_dump_json()
+
+        symptoms, recommended, severity = self._analyze(text)
+        summary = f"Reported symptoms: {', '.join(symptoms)}." if symptoms else "No specific symptoms identified."
+        message = (
+            f"I understand you're experiencing {', '.join(symptoms)}. Let me suggest the right specialists."
+            if symptoms else "Could you describe your symptoms in a bit more detail?"
+        )
+
+        if task == "symptom_analysis":
+            return LLMChatAnalysis(
+                response_type="symptom_analysis",
+                message=message,
+                detected_symptoms=symptoms,
+                recommended_specializations=recommended,
+                should_show_doctors=bool(recommended),
+            ).model_dump_json()
+        if task == "analyze_symptoms":
+            return self._consultation(text).model_dump_json()
+        if task == "voice_analysis":
+            return LLMVoiceAnalysis(
+                response_type="symptom_analysis" if symptoms else "conversation",
+                message=f"I heard your voice message. {message}",
+                detected_symptoms=symptoms,
+                symptom_analysis=summary,
+                recommended_specializations=recommended,
+                severity=severity if symptoms else None,
+                confidence="medium" if symptoms else "low",
+                emergency_warning=severity == "high",
+                should_show_doctors=bool(recommended),
+            ).model_dump_json()
+        raise LLMBackendError(f"fake backend has no response for task '{task}'")
+
+    def generate(self, task: str, prompt: str) -> LLMResponse:
+        self._simulate(self.tasks[task].config.timeout_seconds)
+        text = self._respond(task, prompt)
+        return LLMResponse(
+            text=text,
+            prompt_tokens=len(prompt) // 4,
+            output_tokens=len(text) // 4,
+        )
+
+
+def create_backend(tasks: Dict[str, LLMTask], name: Optional[str] = None) -> LLMBackend:
+    """Instantiate the backend selected by name (defaults to settings.LLM_BACKEND)"""
+    name = (name or settings.LLM_BACKEND).lower()
+    if name == "fake":
+        return FakeLLMBackend(
+            tasks,
+            latency_ms=settings.LLM_FAKE_LATENCY_MS,
+            jitter_ms=settings.LLM_FAKE_JITTER_MS,
+            error_rate=settings.LLM_FAKE_ERROR_RATE,
+            seed=settings.LLM_FAKE_SEED,
+        )
+    if name == "gemini":
+        return GeminiBackend(tasks)
+    raise ValueError(f"Unknown LLM_BACKEND '{name}' (expected 'gemini' or 'fake')")
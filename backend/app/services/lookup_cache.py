@@ -0,0 +1,135 @@
+"""
+Lookup Cache
+Process-wide cache of active specializations and symptoms used by the AI routes.
+The data only changes through admin CRUD, so each worker loads it once and
+re-checks a single version counter row to learn when another worker changed it.
+"""
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.models import LookupVersion, Specialization, Symptom
+
+
+LOOKUP_VERSION_KEY = "lookups"
+
+
+@dataclass(frozen=True)
+class LookupSnapshot:
+    """
+    Immutable view of the lookup data at a given version.
+    The lists are shared between requests and must not be mutated.
+    """
+    version: int
+    specializations: List[str] = field(default_factory=list)
+    symptoms: List[Dict[str, str]] = field(default_factory=list)
+
+
+class LookupCache:
+    """
+    Versioned in-process cache for specialization and symptom lookups.
+
+    - get() returns the cached snapshot, polling the version row at most once
+      every `poll_interval` seconds and reloading only when it changed.
+    - bump_version() is called by admin endpoints inside their transaction, so
+      every worker (including this one) reloads on its next poll.
+    """
+
+    def __init__(self, poll_interval: float = 2.0):
+        self.poll_interval = poll_interval
+        self._lock = threading.Lock()
+        self._snapshot: Optional[LookupSnapshot] = None
+        self._last_poll = 0.0
+
+    def get(self, db: Session) -> LookupSnapshot:
+        """Return the current lookup snapshot, reloading it if the version changed"""
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() - self._last_poll < self.poll_interval:
+            return snapshot
+
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and time.monotonic() - self._last_poll < self.poll_interval:
+                return snapshot
+
+            version = self._read_version(db)
+            if snapshot is None or snapshot.version != version:
+                snapshot = self._load(db, version)
+                self._snapshot = snapshot
+            self._last_poll = time.monotonic()
+            return snapshot
+
+    def bump_version(self, db: Session) -> int:
+        """
+        Increment the shared version counter within the caller's transaction.
+        The caller commits; this worker re-polls on its next get().
+
+        Returns:
+            The new version number
+        """
+        stmt = (
+            insert(LookupVersion)
+            .values(name=LOOKUP_VERSION_KEY, version=1)
+            .on_conflict_do_update(
+                index_elements=[LookupVersion.name],
+                set_={"version": LookupVersion.version + 1},
+            )
+            .returning(LookupVersion.version)
+        )
+        version = db.execute(stmt).scalar_one()
+        self._last_poll = 0.0
+        return version
+
+    def invalidate(self):
+        """Drop the local snapshot; the next get() reloads from the database"""
+        with self._lock:
+            self._snapshot = None
+            self._last_poll = 0.0
+
+    @staticmethod
+    def _read_version(db: Session) -> int:
+        version = (
+            db.query(LookupVersion.version)
+            .filter(LookupVersion.name == LOOKUP_VERSION_KEY)
+            .scalar()
+        )
+        return version or 0
+
+    @staticmethod
+    def _load(db: Session, version: int) -> LookupSnapshot:
+        spec_rows = (
+            db.query(Specialization.name)
+            .filter(Specialization.is_active == True)
+            .all()
+        )
+        symptom_rows = (
+            db.query(Symptom.name, Symptom.description, Symptom.specialization)
+            .filter(Symptom.is_active == True)
+            .all()
+        )
+        snapshot = LookupSnapshot(
+            version=version,
+            specializations=[name for (name,) in spec_rows],
+            symptoms=[
+                {
+                    "name": name,
+                    "description": description or "",
+                    "specialization": specialization or "General",
+                }
+                for name, description, specialization in symptom_rows
+            ],
+        )
+        print(
+            f"✓ Lookup cache loaded (v{version}): "
+            f"{len(snapshot.specializations)} specializations, {len(snapshot.symptoms)} symptoms"
+        )
+        return snapshot
+
+
+# Singleton instance
+lookup_cache = LookupCache(poll_interval=settings.LOOKUP_CACHE_POLL_SECONDS)
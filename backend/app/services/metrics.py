@@ -0,0 +1,108 @@
+"""
+In-process metrics
+Thread-safe counters and histograms keyed by metric name and labels, kept per worker.
+"""
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence, Tuple
+
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+# Default histogram bucket upper bounds, in seconds
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _label_key(labels: Dict[str, str]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Histogram:
+    """Cumulative-bucket histogram with count, sum, min and max"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.bucket_counts: List[int] = [0] * (len(self.buckets) + 1)  # last one is +Inf
+        self.count = 0
+        self.sum = 0.0
+        self.min: Optional[float] = None
+        self.max: Optional[float] = None
+
+    def observe(self, value: float):
+        self.bucket_counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+
+    def to_dict(self) -> Dict:
+        cumulative, running = {}, 0
+        for bound, n in zip(self.buckets + (float("inf"),), self.bucket_counts):
+            running += n
+            cumulative["+Inf" if bound == float("inf") else str(bound)] = running
+        return {
+            "count": self.count,
+            "sum": round(self.sum, 6),
+            "avg": round(self.sum / self.count, 6) if self.count else None,
+            "min": self.min,
+            "max": self.max,
+            "buckets": cumulative,
+        }
+
+
+class MetricsRegistry:
+    """
+    Named counters and histograms with optional labels, e.g.
+    llm_malformed_output_total{task=...} or llm_request_seconds{route=...}
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = defaultdict(lambda: defaultdict(float))
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = defaultdict(dict)
+
+    def increment(self, name: str, value: float = 1, **labels):
+        """Add value to a counter"""
+        key = _label_key(labels)
+        with self._lock:
+            self._counters[name][key] += value
+
+    def observe(self, name: str, value: float, buckets: Sequence[float] = DEFAULT_BUCKETS, **labels):
+        """Record a value in a histogram"""
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms[name]
+            histogram = series.get(key)
+            if histogram is None:
+                histogram = series[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def get(self, name: str, **labels) -> float:
+        """Current value of a counter (0 if never incremented)"""
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def snapshot(self) -> Dict:
+        """All metrics as {"counters": {name: [...]}, "histograms": {name: [...]}}"""
+        with self._lock:
+            return {
+                "counters": {
+                    name: [{"labels": dict(key), "value": value} for key, value in series.items()]
+                    for name, series in self._counters.items()
+                },
+                "histograms": {
+                    name: [{"labels": dict(key), **histogram.to_dict()} for key, histogram in series.items()]
+                    for name, series in self._histograms.items()
+                },
+            }
+
+    def reset(self):
+        """Drop all recorded values"""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+# Singleton instance
+metrics = MetricsRegistry()
@@ -0,0 +1,211 @@
+"""
+Prompt Budget Manager
+Keeps every Gemini prompt under a fixed input-token ceiling. Fixed template
+text is counted once per template, the variable parts (patient message, RAG
+context, history) are trimmed to what is left, and history that does not fit
+is folded into a digest that is cached and extended incrementally.
+Digests are built extractively while the prompt is assembled; a model-backed
+refiner (when configured) rewrites them on a background pool, and later
+prompts pick the refined digest up from the cache.
+"""
+import hashlib
+import math
+import string
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+from cachetools import LRUCache
+
+from app.services.chat_sessions import extractive_summary
+
+
+# (previous digest, messages being folded) -> new digest
+Summarizer = Callable[[str, List[Dict[str, str]]], str]
+
+# Rough chars-per-token ratio for Gemini's tokenizer on English text. Used
+# instead of count_tokens() so budgeting costs no extra API round trip.
+CHARS_PER_TOKEN = 4
+
+_ROOT_KEY = ""
+
+
+def count_tokens(text: str) -> int:
+    """Estimated token count of text"""
+    return math.ceil(len(text or "") / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut text to about max_tokens, marking the cut with an ellipsis"""
+    text = text or ""
+    max_chars = max(max_tokens, 0) * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+    if max_chars <= 3:
+        return ""
+    return text[: max_chars - 3].rstrip() + "..."
+
+
+def _chain_key(parent: str, message: Dict[str, str]) -> str:
+    digest = hashlib.sha1(parent.encode("utf-8"))
+    digest.update(b"\x00" + message["role"].encode("utf-8") + b"\x00" + message["content"].encode("utf-8"))
+    return digest.hexdigest()
+
+
+class PromptBudget:
+    """
+    Per-call token budget for prompt assembly.
+
+    - base_tokens(): tokens of a template's fixed text, cached per template name
+    - remaining(): what is left of the ceiling for the variable parts
+    - history_block(): newest messages verbatim, older ones folded into a digest
+
+    Digests are keyed by a hash chain over (summary, folded messages), so when a
+    conversation grows by one turn only the newly folded messages are summarised;
+    the digest for the earlier prefix comes from the cache. Prompt assembly only
+    ever runs the extractive summary; the refiner replaces cached digests from
+    the refine pool.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 4000,
+        message_max_tokens: int = 400,
+        digest_max_tokens: int = 300,
+        refiner: Optional[Summarizer] = None,
+        cache_size: int = 2048,
+        refine_workers: int = 2,
+    ):
+        self.max_tokens = max_tokens
+        self.message_max_tokens = message_max_tokens
+        self.digest_max_tokens = digest_max_tokens
+        self.refiner = refiner
+        self._template_tokens: Dict[str, int] = {}
+        self._digests: LRUCache = LRUCache(maxsize=cache_size)
+        self._refining: set = set()  # digest keys with a refinement in flight
+        self._lock = threading.Lock()
+        self._refine_pool = ThreadPoolExecutor(max_workers=refine_workers, thread_name_prefix="digest-refine")
+
+    # ── Counting ──────────────────────────────────────────────
+
+    def base_tokens(self, name: str, template: str) -> int:
+        """Tokens of a str.format template with all placeholders empty"""
+        tokens = self._template_tokens.get(name)
+        if tokens is None:
+            literal = "".join(text for text, _, _, _ in string.Formatter().parse(template))
+            tokens = count_tokens(literal)
+            self._template_tokens[name] = tokens
+        return tokens
+
+    def remaining(self, name: str, template: str, *parts: str) -> int:
+        """Budget left after the template's fixed text and the given parts"""
+        used = self.base_tokens(name, template) + sum(count_tokens(p) for p in parts)
+        return max(self.max_tokens - used, 0)
+
+    def fit_message(self, text: str) -> str:
+        """A single message cut to the per-message ceiling"""
+        return truncate_to_tokens(" ".join((text or "").split()), self.message_max_tokens)
+
+    # ── History ───────────────────────────────────────────────
+
+    def _digest(self, summary: str, folded: List[Dict[str, str]]) -> str:
+        """Digest of summary + folded messages, reusing the longest cached prefix"""
+        if not folded:
+            return summary
+
+        keys = []
+        key = _chain_key(_ROOT_KEY, {"role": "summary", "content": summary})
+        for message in folded:
+            key = _chain_key(key, message)
+            keys.append(key)
+
+        with self._lock:
+            for i in range(len(keys) - 1, -1, -1):
+                cached = self._digests.get(keys[i])
+                if cached is not None:
+                    if i == len(keys) - 1:
+                        return cached
+                    start, digest = i + 1, cached
+                    break
+            else:
+                start, digest = 0, summary
+
+        pending = folded[start:]
+        extractive = truncate_to_tokens(
+            extractive_summary(digest, pending, self.digest_max_tokens * CHARS_PER_TOKEN),
+            self.digest_max_tokens,
+        )
+
+        with self._lock:
+            self._digests[keys[-1]] = extractive
+            refine = self.refiner is not None and keys[-1] not in self._refining
+            if refine:
+                self._refining.add(keys[-1])
+        if refine:
+            self._refine_pool.submit(self._refine, keys[-1], digest, pending)
+        return extractive
+
+    def _refine(self, key: str, previous: str, pending: List[Dict[str, str]]):
+        """Refine pool: replace the cached extractive digest for key with the refiner's"""
+        try:
+            digest = truncate_to_tokens(self.refiner(previous, pending), self.digest_max_tokens)
+        except Exception as e:
+            print(f"⚠ History digest refinement failed: {e}")
+            digest = ""
+        with self._lock:
+            self._refining.discard(key)
+            if digest:
+                self._digests[key] = digest
+
+    def fit_history(
+        self,
+        history: List[Dict[str, str]],
+        summary: str,
+        available_tokens: int,
+        max_messages: Optional[int] = None,
+    ) -> Tuple[str, List[Dict[str, str]]]:
+        """
+        Split history into (digest, verbatim messages) that fit available_tokens.
+
+        Newest messages are kept verbatim (each cut to message_max_tokens) until
+        the budget or max_messages is reached; everything older is folded into
+        the digest together with the stored session summary.
+        """
+        digest_reserve = min(self.digest_max_tokens, available_tokens // 3)
+        verbatim_budget = available_tokens - digest_reserve
+
+        kept: List[Dict[str, str]] = []
+        used = 0
+        split = len(history)
+        for i in range(len(history) - 1, -1, -1):
+            if max_messages is not None and len(kept) >= max_messages:
+                break
+            content = self.fit_message(history[i]["content"])
+            cost = count_tokens(content) + 4  # role label and newline
+            if used + cost > verbatim_budget:
+                break
+            kept.append({"role": history[i]["role"], "content": content})
+            used += cost
+            split = i
+        kept.reverse()
+
+        digest = self._digest(summary or "", history[:split])
+        digest = truncate_to_tokens(digest, available_tokens - used)
+        return digest, kept
+
+    def history_block(
+        self,
+        history: List[Dict[str, str]],
+        summary: str,
+        available_tokens: int,
+        user_label: str = "Patient",
+        assistant_label: str = "Health Assistant",
+        max_messages: Optional[int] = None,
+    ) -> str:
+        """Formatted history text (digest first, then recent turns) within available_tokens"""
+        digest, kept = self.fit_history(history, summary, available_tokens, max_messages)
+        lines = [f"(Summary of earlier conversation) {digest}"] if digest else []
+        for msg in kept:
+            role = user_label if msg["role"] == "user" else assistant_label
+            lines.append(f"{role}: {msg['content']}")
+        return "\n".join(lines) + ("\n" if lines else "")
@@ -7,8 +7,11 @@ import json
 from typing import List, Dict, Optional
 import chromadb
 from chromadb.config import Settings
+from chromadb.utils.embedding_functions import DefaultEmbeddingFunction
 from pathlib import Path
 
+from app.services.timing import step
+
 
 # ---------------------------------------------------------------------------
 # MedicalRAGService
@@ -34,6 +37,9 @@ class MedicalRAGService:
         self.collection_name = "medical_symptom_mappings"
         self.client = None
         self.collection = None
+        # Same model Chroma uses by default; held here so queries can be
+        # embedded (and timed) separately from the vector search
+        self.embedding_function = DefaultEmbeddingFunction()
         self._initialize_chromadb()
         
     def _initialize_chromadb(self):
@@ -45,6 +51,7 @@ class MedicalRAGService:
             # Get or create collection with default embedding function
             self.collection = self.client.get_or_create_collection(
                 name=self.collection_name,
+                embedding_function=self.embedding_function,
                 metadata={"description": "Medical symptom to specialization mappings"}
             )
             
@@ -167,65 +174,121 @@ class MedicalRAGService:
         Returns:
             Dict containing retrieved documents and metadata
         """
+        return self.retrieve_contexts([query], n_results, filter_category)[0]
+    
+    def retrieve_contexts(
+        self,
+        queries: List[str],
+        n_results: int = 5,
+        filter_category: Optional[str] = None
+    ) -> List[Dict]:
+        """
+        Retrieve knowledge for several queries at once
+        
+        All queries are embedded in one call and searched in one collection
+        query, which is much cheaper than one retrieve_context() per query
+        for batch jobs.
+        
+        Returns:
+            One retrieve_context()-shaped dict per query, in order
+        """
+        empty = {
+            "documents": [],
+            "categories": [],
+            "context_text": ""
+        }
+        if not queries:
+            return []
+        
         try:
             if self.collection.count() == 0:
                 print("⚠ RAG database is empty. Please load symptom mappings first.")
-                return {
-                    "documents": [],
-                    "categories": [],
-                    "context_text": ""
-                }
+                return [dict(empty) for _ in queries]
             
             # Build where clause for filtering
             where_clause = None
             if filter_category:
                 where_clause = {"category": filter_category}
             
-            # Query the collection
-            results = self.collection.query(
-                query_texts=[query],
-                n_results=n_results,
-                where=where_clause
-            )
-            
-            if not results['documents'] or not results['documents'][0]:
-                return {
-                    "documents": [],
-                    "categories": [],
-                    "context_text": ""
-                }
-            
-            # Extract relevant information
-            documents = results['documents'][0]
-            metadatas = results['metadatas'][0]
-            distances = results.get('distances', [[]])[0]
-            
-            # Build category list
-            categories = [meta['category'] for meta in metadatas]
-            
-            # Create formatted context text
-            context_parts = []
-            for i, (doc, meta, dist) in enumerate(zip(documents, metadatas, distances if distances else [0]*len(documents))):
-                context_parts.append(f"{i+1}. {meta['category']}: {meta['mapping']}")
-            
-            context_text = "\n".join(context_parts)
+            # Embed the queries, then search the collection
+            with step("rag_embed"):
+                query_embeddings = self.embedding_function(list(queries))
+            with step("rag_search"):
+                results = self.collection.query(
+                    query_embeddings=query_embeddings,
+                    n_results=n_results,
+                    where=where_clause
+                )
             
-            return {
-                "documents": documents,
-                "categories": categories,
-                "metadatas": metadatas,
-                "distances": distances if distances else None,
-                "context_text": context_text,
-                "n_results": len(documents)
-            }
+            contexts = []
+            all_distances = results.get('distances') or [[] for _ in queries]
+            for documents, metadatas, distances in zip(
+                results['documents'] or [[] for _ in queries],
+                results['metadatas'] or [[] for _ in queries],
+                all_distances,
+            ):
+                if not documents:
+                    contexts.append(dict(empty))
+                    continue
+                
+                # Build category list
+                categories = [meta['category'] for meta in metadatas]
+                
+                # Create formatted context text
+                context_parts = []
+                for i, meta in enumerate(metadatas):
+                    context_parts.append(f"{i+1}. {meta['category']}: {meta['mapping']}")
+                
+                contexts.append({
+                    "documents": documents,
+                    "categories": categories,
+                    "metadatas": metadatas,
+                    "distances": distances if distances else None,
+                    "context_text": "\n".join(context_parts),
+                    "n_results": len(documents)
+                })
+            return contexts
             
         except Exception as e:
             print(f"✗ Error retrieving context: {e}")
+            return [dict(empty) for _ in queries]
+    
+    @staticmethod
+    def merge_contexts(contexts: List[Dict], n_results: int = 5) -> Dict:
+        """
+        Combine several retrieve_context() results into one
+        
+        Used when a message is retrieved piecewise (e.g. sentence by sentence
+        while a voice message is streamed): hits are de-duplicated and the
+        n_results closest are kept.
+        """
+        best: Dict[str, tuple] = {}
+        for context in contexts:
+            metadatas = context.get("metadatas") or []
+            distances = context.get("distances") or [None] * len(metadatas)
+            for doc, meta, dist in zip(context.get("documents") or [], metadatas, distances):
+                rank = dist if dist is not None else float("inf")
+                current = best.get(doc)
+                if current is None or rank < current[0]:
+                    best[doc] = (rank, doc, meta, dist)
+        
+        hits = sorted(best.values(), key=lambda hit: hit[0])[:n_results]
+        if not hits:
             return {
                 "documents": [],
                 "categories": [],
                 "context_text": ""
             }
+        return {
+            "documents": [doc for _, doc, _, _ in hits],
+            "categories": [meta['category'] for _, _, meta, _ in hits],
+            "metadatas": [meta for _, _, meta, _ in hits],
+            "distances": [dist for _, _, _, dist in hits],
+            "context_text": "\n".join(
+                f"{i+1}. {meta['category']}: {meta['mapping']}" for i, (_, _, meta, _) in enumerate(hits)
+            ),
+            "n_results": len(hits)
+        }
     
     def get_specialization_context(self, specializations: List[str]) -> str:
         """
@@ -308,6 +371,7 @@ class MedicalRAGService:
             
             self.collection = self.client.create_collection(
                 name=self.collection_name,
+                embedding_function=self.embedding_function,
                 metadata={"description": "Medical symptom to specialization mappings"}
             )
             print(f"✓ Created new collection: {self.collection_name}")
@@ -0,0 +1,107 @@
+"""
+Doctor schedule helpers
+Parsing of the JSON schedule stored on Doctor.schedule and slot generation,
+shared by the appointment routes and the doctor ranking engine.
+"""
+import json
+from datetime import date, time, datetime, timedelta
+from typing import Collection, List, Optional
+
+
+# Default schedule: Mon-Fri, 9 AM - 5 PM
+DEFAULT_SCHEDULE = {
+    "Mon": {"enabled": True, "start": "09:00", "end": "17:00"},
+    "Tue": {"enabled": True, "start": "09:00", "end": "17:00"},
+    "Wed": {"enabled": True, "start": "09:00", "end": "17:00"},
+    "Thu": {"enabled": True, "start": "09:00", "end": "17:00"},
+    "Fri": {"enabled": True, "start": "09:00", "end": "17:00"},
+    "Sat": {"enabled": False, "start": "09:00", "end": "17:00"},
+    "Sun": {"enabled": False, "start": "09:00", "end": "17:00"},
+}
+
+FULL_DAY_NAMES = {
+    "Mon": "Monday", "Tue": "Tuesday", "Wed": "Wednesday",
+    "Thu": "Thursday", "Fri": "Friday", "Sat": "Saturday", "Sun": "Sunday"
+}
+
+
+def parse_schedule(schedule_json: Optional[str]) -> dict:
+    """Parse doctor schedule JSON and return default if None."""
+    if not schedule_json:
+        return {day: dict(cfg) for day, cfg in DEFAULT_SCHEDULE.items()}
+    try:
+        return json.loads(schedule_json)
+    except (json.JSONDecodeError, TypeError):
+        # Return default if parsing fails
+        return {day: dict(cfg) for day, cfg in DEFAULT_SCHEDULE.items()}
+
+
+def get_day_name(date_obj: date) -> str:
+    """Get day name abbreviation (Mon, Tue, etc.) - always in English."""
+    # Use weekday number to map to day name (most reliable)
+    weekday_map = {0: "Mon", 1: "Tue", 2: "Wed", 3: "Thu", 4: "Fri", 5: "Sat", 6: "Sun"}
+    return weekday_map[date_obj.weekday()]
+
+
+def get_day_schedule(schedule: dict, date_obj: date) -> dict:
+    """Schedule entry for a date, accepting both abbreviated and full day names."""
+    day_name = get_day_name(date_obj)
+    day_schedule = schedule.get(day_name, {})
+    if not day_schedule:
+        day_schedule = schedule.get(FULL_DAY_NAMES[day_name], {})
+    return day_schedule or {}
+
+
+def generate_time_slots(start_time: str, end_time: str, slot_duration_minutes: int = 60) -> List[time]:
+    """Generate time slots between start and end time. Default is 1 hour slots."""
+    slots = []
+    start_hour, start_min = map(int, start_time.split(":"))
+    end_hour, end_min = map(int, end_time.split(":"))
+
+    start_dt = datetime(2000, 1, 1, start_hour, start_min)
+    end_dt = datetime(2000, 1, 1, end_hour, end_min)
+
+    current = start_dt
+    while current < end_dt:
+        slots.append(current.time())
+        current += timedelta(minutes=slot_duration_minutes)
+
+    return slots
+
+
+def next_free_slot(
+    schedule_json: Optional[str],
+    booked: Collection[datetime],
+    now: datetime,
+    horizon_days: int = 14,
+) -> Optional[datetime]:
+    """
+    First bookable slot at or after `now` within `horizon_days`.
+
+    Args:
+        schedule_json: Doctor.schedule column value
+        booked: Start datetimes of the doctor's active appointments
+        now: Reference time (naive, same clock as Appointment.date/time)
+        horizon_days: How many days ahead to look
+
+    Returns:
+        Slot start datetime, or None if the doctor is fully booked/off
+    """
+    schedule = parse_schedule(schedule_json)
+    for offset in range(horizon_days):
+        day = now.date() + timedelta(days=offset)
+        day_schedule = get_day_schedule(schedule, day)
+        if not day_schedule.get("enabled", False):
+            continue
+        try:
+            slots = generate_time_slots(
+                day_schedule.get("start") or "09:00",
+                day_schedule.get("end") or "17:00",
+            )
+        except (ValueError, AttributeError):
+            continue
+        for slot_time in slots:
+            slot = datetime.combine(day, slot_time)
+            if slot >= now and slot not in booked:
+                return slot
+    return None
@@ -0,0 +1,214 @@
+"""
+Specialization Alias Index
+Maps the specialization names produced by the AI ("Cardiology", "Internal
+Medicine", "Dermatologist", typos...) onto the canonical Specialization names
+stored in the database, so the doctor lookup matches on the first try.
+"""
+import re
+import threading
+from typing import Dict, Iterable, List, Optional
+
+from app.services.lookup_cache import LookupSnapshot
+
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Word endings stripped so "Cardiology", "Cardiologist" and "Cardiological"
+# share one key ("cardi"). Longest suffixes first.
+_SUFFIXES = (
+    "ologists", "ological", "ologist", "ologic", "ology",
+    "iatrists", "iatrist", "iatrics", "iatric", "iatry",
+    "icians", "ician", "ists", "ist", "ics", "ic", "y", "s",
+)
+_MIN_STEM = 4
+
+# Names that mean the same specialty but share no common stem. If any member
+# of a group resolves to a DB specialization, every member maps to it.
+_ALIAS_GROUPS = (
+    ("general physician", "general practitioner", "general practice", "general medicine",
+     "internal medicine", "internist", "family medicine", "family physician", "primary care", "gp"),
+    ("ent", "otolaryngology", "otorhinolaryngology", "ear nose and throat", "ear nose throat"),
+    ("ob gyn", "obgyn", "obstetrics and gynecology", "obstetrics", "obstetrician",
+     "gynecology", "gynaecology", "gynecologist"),
+    ("orthopedics", "orthopaedics", "orthopedic surgeon", "orthopedic surgery", "orthopedist"),
+    ("gastroenterology", "gi specialist", "digestive diseases"),
+    ("pulmonology", "pulmonary medicine", "respiratory medicine", "chest specialist"),
+    ("psychiatry", "mental health"),
+    ("allergy immunology", "allergist", "immunology", "immunologist"),
+    ("infectious disease", "infectious diseases", "infectious disease specialist"),
+)
+
+# Typo tolerance for unknown names: at most one edit (two for long names),
+# and the first letter must agree. A looser similarity ratio pairs distinct
+# specialties that share an ending ("Urologist" -> "Neurologist",
+# "Hematology" -> "Dermatology").
+_FUZZY_PREFIX = 1
+_FUZZY_LONG_NAME = 16
+_FUZZY_CACHE_MAX = 1024
+
+
+def normalize(name: str) -> str:
+    """Lowercase a name and reduce it to space separated alphanumeric tokens"""
+    return " ".join(_TOKEN_RE.findall(name.lower()))
+
+
+def _stem_word(word: str) -> str:
+    for suffix in _SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= _MIN_STEM:
+            return word[: -len(suffix)]
+    return word
+
+
+def stem_key(name: str) -> str:
+    """Suffix-insensitive key for a specialization name"""
+    return " ".join(_stem_word(w) for w in normalize(name).split(" ") if w)
+
+
+def _max_edits(key: str) -> int:
+    return 2 if len(key) >= _FUZZY_LONG_NAME else 1
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Damerau-Levenshtein (optimal string alignment) distance between a and b,
+    or limit + 1 as soon as it is known to exceed limit.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous2: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = a[i - 1] != b[j - 1]
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous2[j - 2] + 1)
+        if min(current) > limit:
+            return limit + 1
+        previous2, previous = previous, current
+    return previous[-1]
+
+
+class SpecializationAliasIndex:
+    """
+    Precomputed alias → canonical specialization lookup.
+
+    All known spellings (DB names, RAG categories, alias groups) are expanded
+    into two dicts at build time, so resolve() is a pair of O(1) lookups.
+    Unknown names fall back to a typo match (see _fuzzy_match) whose result
+    is memoized; anything less certain resolves to None.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._exact: Dict[str, str] = {}
+        self._stems: Dict[str, str] = {}
+        self._fuzzy_cache: Dict[str, Optional[str]] = {}
+        self._categories: List[str] = []
+        self._version: Optional[int] = None
+
+    def build(
+        self,
+        specializations: Iterable[str],
+        categories: Optional[Iterable[str]] = None,
+        version: Optional[int] = None,
+    ) -> int:
+        """
+        Build the alias tables.
+
+        Args:
+            specializations: Canonical (DB) specialization names
+            categories: RAG knowledge-base categories; kept for later rebuilds
+            version: Lookup data version the specializations belong to
+
+        Returns:
+            Number of aliases indexed
+        """
+        if categories is not None:
+            self._categories = list(categories)
+
+        exact: Dict[str, str] = {}
+        stems: Dict[str, str] = {}
+        for name in specializations:
+            if not normalize(name):
+                continue
+            exact.setdefault(normalize(name), name)
+            stems.setdefault(stem_key(name), name)
+
+        def _lookup(alias: str) -> Optional[str]:
+            return exact.get(normalize(alias)) or stems.get(stem_key(alias))
+
+        for group in _ALIAS_GROUPS:
+            canonical = next((c for c in map(_lookup, group) if c), None)
+            if canonical:
+                for alias in group:
+                    exact.setdefault(normalize(alias), canonical)
+                    stems.setdefault(stem_key(alias), canonical)
+
+        for category in self._categories:
+            canonical = _lookup(category)
+            if canonical:
+                exact.setdefault(normalize(category), canonical)
+
+        with self._lock:
+            self._exact = exact
+            self._stems = stems
+            self._fuzzy_cache = {}
+            self._version = version
+
+        print(f"✓ Specialization alias index built: {len(exact)} aliases → {len(set(exact.values()))} specializations")
+        return len(exact)
+
+    def sync(self, snapshot: LookupSnapshot):
+        """Rebuild when the specialization list changed since the last build"""
+        if self._version != snapshot.version:
+            self.build(snapshot.specializations, version=snapshot.version)
+
+    def resolve(self, name: str) -> Optional[str]:
+        """Return the canonical DB specialization for name, or None if unknown"""
+        key = normalize(name or "")
+        if not key:
+            return None
+
+        canonical = self._exact.get(key) or self._stems.get(stem_key(key))
+        if canonical:
+            return canonical
+
+        if key in self._fuzzy_cache:
+            return self._fuzzy_cache[key]
+
+        with self._lock:
+            canonical = self._fuzzy_match(key)
+            if len(self._fuzzy_cache) >= _FUZZY_CACHE_MAX:
+                self._fuzzy_cache.clear()
+            self._fuzzy_cache[key] = canonical
+        return canonical
+
+    def _fuzzy_match(self, key: str) -> Optional[str]:
+        """
+        Canonical name for a misspelt key ("cardiolgist"), or None.
+
+        Only known spellings that start with the same letter and are within
+        _max_edits() edits are considered; when the closest ones disagree on
+        the specialization the match is not confident and None is returned.
+        """
+        limit = _max_edits(key)
+        best_distance, matches = limit + 1, set()
+        for alias, canonical in self._exact.items():
+            if alias[:_FUZZY_PREFIX] != key[:_FUZZY_PREFIX]:
+                continue
+            distance = edit_distance(key, alias, limit)
+            if distance < best_distance:
+                best_distance, matches = distance, {canonical}
+            elif distance == best_distance and distance <= limit:
+                matches.add(canonical)
+        return matches.pop() if len(matches) == 1 else None
+
+    def canonicalize(self, name: str) -> str:
+        """Canonical DB name for name, or name unchanged if it cannot be resolved"""
+        return self.resolve(name) or name
+
+
+# Singleton instance
+specialization_aliases = SpecializationAliasIndex()
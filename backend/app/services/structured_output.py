@@ -0,0 +1,69 @@
+"""
+Structured LLM output
+Turns the Pydantic LLM output models into Gemini response schemas and
+validates model responses against them in one pass.
+"""
+from typing import Any, Dict, Optional, Type, TypeVar
+
+from pydantic import BaseModel, ValidationError
+
+from app.services.metrics import metrics
+from app.services.timing import step
+
+
+T = TypeVar("T", bound=BaseModel)
+
+# Keys of the OpenAPI subset accepted by Gemini's response_schema
+_SUPPORTED_KEYS = {"type", "format", "description", "nullable", "enum", "properties", "required", "items"}
+
+
+def _convert(node: Dict[str, Any], defs: Dict[str, Any]) -> Dict[str, Any]:
+    if "$ref" in node:
+        node = {**defs[node["$ref"].split("/")[-1]], **{k: v for k, v in node.items() if k != "$ref"}}
+
+    # Optional[X] is emitted as anyOf [X, null]
+    any_of = node.get("anyOf")
+    if any_of:
+        options = [opt for opt in any_of if opt.get("type") != "null"]
+        nullable = len(options) != len(any_of)
+        merged = {**node, **options[0]}
+        merged.pop("anyOf", None)
+        converted = _convert(merged, defs)
+        if nullable:
+            converted["nullable"] = True
+        return converted
+
+    schema: Dict[str, Any] = {}
+    for key, value in node.items():
+        if key not in _SUPPORTED_KEYS:
+            continue
+        if key == "properties":
+            schema[key] = {name: _convert(prop, defs) for name, prop in value.items()}
+        elif key == "items":
+            schema[key] = _convert(value, defs)
+        else:
+            schema[key] = value
+
+    if "enum" in schema and "type" not in schema:
+        schema["type"] = "string"
+    return schema
+
+
+def gemini_schema(model: Type[BaseModel]) -> Dict[str, Any]:
+    """Gemini response_schema dict for a Pydantic model"""
+    json_schema = model.model_json_schema()
+    return _convert(json_schema, json_schema.get("$defs", {}))
+
+
+def parse_structured(model: Type[T], text: Optional[str], task: str) -> Optional[T]:
+    """
+    Validate a JSON response against model.
+    Malformed output is counted per task and None is returned.
+    """
+    try:
+        with step("json_parse"):
+            return model.model_validate_json(text or "")
+    except ValidationError as e:
+        metrics.increment("llm_malformed_output_total", task=task)
+        print(f"⚠ Malformed {task} output from LLM: {e.error_count()} validation error(s)")
+        return None
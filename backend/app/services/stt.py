@@ -0,0 +1,355 @@
+"""
+Speech-to-Text Backends
+Pluggable speech recognition for the voice routes. Every backend receives
+16 kHz mono 16-bit PCM (what the audio pipeline decodes to) and returns the
+recognised text, or None when nothing intelligible was said.
+Selected with settings.STT_BACKEND:
+- "google": Google Web Speech API (network round trip per clip)
+- "vosk": offline CPU-only Kaldi engine loaded from STT_VOSK_MODEL_PATH
+- "fake": deterministic local stand-in with configurable latency and errors
+
+Streaming input (the voice WebSocket) goes through an STTStream: audio is cut
+into sentence-sized segments at pauses and each segment is transcribed once,
+as soon as it is complete, so transcripts arrive while the patient is still
+speaking.
+"""
+import json
+import random
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from typing import List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+from app.services.audio_preprocess import preprocessor
+from app.services.metrics import metrics
+
+
+SAMPLE_RATE = 16000  # Hz; what speech recognisers expect
+SAMPLE_WIDTH = 2  # bytes per sample (s16le)
+
+
+class TranscriptionUnavailableError(Exception):
+    """The speech recognition service could not be reached"""
+
+
+@dataclass
+class Transcript:
+    """A piece of recognised speech; final pieces will not change any more"""
+    text: str
+    final: bool = True
+
+
+class SpeechSegmenter:
+    """
+    Energy-based sentence segmentation of a PCM stream.
+
+    Audio is framed and each frame's RMS is compared with a silence threshold
+    (vectorised over every whole frame of a chunk). A segment ends after
+    silence_ms of trailing silence or once it reaches max_segment_seconds;
+    segments with less than min_speech_ms of speech are dropped.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = SAMPLE_RATE,
+        frame_ms: int = 30,
+        silence_ms: int = 600,
+        min_speech_ms: int = 250,
+        preroll_ms: int = 300,
+        max_segment_seconds: float = 15.0,
+        silence_rms: float = 300.0,
+    ):
+        self.frame_bytes = sample_rate * frame_ms // 1000 * SAMPLE_WIDTH
+        self.silence_frames = max(1, silence_ms // frame_ms)
+        self.min_speech_frames = max(1, min_speech_ms // frame_ms)
+        self.preroll_frames = preroll_ms // frame_ms
+        self.max_segment_frames = int(max_segment_seconds * 1000 // frame_ms)
+        self.silence_rms = silence_rms
+        self._pending = bytearray()  # bytes not yet making a whole frame
+        self._frames: List[bytes] = []  # current segment (or pre-roll before speech starts)
+        self._speech_frames = 0
+        self._trailing_silence = 0
+
+    def _frame_levels(self, data: bytes) -> np.ndarray:
+        samples = np.frombuffer(data, dtype="<i2").astype(np.float32)
+        frames = samples.reshape(-1, self.frame_bytes // SAMPLE_WIDTH)
+        return np.sqrt(np.mean(frames * frames, axis=1))
+
+    def _emit(self) -> Optional[bytes]:
+        """Close the current segment; None when it held too little speech"""
+        frames = self._frames[:len(self._frames) - self._trailing_silence]
+        keep = self._speech_frames >= self.min_speech_frames
+        self._frames, self._speech_frames, self._trailing_silence = [], 0, 0
+        return b"".join(frames) if keep else None
+
+    def push(self, pcm: bytes) -> List[bytes]:
+        """Add audio; returns the segments it completed"""
+        self._pending.extend(pcm)
+        whole = len(self._pending) - len(self._pending) % self.frame_bytes
+        if not whole:
+            return []
+        data = bytes(self._pending[:whole])
+        del self._pending[:whole]
+
+        segments = []
+        voiced = self._frame_levels(data) >= self.silence_rms
+        for i, is_voiced in enumerate(voiced):
+            frame = data[i * self.frame_bytes:(i + 1) * self.frame_bytes]
+            self._frames.append(frame)
+            if is_voiced:
+                self._speech_frames += 1
+                self._trailing_silence = 0
+            elif self._speech_frames:
+                self._trailing_silence += 1
+            else:
+                # Still waiting for speech: keep only a short pre-roll
+                del self._frames[:-self.preroll_frames or len(self._frames)]
+                continue
+
+            if self._trailing_silence >= self.silence_frames or len(self._frames) >= self.max_segment_frames:
+                segment = self._emit()
+                if segment:
+                    segments.append(segment)
+        return segments
+
+    def flush(self) -> Optional[bytes]:
+        """End of stream: the last, unterminated segment (if it held speech)"""
+        self._pending.clear()
+        return self._emit() if self._speech_frames else None
+
+
+class STTStream:
+    """
+    Incremental transcription of one audio stream.
+
+    feed() and finish() block on recognition, so callers run them on a worker
+    thread, one call at a time per stream.
+    """
+
+    def __init__(self, backend: "STTBackend", segmenter: SpeechSegmenter):
+        self.backend = backend
+        self.segmenter = segmenter
+
+    def _transcribe(self, segments: List[bytes]) -> List[Transcript]:
+        transcripts = []
+        for segment in segments:
+            # Segments are already cut at silence; this mainly normalises their level
+            segment = preprocessor.process(segment, SAMPLE_RATE)
+            text = self.backend.transcribe(segment) if segment else None
+            if text:
+                transcripts.append(Transcript(text=text, final=True))
+        return transcripts
+
+    def feed(self, pcm: bytes) -> List[Transcript]:
+        """Add decoded audio; returns transcripts of the segments it completed"""
+        return self._transcribe(self.segmenter.push(pcm))
+
+    def finish(self) -> List[Transcript]:
+        """Transcribe whatever is left once the client stops sending"""
+        segment = self.segmenter.flush()
+        return self._transcribe([segment] if segment else [])
+
+
+class STTBackend:
+    """
+    Base class: transcribe() a complete clip, create_stream() for incremental input.
+
+    Subclasses implement _recognize(); transcribe() records per-backend
+    latency (stt_request_seconds) and audio throughput (stt_audio_seconds_total)
+    so backends can be compared on the same traffic.
+    """
+
+    name = "base"
+
+    def _recognize(self, pcm: bytes, sample_rate: int) -> Optional[str]:
+        raise NotImplementedError
+
+    def transcribe(self, pcm: bytes, sample_rate: int = SAMPLE_RATE) -> Optional[str]:
+        started = time.perf_counter()
+        try:
+            text = self._recognize(pcm, sample_rate)
+        except TranscriptionUnavailableError:
+            metrics.increment("stt_errors_total", backend=self.name)
+            raise
+        finally:
+            metrics.observe("stt_request_seconds", time.perf_counter() - started, backend=self.name)
+        metrics.increment("stt_audio_seconds_total", len(pcm) / (sample_rate * SAMPLE_WIDTH), backend=self.name)
+        return (text or "").strip() or None
+
+    def create_stream(self) -> STTStream:
+        return STTStream(self, SpeechSegmenter(
+            silence_ms=settings.STT_SEGMENT_SILENCE_MS,
+            max_segment_seconds=settings.STT_SEGMENT_MAX_SECONDS,
+            silence_rms=settings.STT_SILENCE_RMS,
+        ))
+
+
+class GoogleSTTBackend(STTBackend):
+    """Google Web Speech API through SpeechRecognition (network round trip per call)"""
+
+    name = "google"
+
+    def __init__(self, timeout_seconds: Optional[float] = None):
+        import speech_recognition as sr
+
+        self._sr = sr
+        self.timeout_seconds = timeout_seconds
+
+    def _recognize(self, pcm: bytes, sample_rate: int) -> Optional[str]:
+        sr = self._sr
+        recognizer = sr.Recognizer()
+        recognizer.operation_timeout = self.timeout_seconds
+        try:
+            # Google auto-detects the spoken language
+            return recognizer.recognize_google(sr.AudioData(pcm, sample_rate, SAMPLE_WIDTH), show_all=False)
+        except sr.UnknownValueError:
+            return None
+        except sr.RequestError as e:
+            raise TranscriptionUnavailableError(str(e))
+
+
+class VoskSTTStream(STTStream):
+    """
+    Native streaming with one Kaldi recognizer: interim hypotheses come back
+    as non-final transcripts, and Kaldi's own endpointing settles sentences.
+
+    Chunks are level-normalised with a stream-wide gain but not trimmed:
+    Kaldi's endpointing needs the pauses that trimming would cut, and the
+    duration cap is already applied to the stream by the caller.
+    """
+
+    def __init__(self, backend: "VoskSTTBackend"):
+        self.backend = backend
+        self._recognizer = backend.recognizer()
+        self._normalizer = preprocessor.stream_normalizer()
+        self._audio_seconds = 0.0
+
+    def _final(self, result: str) -> List[Transcript]:
+        text = json.loads(result).get("text", "").strip()
+        return [Transcript(text=text, final=True)] if text else []
+
+    def feed(self, pcm: bytes) -> List[Transcript]:
+        started = time.perf_counter()
+        self._audio_seconds += len(pcm) / (SAMPLE_RATE * SAMPLE_WIDTH)
+        if self._recognizer.AcceptWaveform(self._normalizer.process(pcm)):
+            transcripts = self._final(self._recognizer.Result())
+        else:
+            partial = json.loads(self._recognizer.PartialResult()).get("partial", "").strip()
+            transcripts = [Transcript(text=partial, final=False)] if partial else []
+        metrics.observe("stt_stream_feed_seconds", time.perf_counter() - started, backend=self.backend.name)
+        return transcripts
+
+    def finish(self) -> List[Transcript]:
+        metrics.increment("stt_audio_seconds_total", self._audio_seconds, backend=self.backend.name)
+        return self._final(self._recognizer.FinalResult())
+
+
+class VoskSTTBackend(STTBackend):
+    """
+    Offline recognition with Vosk (Kaldi) on the CPU. The model is loaded once
+    from model_path and shared; each clip or stream gets its own recognizer.
+    """
+
+    name = "vosk"
+
+    def __init__(self, model_path: str):
+        try:
+            import vosk
+        except ImportError:
+            raise RuntimeError("STT_BACKEND=vosk requires the optional 'vosk' package (pip install vosk==0.3.45)")
+
+        vosk.SetLogLevel(-1)
+        self._vosk = vosk
+        started = time.perf_counter()
+        self.model = vosk.Model(model_path)
+        print(f"✓ Vosk model loaded from {model_path} in {time.perf_counter() - started:.1f}s")
+
+    def recognizer(self):
+        return self._vosk.KaldiRecognizer(self.model, SAMPLE_RATE)
+
+    def _recognize(self, pcm: bytes, sample_rate: int) -> Optional[str]:
+        recognizer = self._vosk.KaldiRecognizer(self.model, sample_rate)
+        recognizer.AcceptWaveform(pcm)
+        return json.loads(recognizer.FinalResult()).get("text")
+
+    def create_stream(self) -> STTStream:
+        return VoskSTTStream(self)
+
+
+# Phrases the fake backend "hears"; picked by a checksum of the audio
+_FAKE_PHRASES = (
+    "I have had a headache and a mild fever since yesterday",
+    "My chest feels tight when I climb the stairs",
+    "I have a sore throat and a dry cough",
+    "My stomach hurts after I eat",
+    "I feel dizzy when I stand up quickly",
+    "I have a rash on my arm that itches",
+)
+
+
+class FakeSTTBackend(STTBackend):
+    """
+    Deterministic offline stand-in for speech recognition.
+
+    The same audio always yields the same phrase, silent audio yields None.
+    Latency is `latency_ms` plus up to `jitter_ms`, and `error_rate` of calls
+    raise TranscriptionUnavailableError; both draw from one RNG seeded with
+    `seed`, so a run is reproducible.
+    """
+
+    name = "fake"
+
+    def __init__(
+        self,
+        latency_ms: float = 0.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        seed: int = 0,
+        silence_rms: float = 300.0,
+    ):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.silence_rms = silence_rms
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def _recognize(self, pcm: bytes, sample_rate: int) -> Optional[str]:
+        with self._lock:
+            delay = (self.latency_ms + self._rng.random() * self.jitter_ms) / 1000.0
+            fail = self._rng.random() < self.error_rate
+        if delay:
+            time.sleep(delay)
+        if fail:
+            raise TranscriptionUnavailableError("fake backend injected error")
+
+        samples = np.frombuffer(pcm[:len(pcm) - len(pcm) % SAMPLE_WIDTH], dtype="<i2").astype(np.float32)
+        if not samples.size or np.sqrt(np.mean(samples * samples)) < self.silence_rms:
+            return None
+        return _FAKE_PHRASES[zlib.crc32(pcm) % len(_FAKE_PHRASES)]
+
+
+def create_stt_backend(name: Optional[str] = None) -> STTBackend:
+    """Instantiate the backend selected by name (defaults to settings.STT_BACKEND)"""
+    name = (name or settings.STT_BACKEND).lower()
+    if name == "fake":
+        return FakeSTTBackend(
+            latency_ms=settings.STT_FAKE_LATENCY_MS,
+            jitter_ms=settings.STT_FAKE_JITTER_MS,
+            error_rate=settings.STT_FAKE_ERROR_RATE,
+            seed=settings.STT_FAKE_SEED,
+            silence_rms=settings.STT_SILENCE_RMS,
+        )
+    if name == "vosk":
+        return VoskSTTBackend(settings.STT_VOSK_MODEL_PATH)
+    if name == "google":
+        return GoogleSTTBackend(timeout_seconds=settings.STT_TIMEOUT_SECONDS)
+    raise ValueError(f"Unknown STT_BACKEND '{name}' (expected 'google', 'vosk' or 'fake')")
+
+
+# Singleton instance
+stt_backend = create_stt_backend()
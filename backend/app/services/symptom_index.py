@@ -0,0 +1,256 @@
+"""
+Symptom Autocomplete Index
+In-memory prefix index over Symptom names and the RAG symptom mappings,
+used to serve typeahead suggestions without touching the database.
+Symptom rows come from the lookup cache, so the index follows its version.
+"""
+import os
+import re
+import json
+import threading
+from bisect import bisect_left, insort
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from app.services.lookup_cache import LookupSnapshot
+
+
+# Source weights: curated DB symptoms rank above phrases mined from symptoms.json
+SOURCE_SYMPTOM = "symptom"
+SOURCE_KNOWLEDGE_BASE = "knowledge_base"
+_SOURCE_RANK = {SOURCE_SYMPTOM: 0, SOURCE_KNOWLEDGE_BASE: 1}
+
+# Verbs that separate the symptom phrase from the referral in a mapping, e.g.
+# "Hives (urticaria) lasting more than a few days warrant Dermatology evaluation."
+_MAPPING_SPLIT_RE = re.compile(
+    r"\s+(?:is|are|warrants?|requires?|requiring|indicates?|indicating|should|needs?|may)\b",
+    re.IGNORECASE,
+)
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def normalize(text: str) -> str:
+    """Lowercase and collapse a label to space separated alphanumeric tokens"""
+    return " ".join(_TOKEN_RE.findall(text.lower()))
+
+
+def extract_mapping_phrase(mapping: str) -> Optional[str]:
+    """Return the leading symptom phrase of a symptoms.json mapping sentence"""
+    phrase = _MAPPING_SPLIT_RE.split(mapping, maxsplit=1)[0].strip(" .,")
+    if not phrase or len(phrase) > 120:
+        return None
+    return phrase
+
+
+@dataclass(frozen=True)
+class _Entry:
+    label: str
+    specialization: Optional[str]
+    source: str
+
+
+class SymptomIndex:
+    """
+    Sorted-array prefix index for symptom typeahead.
+
+    Every entry is indexed under its full normalized label and under each word
+    suffix of it, so "pain" matches both "Pain in knee" and "Chest pain".
+    Keys live in a sorted list of (key, label_key) tuples and are searched with
+    bisect; admin CRUD updates the list in place with insort/delete instead of
+    rebuilding it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys: List[Tuple[str, str]] = []
+        self._entries: Dict[str, _Entry] = {}
+        self._knowledge_base: Dict[str, _Entry] = {}  # mapping phrases, kept for when a symptom shadowing one goes away
+        self._mapping_phrases: Optional[List[Tuple[str, str]]] = None
+        self._version: Optional[int] = None
+        self._loaded = False
+
+    # ── Build ─────────────────────────────────────────────────
+
+    @staticmethod
+    def _index_keys(label_key: str) -> List[str]:
+        words = label_key.split(" ")
+        return [" ".join(words[i:]) for i in range(len(words))]
+
+    def _add(self, entry: _Entry):
+        label_key = normalize(entry.label)
+        if not label_key:
+            return
+        existing = self._entries.get(label_key)
+        if existing and _SOURCE_RANK[existing.source] <= _SOURCE_RANK[entry.source]:
+            return
+        if existing is None:
+            for key in self._index_keys(label_key):
+                insort(self._keys, (key, label_key))
+        self._entries[label_key] = entry
+
+    def _remove(self, label: str):
+        """Drop a symptom entry, falling back to the mapping phrase it shadowed (as build() would)"""
+        label_key = normalize(label)
+        fallback = self._knowledge_base.get(label_key)
+        if fallback is not None:
+            if label_key in self._entries:
+                self._entries[label_key] = fallback
+            return
+        if self._entries.pop(label_key, None) is None:
+            return
+        for key in self._index_keys(label_key):
+            pos = bisect_left(self._keys, (key, label_key))
+            if pos < len(self._keys) and self._keys[pos] == (key, label_key):
+                del self._keys[pos]
+
+    def build(self, symptoms: List[Dict[str, str]], version: Optional[int] = None) -> int:
+        """
+        (Re)build the index from active symptom rows and the symptoms.json mappings
+
+        Args:
+            symptoms: Active symptoms as {"name", "specialization"} dicts
+            version: Lookup data version the rows belong to
+
+        Returns:
+            Number of distinct suggestions indexed
+        """
+        if self._mapping_phrases is None:
+            self._mapping_phrases = self._load_mapping_phrases(None)
+
+        knowledge_base: Dict[str, _Entry] = {}
+        for phrase, category in self._mapping_phrases:
+            key = normalize(phrase)
+            if key and key not in knowledge_base:
+                knowledge_base[key] = _Entry(phrase, category, SOURCE_KNOWLEDGE_BASE)
+
+        entries: Dict[str, _Entry] = {}
+        for symptom in symptoms:
+            key = normalize(symptom["name"])
+            if key and key not in entries:
+                entries[key] = _Entry(symptom["name"], symptom.get("specialization"), SOURCE_SYMPTOM)
+
+        for key, entry in knowledge_base.items():
+            entries.setdefault(key, entry)
+
+        keys = sorted(
+            (index_key, label_key)
+            for label_key in entries
+            for index_key in self._index_keys(label_key)
+        )
+
+        with self._lock:
+            self._entries = entries
+            self._knowledge_base = knowledge_base
+            self._keys = keys
+            self._version = version
+            self._loaded = True
+
+        print(f"✓ Symptom index built: {len(entries)} suggestions, {len(keys)} keys")
+        return len(entries)
+
+    @staticmethod
+    def _load_mapping_phrases(mappings_path: Optional[str]) -> List[Tuple[str, str]]:
+        path = mappings_path or os.path.join(os.path.dirname(__file__), "symptoms.json")
+        try:
+            with open(path, "r", encoding="utf-8-sig") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            print(f"⚠ Symptom index: could not read mappings from {path}: {e}")
+            return []
+
+        phrases = []
+        for item in data:
+            phrase = extract_mapping_phrase(item.get("mapping", ""))
+            if phrase:
+                phrases.append((phrase, item.get("category", "General")))
+        return phrases
+
+    def sync(self, snapshot: LookupSnapshot):
+        """Build the index on first use, or rebuild it when the lookup data changed elsewhere"""
+        if not self._loaded or self._version != snapshot.version:
+            self.build(snapshot.symptoms, snapshot.version)
+
+    # ── Incremental updates (admin symptom CRUD) ─────────────
+    # `version` is the lookup version produced by the admin change. If the index
+    # was exactly one version behind it is patched in place and marked current;
+    # otherwise another worker changed the data too and sync() rebuilds it.
+
+    def _advance(self, version: Optional[int]):
+        if version is not None and self._version is not None and self._version == version - 1:
+            self._version = version
+
+    def upsert_symptom(
+        self,
+        name: str,
+        specialization: Optional[str],
+        is_active: bool = True,
+        previous_name: Optional[str] = None,
+        version: Optional[int] = None,
+    ):
+        """Apply a created/updated Symptom row to the index"""
+        if not self._loaded:
+            return
+        with self._lock:
+            if previous_name:
+                self._remove(previous_name)
+            self._remove(name)
+            if is_active:
+                self._add(_Entry(name, specialization, SOURCE_SYMPTOM))
+            self._advance(version)
+
+    def remove_symptom(self, name: str, version: Optional[int] = None):
+        """Drop a deleted Symptom row from the index"""
+        if not self._loaded:
+            return
+        with self._lock:
+            self._remove(name)
+            self._advance(version)
+
+    # ── Query ─────────────────────────────────────────────────
+
+    def suggest(self, query: str, limit: int = 10) -> List[Dict]:
+        """
+        Return ranked suggestions whose label (or any word of it) starts with query.
+
+        Ranking: curated symptoms first, then whole-label prefix matches before
+        word matches, then shorter labels, then alphabetical.
+        """
+        prefix = normalize(query)
+        if not prefix:
+            return []
+
+        matches: Dict[str, bool] = {}
+        with self._lock:
+            keys = self._keys
+            pos = bisect_left(keys, (prefix, ""))
+            while pos < len(keys):
+                key, label_key = keys[pos]
+                if not key.startswith(prefix):
+                    break
+                is_label_prefix = key == label_key
+                matches[label_key] = matches.get(label_key, False) or is_label_prefix
+                pos += 1
+            entries = self._entries
+
+        ranked = sorted(
+            matches.items(),
+            key=lambda item: (
+                _SOURCE_RANK[entries[item[0]].source],
+                not item[1],
+                len(item[0]),
+                item[0],
+            ),
+        )
+
+        return [
+            {
+                "name": entries[label_key].label,
+                "specialization": entries[label_key].specialization,
+                "source": entries[label_key].source,
+            }
+            for label_key, _ in ranked[:limit]
+        ]
+
+
+# Singleton instance
+symptom_index = SymptomIndex()
@@ -0,0 +1,64 @@
+"""
+Per-step request timings
+Code marks pipeline stages with `with step("rag_search"):`. Every stage is
+recorded in the ai_step_seconds histogram and, while a request is being
+timed (see the timing middleware in main.py), also collected for that
+request so it can be returned as a Server-Timing header.
+"""
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import List, Optional, Tuple
+
+from app.services.metrics import metrics
+
+
+# (step name, seconds) for the request currently being handled
+_request_timings: ContextVar[Optional[List[Tuple[str, float]]]] = ContextVar("request_timings", default=None)
+
+STEP_METRIC = "ai_step_seconds"
+
+
+def start_request_timing():
+    """Begin collecting step timings for the current request; returns a reset token"""
+    return _request_timings.set([])
+
+
+def stop_request_timing(token) -> List[Tuple[str, float]]:
+    """Stop collecting and return the timings recorded since start_request_timing()"""
+    timings = _request_timings.get() or []
+    _request_timings.reset(token)
+    return timings
+
+
+def current_timings() -> List[Tuple[str, float]]:
+    """Timings recorded so far for the current request"""
+    return list(_request_timings.get() or [])
+
+
+def record_step(name: str, seconds: float):
+    """Record an already measured step"""
+    metrics.observe(STEP_METRIC, seconds, step=name)
+    timings = _request_timings.get()
+    if timings is not None:
+        # list.append is atomic, so steps run in worker threads
+        # (asyncio.to_thread copies the context) land in the same list
+        timings.append((name, seconds))
+
+
+@contextmanager
+def step(name: str):
+    """Time the enclosed block as pipeline step `name`"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_step(name, time.perf_counter() - started)
+
+
+def server_timing_header(timings: List[Tuple[str, float]]) -> str:
+    """Format timings as a Server-Timing header value (durations in ms)"""
+    totals = {}
+    for name, seconds in timings:
+        totals[name] = totals.get(name, 0.0) + seconds
+    return ", ".join(f"{name};dur={seconds * 1000:.1f}" for name, seconds in totals.items())
@@ -0,0 +1,312 @@
+"""
+Local Triage Engine
+Deterministic severity and emergency assessment that runs before (and
+without) the LLM. Red-flag rules catch emergencies; symptom phrases and
+urgency weights mined from the symptoms.json mappings, plus the distances of
+an already retrieved RAG context, grade everything else. The result is
+reconciled with the LLM analysis so urgency never depends on the model's JSON.
+"""
+import os
+import re
+import json
+import threading
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Pattern, Tuple
+
+from app.core.config import settings
+from app.services.symptom_index import extract_mapping_phrase, normalize
+from app.services.timing import step
+
+
+SEVERITY_RANK = {"low": 0, "moderate": 1, "high": 2}
+
+EMERGENCY_ACTION = (
+    "If this is happening now or getting worse, call your local emergency number "
+    "or go to the nearest emergency department."
+)
+
+
+@dataclass(frozen=True)
+class RedFlagRule:
+    """A pattern that on its own justifies a severity (and possibly an emergency)"""
+    name: str
+    pattern: Pattern
+    severity: str
+    emergency: bool
+    specialization: str
+    reason: str
+
+
+def _rule(name: str, pattern: str, severity: str, emergency: bool, specialization: str, reason: str) -> RedFlagRule:
+    return RedFlagRule(name, re.compile(pattern, re.IGNORECASE), severity, emergency, specialization, reason)
+
+
+# Terms joined by _NEAR must appear in the same sentence (decimal points don't end one)
+_NEAR = r"(?:[^.!?\n]|\.(?=\d)){0,60}"
+
+RED_FLAG_RULES: Tuple[RedFlagRule, ...] = (
+    _rule("cardiac_chest_pain",
+          rf"\bchest (?:pain|pressure|tightness|heaviness){_NEAR}\b(?:arm|jaw|sweat\w*|short(?:ness)? of breath|breathless\w*)"
+          rf"|\b(?:arm|jaw|sweat\w*|short(?:ness)? of breath|breathless\w*){_NEAR}\bchest (?:pain|pressure|tightness|heaviness)",
+          "high", True, "Cardiology",
+          "Chest pain with breathlessness, sweating or pain spreading to the arm or jaw can be a heart attack."),
+    _rule("chest_pain",
+          r"\bchest (?:pain|pressure|tightness|heaviness)",
+          "high", False, "Cardiology",
+          "Chest pain should be assessed promptly by a doctor."),
+    _rule("stroke_signs",
+          r"\b(?:face (?:is )?droop\w*|drooping face|slurred speech|slurring|can'?t (?:speak|talk) properly"
+          rf"|(?:numb\w*|weak\w*|paraly\w*){_NEAR}\bone side|one[- ]sided (?:numbness|weakness))",
+          "high", True, "Neurology",
+          "Face drooping, slurred speech or weakness on one side can be signs of a stroke."),
+    _rule("thunderclap_headache",
+          r"\b(?:worst headache|thunderclap)",
+          "high", True, "Emergency Medicine",
+          "A sudden, extremely severe headache can be a sign of bleeding in the brain."),
+    _rule("breathing_difficulty",
+          r"\b(?:can'?t|cannot|unable to|struggling to|hard to) (?:breathe|catch my breath)|\bgasping\b|\bchoking\b"
+          r"|\blips? (?:are |is )?(?:turning )?blue",
+          "high", True, "Pulmonology",
+          "Severe difficulty breathing needs immediate medical care."),
+    _rule("blood_loss",
+          r"\b(?:cough\w* (?:up )?blood|vomit\w* blood|blood in (?:my )?vomit|hemoptysis"
+          r"|bleeding (?:heavily|a lot|won'?t stop|that won'?t stop|non[- ]?stop)|uncontrolled bleeding)",
+          "high", True, "Emergency Medicine",
+          "Coughing or vomiting blood, or bleeding that will not stop, needs urgent assessment."),
+    _rule("loss_of_consciousness",
+          r"\b(?:passed out|fainted|faint(?:ing)? spell|unconscious|unresponsive|loss of consciousness|blacked out)",
+          "high", True, "Emergency Medicine",
+          "Losing consciousness should be checked by a doctor straight away."),
+    _rule("seizure",
+          r"\b(?:seizure|convulsion|fitting\b)",
+          "high", True, "Neurology",
+          "A seizure, especially a first one, needs urgent medical assessment."),
+    _rule("anaphylaxis",
+          rf"\b(?:throat (?:is )?(?:closing|swelling|tight)|swollen (?:tongue|throat|lips)|(?:tongue|lips) (?:are |is )?swelling"
+          rf"|anaphyla\w*)",
+          "high", True, "Allergy/Immunology",
+          "Swelling of the throat, tongue or lips can be a severe allergic reaction."),
+    _rule("self_harm",
+          r"\b(?:suicid\w*|kill (?:myself|me)|end (?:my|it all)(?: life)?|self[- ]harm\w*|hurt(?:ing)? myself|don'?t want to live)",
+          "high", True, "Psychiatry",
+          "You deserve support right now; please reach out to a crisis line or emergency services."),
+    _rule("sudden_vision_loss",
+          r"\b(?:sudden\w* (?:vision loss|loss of vision|blind\w*)|(?:lost|losing) (?:my )?(?:vision|sight)|curtain over (?:my )?(?:eye|vision))",
+          "high", True, "Ophthalmology",
+          "Sudden loss of vision needs emergency eye or neurological care."),
+    _rule("meningitis_signs",
+          rf"\b(?:stiff neck{_NEAR}\bfever|fever{_NEAR}\bstiff neck)",
+          "high", True, "Neurology",
+          "Fever with a stiff neck can be a sign of meningitis."),
+    _rule("pregnancy_bleeding",
+          rf"\bpregnan\w*{_NEAR}\bbleed\w*|\bbleed\w*{_NEAR}\bpregnan\w*",
+          "high", True, "OB/GYN",
+          "Bleeding during pregnancy should be assessed urgently."),
+    _rule("high_fever",
+          r"\b(?:fever|temperature) (?:of |is |over |above )?(?:10[3-9]|39\.[5-9]|4[0-2])(?:\.\d)?\b|\bvery high fever",
+          "high", False, "General Physician",
+          "A very high fever should be checked by a doctor soon."),
+    _rule("dvt_signs",
+          rf"\b(?:leg|calf){_NEAR}\bswell\w*{_NEAR}\b(?:red\w*|warm\w*|pain\w*)",
+          "high", False, "Vascular Surgery",
+          "A swollen, red, painful leg can be a blood clot and should be seen promptly."),
+)
+_RULES_BY_NAME = {rule.name: rule for rule in RED_FLAG_RULES}
+
+# A negation cue and the few words after it in the same clause ("no chest
+# pain", "not hurting") are masked out before matching, so a negated term can
+# neither raise a red flag nor qualify one. The scope ends at sentence and
+# clause punctuation and at "but" ("no fever, but chest pain").
+_NEGATION_RE = re.compile(
+    r"\b(?:no|not|never|without|denies|deny|don'?t have|haven'?t had)\b"
+    r"(?:[^\w.!?;,\n]+(?!but\b)[\w']+){0,3}",
+    re.IGNORECASE,
+)
+
+
+def mask_negations(text: str) -> str:
+    """Blank out negated phrases, keeping every other character in place"""
+    return _NEGATION_RE.sub(lambda m: " " * len(m.group()), text)
+
+# Urgency of a symptoms.json mapping, from the wording of its referral
+_MAPPING_URGENCY = (
+    (re.compile(r"\bemergency\b", re.IGNORECASE), "high"),
+    (re.compile(r"\b(?:immediate|urgent)\w*", re.IGNORECASE), "high"),
+    (re.compile(r"\b(?:severe|sudden)\w*", re.IGNORECASE), "moderate"),
+)
+_CATEGORY_URGENCY = {"Emergency Medicine": "high"}
+
+# Mapping phrases are split into matchable fragments on these
+_FRAGMENT_SPLIT_RE = re.compile(r",|\(|\)|/|\b(?:or|and|with)\b", re.IGNORECASE)
+
+
+def _max_severity(*levels: Optional[str]) -> Optional[str]:
+    known = [level for level in levels if level in SEVERITY_RANK]
+    return max(known, key=SEVERITY_RANK.__getitem__) if known else None
+
+
+@dataclass
+class TriageResult:
+    """Outcome of a local triage pass"""
+    severity: Optional[str] = None  # None when nothing matched
+    emergency: bool = False
+    red_flags: List[str] = field(default_factory=list)
+    reasons: List[str] = field(default_factory=list)
+    specializations: List[str] = field(default_factory=list)
+    matched_mappings: List[str] = field(default_factory=list)
+
+    @property
+    def notice(self) -> Optional[str]:
+        """Patient-facing emergency notice, when an emergency red flag fired"""
+        if not self.emergency:
+            return None
+        reasons = [_RULES_BY_NAME[name].reason for name in self.red_flags if _RULES_BY_NAME[name].emergency]
+        return " ".join(reasons[:2] + [EMERGENCY_ACTION])
+
+
+class TriageEngine:
+    """
+    Rules plus knowledge-base triage.
+
+    - assess(): red-flag rules, symptom fragments from symptoms.json and the
+      nearest RAG hits, all in-process (well under a millisecond)
+    - refine(): fold a RAG retrieval into an earlier rules-only result
+    - reconcile(): merge with an LLM analysis dict, keeping the more urgent
+      severity and OR-ing the emergency flags
+
+    Only red-flag rules can raise an emergency; knowledge-base matches grade
+    severity.
+    """
+
+    def __init__(self, rag_max_distance: float = 0.8, mappings_path: Optional[str] = None):
+        self.rag_max_distance = rag_max_distance
+        self.mappings_path = mappings_path or os.path.join(os.path.dirname(__file__), "symptoms.json")
+        self._fragments: Optional[List[Tuple[str, str, str]]] = None  # (fragment, urgency, mapping)
+        self._urgency_by_mapping: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    # ── Knowledge base weights ────────────────────────────────
+
+    @staticmethod
+    def mapping_urgency(category: str, mapping: str) -> str:
+        """Urgency implied by a symptoms.json mapping's category and wording"""
+        urgency = _CATEGORY_URGENCY.get(category, "low")
+        for pattern, level in _MAPPING_URGENCY:
+            if pattern.search(mapping):
+                urgency = _max_severity(urgency, level)
+                break
+        return urgency
+
+    def _load(self):
+        with self._lock:
+            if self._fragments is not None:
+                return
+            try:
+                with open(self.mappings_path, "r", encoding="utf-8-sig") as f:
+                    data = json.load(f)
+            except (OSError, json.JSONDecodeError) as e:
+                print(f"⚠ Triage: could not read mappings from {self.mappings_path}: {e}")
+                data = []
+
+            fragments = []
+            for item in data:
+                mapping = item.get("mapping", "")
+                urgency = self.mapping_urgency(item.get("category", ""), mapping)
+                self._urgency_by_mapping[mapping] = urgency
+                phrase = extract_mapping_phrase(mapping)
+                if not phrase:
+                    continue
+                for part in _FRAGMENT_SPLIT_RE.split(phrase):
+                    fragment = normalize(part)
+                    # Single words ("pain", "rash") are too generic to grade on
+                    if len(fragment.split()) >= 2:
+                        fragments.append((fragment, urgency, mapping))
+            self._fragments = fragments
+
+    # ── Assessment ────────────────────────────────────────────
+
+    def _assess(self, text: str) -> TriageResult:
+        result = TriageResult()
+        text = mask_negations(text)
+
+        for rule in RED_FLAG_RULES:
+            if not rule.pattern.search(text):
+                continue
+            # A generic rule adds nothing once a more specific one for the same specialization fired
+            if not rule.emergency and rule.specialization in result.specializations:
+                continue
+            result.red_flags.append(rule.name)
+            result.reasons.append(rule.reason)
+            result.severity = _max_severity(result.severity, rule.severity)
+            result.emergency = result.emergency or rule.emergency
+            if rule.specialization not in result.specializations:
+                result.specializations.append(rule.specialization)
+
+        if self._fragments is None:
+            self._load()
+        normalized = f" {normalize(text)} "
+        for fragment, urgency, mapping in self._fragments:
+            position = normalized.find(f" {fragment} ")
+            if position < 0 or mapping in result.matched_mappings:
+                continue
+            result.matched_mappings.append(mapping)
+            result.severity = _max_severity(result.severity, urgency)
+
+        return result
+
+    def assess(self, text: str, rag_context: Optional[Dict] = None) -> TriageResult:
+        """Triage a patient's text; rag_context is the retrieve_context() result for it, if any"""
+        with step("triage"):
+            result = self._assess(text or "")
+            return self.refine(result, rag_context) if rag_context else result
+
+    def refine(self, result: TriageResult, rag_context: Optional[Dict]) -> TriageResult:
+        """Grade an existing result with the nearest knowledge-base hits of a RAG retrieval"""
+        if not rag_context or not rag_context.get("metadatas"):
+            return result
+        if self._fragments is None:
+            self._load()
+        distances = rag_context.get("distances") or []
+        for meta, distance in zip(rag_context["metadatas"], distances):
+            if distance is None or distance > self.rag_max_distance:
+                continue
+            mapping = meta.get("mapping", "")
+            urgency = self._urgency_by_mapping.get(mapping) or self.mapping_urgency(meta.get("category", ""), mapping)
+            if mapping not in result.matched_mappings:
+                result.matched_mappings.append(mapping)
+            result.severity = _max_severity(result.severity, urgency)
+        return result
+
+    # ── Reconciliation ────────────────────────────────────────
+
+    def reconcile(self, analysis: Dict, local: TriageResult) -> Dict:
+        """
+        Merge a local triage result into an LLM analysis dict (in place).
+        The more urgent severity wins and either side can raise an emergency.
+        When the model produced no recommendation for an emergency, the red
+        flags' specializations are used so the patient still gets a referral.
+        """
+        severity = _max_severity(analysis.get("severity"), local.severity)
+        if severity:
+            analysis["severity"] = severity
+        analysis["emergency_warning"] = bool(analysis.get("emergency_warning")) or local.emergency
+
+        notice = local.notice
+        if notice:
+            notes = analysis.get("additional_notes") or ""
+            if notice not in notes:
+                analysis["additional_notes"] = f"{notice} {notes}".strip()
+            if not analysis.get("recommended_specializations"):
+                referrals: Dict[str, Dict] = {}
+                for name in local.red_flags:
+                    rule = _RULES_BY_NAME[name]
+                    if rule.emergency and rule.specialization not in referrals:
+                        referrals[rule.specialization] = {
+                            "name": rule.specialization, "match_percentage": 90, "reason": rule.reason,
+                        }
+                analysis["recommended_specializations"] = list(referrals.values())
+        return analysis
+
+
+# Singleton instance
+triage = TriageEngine(rag_max_distance=settings.TRIAGE_RAG_MAX_DISTANCE)
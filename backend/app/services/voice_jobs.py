@@ -0,0 +1,121 @@
+"""
+Voice Job Queue
+Asynchronous processing of voice-chat uploads. Uploads are admitted onto a
+bounded in-process queue and handled by a fixed number of worker tasks, so a
+burst of long voice notes neither holds HTTP connections open nor piles up
+decode, STT and LLM work. When the queue (or a patient's share of it) is
+full, new uploads are refused immediately instead of waiting.
+Progress and results are kept in the job registry (app.services.jobs).
+"""
+import asyncio
+from collections import Counter
+from typing import Awaitable, Callable, List, Optional
+
+from app.core.config import settings
+from app.services.jobs import Job, jobs
+
+
+class QueueFullError(Exception):
+    """The queue cannot take more work right now"""
+
+
+class PatientLimitError(QueueFullError):
+    """The patient already has the maximum number of jobs queued or running"""
+
+
+class VoiceJobError(Exception):
+    """A job failed for a reason that can be shown to the patient"""
+
+
+class VoiceJobQueue:
+    """
+    Bounded queue + worker tasks for voice jobs.
+
+    - workers: jobs processed concurrently
+    - max_pending: jobs waiting for a worker
+    - max_per_patient: jobs queued or running per patient
+    """
+
+    def __init__(self, workers: int = 2, max_pending: int = 20, max_per_patient: int = 2):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_per_patient = max_per_patient
+        self._queue: Optional[asyncio.Queue] = None
+        self._tasks: List[asyncio.Task] = []
+        self._active = Counter()  # owner_id -> queued or running jobs
+
+    def start(self):
+        """Start the workers on the running event loop (app startup)"""
+        if self._tasks:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_pending)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+        print(f"✓ Voice job queue started: {self.workers} workers, {self.max_pending} slots")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize() if self._queue else 0
+
+    def submit(
+        self,
+        owner_id: int,
+        handler: Callable[..., Awaitable[dict]],
+        *args,
+        on_done: Optional[Callable[[Job], Awaitable[None]]] = None,
+    ) -> Job:
+        """
+        Admit a job or raise QueueFullError / PatientLimitError without queueing.
+        handler(*args) returns the job result; on_done(job) runs once it finished.
+        """
+        if self._queue is None:
+            raise QueueFullError("Voice job queue is not running")
+        if self._active[owner_id] >= self.max_per_patient:
+            raise PatientLimitError(f"At most {self.max_per_patient} voice messages can be processed at once")
+        if self._queue.full():
+            raise QueueFullError("Voice job queue is full")
+
+        job = jobs.create("voice_chat", total=1, owner_id=owner_id)
+        self._queue.put_nowait((job, handler, args, on_done))
+        self._active[owner_id] += 1
+        return job
+
+    async def _worker(self):
+        while True:
+            job, handler, args, on_done = await self._queue.get()
+            jobs.start(job)
+            try:
+                result = await handler(*args)
+                jobs.advance(job, succeeded=1, results=[result])
+                jobs.finish(job)
+            except VoiceJobError as e:
+                jobs.advance(job, failed=1)
+                jobs.finish(job, error=str(e))
+            except Exception as e:
+                print(f"✗ Voice job {job.id} failed: {e}")
+                jobs.advance(job, failed=1)
+                jobs.finish(job, error="Failed to process voice message")
+            finally:
+                self._active[job.owner_id] -= 1
+                if self._active[job.owner_id] <= 0:
+                    del self._active[job.owner_id]
+                self._queue.task_done()
+
+            if on_done:
+                try:
+                    await on_done(job)
+                except Exception as e:
+                    print(f"⚠ Voice job {job.id} notification failed: {e}")
+
+
+# Singleton instance
+voice_jobs = VoiceJobQueue(
+    workers=settings.VOICE_JOB_WORKERS,
+    max_pending=settings.VOICE_JOB_QUEUE_SIZE,
+    max_per_patient=settings.VOICE_JOB_MAX_PER_PATIENT,
+)
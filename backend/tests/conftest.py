@@ -0,0 +1,6 @@
+import os
+
+# Settings are required at import time; tests never open a real connection
+os.environ.setdefault("DATABASE_URL", "postgresql://localhost/mednexus_test")
+os.environ.setdefault("SECRET_KEY", "test-secret-key")
+os.environ.setdefault("LLM_BACKEND", "fake")
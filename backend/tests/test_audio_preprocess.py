@@ -0,0 +1,44 @@
+import numpy as np
+
+from app.services.audio_preprocess import AudioPreprocessor, to_pcm, to_samples
+
+
+SAMPLE_RATE = 16000
+
+
+def _clip(speech_amplitude: float, noise_amplitude: float = 0.0) -> bytes:
+    """1 s of near-silence, 1 s of a 220 Hz tone, 1 s of near-silence"""
+    t = np.arange(SAMPLE_RATE) / SAMPLE_RATE
+    rng = np.random.default_rng(0)
+    silence = lambda: rng.normal(0, noise_amplitude, SAMPLE_RATE) if noise_amplitude else np.zeros(SAMPLE_RATE)
+    tone = speech_amplitude * np.sin(2 * np.pi * 220 * t)
+    return to_pcm(np.concatenate([silence(), tone, silence()]))
+
+
+def test_quiet_speech_is_kept_and_amplified():
+    # Peak ~150: below the silence threshold until normalised
+    out = to_samples(AudioPreprocessor(silence_rms=300).process(_clip(150, noise_amplitude=5), SAMPLE_RATE))
+    assert 0.9 * SAMPLE_RATE < len(out) < 1.5 * SAMPLE_RATE
+    assert np.abs(out).max() >= 9 * 150  # gain is capped at 20 dB
+
+
+def test_silence_is_trimmed_to_nothing():
+    out = AudioPreprocessor(silence_rms=300).process(_clip(0, noise_amplitude=5), SAMPLE_RATE)
+    assert out == b""
+
+
+def test_speech_is_capped():
+    out = AudioPreprocessor(max_seconds=0.5).process(_clip(8000), SAMPLE_RATE)
+    assert len(to_samples(out)) == SAMPLE_RATE // 2
+
+
+def test_stream_normalizer_gain_only_steps_down():
+    normalizer = AudioPreprocessor().stream_normalizer()
+    quiet, loud = _clip(300)[:SAMPLE_RATE * 4], _clip(3000)[:SAMPLE_RATE * 4]
+    first = to_samples(normalizer.process(quiet))
+    second = to_samples(normalizer.process(loud))
+    third = to_samples(normalizer.process(quiet))
+    assert np.abs(first).max() >= 9 * 300  # quiet start is amplified
+    assert np.abs(second).max() <= 32767
+    # The quiet chunk after the loud one keeps the loud chunk's gain
+    assert np.abs(third).max() < np.abs(first).max()
@@ -0,0 +1,58 @@
+import pytest
+
+from app.services.specialization_aliases import SpecializationAliasIndex, edit_distance
+
+
+# Seeded specializations (app/main.py) and the RAG knowledge-base categories
+SPECIALIZATIONS = [
+    "General Physician", "Cardiologist", "Pulmonologist",
+    "Neurologist", "Gastroenterologist", "Dermatologist",
+]
+CATEGORIES = [
+    "Allergy/Immunology", "Cardiology", "Dermatology", "ENT", "Emergency Medicine",
+    "Endocrinology", "Gastroenterology", "General Surgery", "Hematology",
+    "Infectious Disease", "Nephrology", "Neurology", "OB/GYN", "Oncology",
+    "Ophthalmology", "Orthopedics", "Psychiatry", "Pulmonology", "Rheumatology",
+    "Urology", "Vascular Surgery",
+]
+
+
+@pytest.fixture
+def index():
+    aliases = SpecializationAliasIndex()
+    aliases.build(SPECIALIZATIONS, categories=CATEGORIES)
+    return aliases
+
+
+@pytest.mark.parametrize("name, expected", [
+    ("Cardiology", "Cardiologist"),
+    ("neurology", "Neurologist"),
+    ("Internal Medicine", "General Physician"),
+    ("Cardiolgist", "Cardiologist"),
+    ("Cardiolgoist", "Cardiologist"),
+    ("Dermatolgy", "Dermatologist"),
+    ("Nuerologist", "Neurologist"),
+    ("Gastroentrologist", "Gastroenterologist"),
+    ("Pulmonolgist", "Pulmonologist"),
+])
+def test_resolves_known_names_and_typos(index, name, expected):
+    assert index.resolve(name) == expected
+
+
+@pytest.mark.parametrize("name", [
+    "Urology", "Urologist", "Nephrology", "Nephrologist",
+    "Hematology", "Hematologist", "Oncologist", "Ophthalmologist",
+    "", "xyz",
+])
+def test_unrelated_specialties_are_not_matched(index, name):
+    assert index.resolve(name) is None
+
+
+def test_canonicalize_keeps_unresolved_names(index):
+    assert index.canonicalize("Urologist") == "Urologist"
+
+
+def test_edit_distance_counts_transpositions_and_stops_at_limit():
+    assert edit_distance("cardiolgoist", "cardiologist", 1) == 1
+    assert edit_distance("urologist", "neurologist", 1) == 2
+    assert edit_distance("hematologist", "dermatologist", 5) == 2
@@ -0,0 +1,42 @@
+import pytest
+
+from app.services.symptom_index import SOURCE_KNOWLEDGE_BASE, SOURCE_SYMPTOM, SymptomIndex
+
+
+@pytest.fixture
+def index():
+    index = SymptomIndex()
+    index._mapping_phrases = [("Chest pain", "Cardiology"), ("Hives", "Dermatology")]
+    index.build([{"name": "Fever", "specialization": "General Physician"}], version=1)
+    return index
+
+
+def _suggest(index, query):
+    return [(s["name"], s["specialization"], s["source"]) for s in index.suggest(query)]
+
+
+def _rebuilt(index, symptoms):
+    fresh = SymptomIndex()
+    fresh._mapping_phrases = index._mapping_phrases
+    fresh.build(symptoms, version=index._version)
+    return fresh
+
+
+def test_deleting_a_symptom_restores_the_mapping_phrase(index):
+    index.upsert_symptom("Chest Pain", "Cardiologist", version=2)
+    assert _suggest(index, "chest") == [("Chest Pain", "Cardiologist", SOURCE_SYMPTOM)]
+
+    index.remove_symptom("Chest Pain", version=3)
+    assert _suggest(index, "chest") == [("Chest pain", "Cardiology", SOURCE_KNOWLEDGE_BASE)]
+    assert index._version == 3
+
+
+def test_renaming_a_symptom_matches_a_full_rebuild(index):
+    index.upsert_symptom("Hives", "Dermatologist", version=2)
+    index.upsert_symptom("Urticaria", "Dermatologist", previous_name="Hives", version=3)
+    index.upsert_symptom("Fever", "General Physician", is_active=False, version=4)
+
+    fresh = _rebuilt(index, [{"name": "Urticaria", "specialization": "Dermatologist"}])
+    for query in ["hives", "urticaria", "fever", "chest"]:
+        assert _suggest(index, query) == _suggest(fresh, query)
+    assert index._keys == fresh._keys
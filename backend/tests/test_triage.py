@@ -0,0 +1,51 @@
+import pytest
+
+from app.services.triage import TriageEngine, mask_negations
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return TriageEngine()
+
+
+@pytest.mark.parametrize("text, flag", [
+    # A negation in an earlier sentence does not reach the red flag
+    ("I have no fever. My chest pain spreads to my jaw", "cardiac_chest_pain"),
+    ("It does not hurt. I fainted yesterday", "loss_of_consciousness"),
+    # ... nor across a comma or "but"
+    ("No cough, but I passed out this morning", "loss_of_consciousness"),
+    ("I don't have a cough, I feel chest tightness and I'm sweating", "cardiac_chest_pain"),
+    # A later, un-negated mention still counts
+    ("Not fainted before, but today I fainted at work", "loss_of_consciousness"),
+    ("Chest pain without sweating, and the pain goes to my left arm", "cardiac_chest_pain"),
+])
+def test_red_flag_fires_outside_negated_clause(engine, text, flag):
+    result = engine.assess(text)
+    assert flag in result.red_flags
+    assert result.emergency
+
+
+@pytest.mark.parametrize("text", [
+    "No chest pain, just a mild cough",
+    "I have not fainted",
+    "never had a seizure",
+])
+def test_negated_red_flag_is_ignored(engine, text):
+    result = engine.assess(text)
+    assert not result.emergency
+    assert result.severity != "high"
+
+
+def test_negated_qualifiers_do_not_make_chest_pain_an_emergency(engine):
+    result = engine.assess("chest pain, no sweating, no arm pain")
+    assert result.red_flags == ["chest_pain"]
+    assert result.severity == "high"
+    assert not result.emergency
+
+
+def test_mask_negations_keeps_offsets():
+    text = "no fever. chest pain"
+    masked = mask_negations(text)
+    assert len(masked) == len(text)
+    assert masked.endswith(". chest pain")
+    assert "fever" not in masked
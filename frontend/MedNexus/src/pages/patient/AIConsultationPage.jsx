@@ -49,6 +49,8 @@ const AIConsultationPage = () => {
   const [inputValue, setInputValue] = useState('');
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
+  // Server-side chat session; the backend keeps the conversation history
+  const [sessionId, setSessionId] = useState(null);
   
   // Doctor recommendations state
   const [currentAnalysis, setCurrentAnalysis] = useState(null);
@@ -179,16 +181,9 @@ const AIConsultationPage = () => {
       const formData = new FormData();
       formData.append('audio', audioBlob, 'recording.webm');
 
-      // Build conversation history
-      const conversationHistory = messages
-        .filter((m) => m.id !== 'welcome')
-        .map((m) => ({
-          role: m.role,
-          content: m.content,
-        }));
-
       // Send audio directly to Gemini AI
-      const response = await apiService.voiceChat(formData, conversationHistory);
+      const response = await apiService.voiceChat(formData, sessionId);
+      if (response.session_id) setSessionId(response.session_id);
 
       // Create assistant message with AI analysis
       const assistantMessage = {
@@ -224,7 +219,7 @@ const AIConsultationPage = () => {
   const loadHistory = async () => {
     try {
       setHistoryLoading(true);
-      const response = await apiService.getAIConsultationHistory(20, 0);
+      const response = await apiService.getAIConsultationHistorySummary(20);
       setHistory(response.consultations || []);
     } catch (err) {
       console.error('Failed to load history:', err);
@@ -250,16 +245,9 @@ const AIConsultationPage = () => {
     setLoading(true);
 
     try {
-      // Build conversation history for context
-      const conversationHistory = messages
-        .filter((m) => m.id !== 'welcome')
-        .map((m) => ({
-          role: m.role,
-          content: m.content,
-        }));
-
       // Send to AI
-      const response = await apiService.aiChat(userMessage.content, conversationHistory);
+      const response = await apiService.aiChat(userMessage.content, sessionId);
+      if (response.session_id) setSessionId(response.session_id);
 
       // Create assistant message
       const assistantMessage = {
@@ -314,13 +302,23 @@ const AIConsultationPage = () => {
         timestamp: new Date(),
       },
     ]);
+    setSessionId(null);
     setCurrentAnalysis(null);
     setShowDoctors(false);
     setError('');
     setInputValue('');
   };
 
-  const handleViewHistoryItem = (item) => {
+  const handleViewHistoryItem = async (summary) => {
+    // The sidebar list only has summaries; load the full analysis on demand
+    let item;
+    try {
+      item = await apiService.getAIConsultationDetail(summary.id);
+    } catch (err) {
+      console.error('Failed to load consultation:', err);
+      return;
+    }
+
     // Create a simulated conversation from the history item
     const userMessage = {
       id: `user-history-${item.id}`,
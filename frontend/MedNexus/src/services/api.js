@@ -563,12 +563,13 @@ class ApiService {
   }
 
   // AI Doctor Chat (Conversational)
-  async aiChat(message, conversationHistory = []) {
+  // The server keeps the conversation; pass the session_id from the previous reply
+  async aiChat(message, sessionId = null) {
     return this.request('/api/patients/ai-chat', {
       method: 'POST',
       body: JSON.stringify({
         message,
-        conversation_history: conversationHistory,
+        session_id: sessionId,
       }),
     });
   }
@@ -604,8 +605,9 @@ class ApiService {
   }
 
   // Voice Chat - Send audio directly to Gemini AI
-  async voiceChat(formData, conversationHistory = []) {
-    const url = `${this.baseUrl}/api/patients/voice-chat?conversation_history=${encodeURIComponent(JSON.stringify(conversationHistory))}`;
+  async voiceChat(formData, sessionId = null) {
+    const query = sessionId ? `?session_id=${encodeURIComponent(sessionId)}` : '';
+    const url = `${this.baseUrl}/api/patients/voice-chat${query}`;
     
     const response = await fetch(url, {
       method: 'POST',
@@ -630,6 +632,12 @@ class ApiService {
     return this.request(`/api/patients/ai-consultation/history?limit=${limit}&offset=${offset}`);
   }
 
+  async getAIConsultationHistorySummary(limit = 20, cursor = null) {
+    const params = new URLSearchParams({ limit });
+    if (cursor) params.append('cursor', cursor);
+    return this.request(`/api/patients/ai-consultation/history/summary?${params}`);
+  }
+
   async getAIConsultationDetail(consultationId) {
     return this.request(`/api/patients/ai-consultation/history/${consultationId}`);
   }